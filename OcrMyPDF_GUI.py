@@ -1,19 +1,4413 @@
 import os
 import subprocess
 import threading
-import tkinter as tk
-from tkinter import filedialog, scrolledtext, messagebox
-import ttkbootstrap as ttk
-from ttkbootstrap.constants import *
 import queue
 import datetime
+import time
+import itertools
+import collections
+import logging
+import importlib.util
+import sys
+import multiprocessing
+import atexit
+import shutil
+import signal
+import re
+import json
+import hashlib
+import tempfile
+import shlex
+import contextlib
+import argparse
+import csv
+import math
+import random
+import zlib
+import sqlite3
+import secrets
+import hmac
+import socket
 
+# 图形界面模块（tkinter、ttkbootstrap、tkinterdnd2）由 _load_gui() 按需导入：
+# 无界面模式、脚本调用以及进程内引擎的工作进程（spawn 方式会重新导入本模块）都不需要它们
+tk = None
+filedialog = scrolledtext = messagebox = None
+ttk = None
+TkinterDnD = None
+DND_FILES = None
+
+
+def _load_gui():
+    global tk, filedialog, scrolledtext, messagebox, ttk, TkinterDnD, DND_FILES
+    if tk is not None:
+        return
+    import tkinter
+    from tkinter import filedialog as _filedialog, scrolledtext as _scrolledtext, messagebox as _messagebox
+    import ttkbootstrap
+    tk, filedialog, scrolledtext, messagebox = tkinter, _filedialog, _scrolledtext, _messagebox
+    ttk = ttkbootstrap
+    try:
+        from tkinterdnd2 import DND_FILES as _dnd_files, TkinterDnD as _tkinterdnd
+        TkinterDnD, DND_FILES = _tkinterdnd, _dnd_files
+    except ImportError:
+        TkinterDnD = None
+        DND_FILES = None
+
+# 进程内引擎通过 ocrmypdf 的插件钩子获取进度条事件；pluggy 随 ocrmypdf 一起安装
 try:
-    from tkinterdnd2 import DND_FILES, TkinterDnD
-    root = TkinterDnD.Tk()
+    import pluggy
+    _hookimpl = pluggy.HookimplMarker("ocrmypdf")
 except ImportError:
-    root = tk.Tk()
-    DND_FILES = None
+    _hookimpl = None
+
+# 自动优化：处理前抽样试算各 -O 级别后再确定级别。目标为每多用 1 CPU 秒至少多节省的输出字节数；
+# CPU 时间差小于下限时按下限计，避免计时误差使比值失真；确定级别之前（命令预览等）与试算失败时按
+# OPTIMIZE_AUTO_FALLBACK 处理
+OPTIMIZE_AUTO = "auto"
+OPTIMIZE_LEVELS = ("0", "1", "2", "3")
+OPTIMIZE_AUTO_SAMPLES = 3
+OPTIMIZE_AUTO_TARGET = 256 * 1024
+OPTIMIZE_AUTO_MIN_CPU = 0.05
+OPTIMIZE_AUTO_FALLBACK = "1"
+
+# PDF 优化方式与 -O 级别的对应关系
+PDF_OPT_MAP = {"不优化": "0", "安全无损优化": "1",
+               "有损 JPEG 优化": "2", "更激进的有损优化": "3", "自动（抽样试算）": OPTIMIZE_AUTO}
+
+# 程序数据目录：日志等文件保存在这里
+APP_DIR = os.path.join(os.path.expanduser("~"), ".ocrmypdf_gui")
+LOG_DIR = os.path.join(APP_DIR, "logs")
+
+CACHE_DIR = os.path.join(APP_DIR, "cache")
+METRICS_FILE = os.path.join(APP_DIR, "metrics.csv")
+MEMORY_MODEL_FILE = os.path.join(APP_DIR, "memory_model.json")
+JOURNAL_FILE = os.path.join(APP_DIR, "journal.sqlite3")
+SEARCH_INDEX_FILE = os.path.join(APP_DIR, "search.sqlite3")
+
+# 全文索引：中日韩文字逐字以空格分隔后交给 FTS5 的 unicode61 分词器，任意长度的词都能按短语检索；
+# 每页的行号为 文档号 * SEARCH_ROWID_PAGES + 页码，按文档删除时只需按行号范围删除
+SEARCH_CJK_CHARS = "\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef"
+SEARCH_CJK_RE = re.compile(f"([{SEARCH_CJK_CHARS}])")
+SEARCH_ROWID_PAGES = 1000000
+SEARCH_RESULT_LIMIT = 200
+
+# 本地暂存：默认暂存目录、预取的排队任务数、暂存目录至少保留的剩余空间
+STAGING_DIR = os.path.join(tempfile.gettempdir(), "ocrmypdf_gui_stage")
+STAGING_PREFETCH = 2
+STAGING_MIN_FREE_BYTES = 512 * 1024 ** 2
+STAGING_CHUNK_BYTES = 1024 * 1024
+
+# 资源采样间隔（秒）：按此间隔统计 ocrmypdf 及其全部子进程的内存、CPU 和 I/O
+RESOURCE_SAMPLE_SECONDS = 0.5
+METRICS_FIELDS = ("finished_at", "input", "output", "status", "return_code", "engine", "jobs",
+                  "pages", "wall_seconds", "cpu_user", "cpu_system", "peak_rss", "estimated_rss",
+                  "read_bytes", "write_bytes", "options")
+
+# 内存准入控制：默认预算为物理内存的比例，已运行任务的预估峰值内存之和不超过预算时才启动新任务
+MEMORY_BUDGET_FRACTION = 0.75
+# 无法读取页面信息时按 Letter 幅面、300 DPI 估算；图像分辨率上限防止小图拉伸到整页时得出离谱的 DPI
+MEMORY_DEFAULT_PAGE = (612, 792)
+MEMORY_DEFAULT_DPI = 300
+MEMORY_MAX_DPI = 1200
+# 估算模型（字节）：ocrmypdf 主进程与 Ghostscript 的固定开销、每个 tesseract 进程每种语言的模型，
+# 以及同时处理的每页每像素在栅格化、OCR 和各预处理步骤中占用的内存
+MEMORY_BASE_BYTES = 250 * 1024 ** 2
+MEMORY_LANGUAGE_BYTES = 80 * 1024 ** 2
+MEMORY_BYTES_PER_PIXEL = {"raster": 3, "ocr": 4, "rotate": 1, "remove_background": 6,
+                          "deskew": 3, "clean": 3, "clean_final": 3}
+MEMORY_PREPROCESS_OPTIONS = ("rotate", "remove_background", "deskew", "clean", "clean_final")
+# 估算页面尺寸时最多检查的页数（均匀抽样）
+MEMORY_SAMPLE_PAGES = 20
+# 修正系数：实测峰值与估算值之比的指数滑动平均；某种预处理组合的样本数达到下限前使用全局系数
+MEMORY_LEARNING_RATE = 0.3
+MEMORY_MIN_SAMPLES = 3
+
+# 结果缓存的容量上限，超出后按最近使用时间淘汰
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+# 缓存格式版本，缓存内容或键的计算方式变化时递增
+CACHE_VERSION = 1
+# 不影响输出内容的选项，不参与缓存键计算
+CACHE_IGNORED_OPTIONS = ("sidecar_name",)
+
+# 页面缩略图：Ghostscript 按需渲染的图片尺寸（像素），每次调用最多渲染的连续页数，
+# 可见区域上下额外预取的行数，以及内存与磁盘缓存的容量上限（超出后按最近使用时间淘汰）
+THUMBNAIL_DIR = os.path.join(APP_DIR, "thumbnails")
+THUMBNAIL_SIZE = (120, 160)
+THUMBNAIL_BATCH = 8
+THUMBNAIL_PREFETCH_ROWS = 1
+THUMBNAIL_MEMORY_BYTES = 32 * 1024 ** 2
+THUMBNAIL_DISK_BYTES = 256 * 1024 ** 2
+
+# 与界面初始状态一致的默认选项，配置文件中缺少的项以此补全
+DEFAULT_OPTIONS = {
+    "languages": ["chi_sim"], "rotate": False, "remove_background": False,
+    "deskew": False, "clean": False, "clean_final": False,
+    "auto_language": False, "output_type": "pdfa", "optimize": "1", "force_ocr": False,
+    "optimize_target_kb": OPTIMIZE_AUTO_TARGET // 1024,
+    "skip_text": False, "redo_ocr": False, "tesseract_timeout": 0, "sidecar": False, "sidecar_name": "",
+    "pages": "", "title": "", "author": "", "subject": "", "keywords": "",
+    # 选项模型之外的 ocrmypdf 参数（在命令预览中手动加入），原样放在输入输出文件之前
+    "extra_args": [],
+}
+OUTPUT_TYPES = ("pdf", "pdfa", "pdfa-1", "pdfa-2", "pdfa-3", "none")
+
+# 选项模型：(选项键, ocrmypdf 参数, 类型)。参数中第一个用于生成命令，其余为解析时接受的别名；
+# flag 为开关，value 与 int 带一个参数（值为空时省略），list 以 + 连接，optimize 与 sidecar 另行换算。
+# build_ocr_args 按此顺序生成参数列表，parse_ocr_args 据此把参数列表还原为选项
+OPTION_SPECS = (
+    ("languages", ("-l", "--language"), "list"),
+    ("rotate", ("-r", "--rotate-pages"), "flag"),
+    ("remove_background", ("--remove-background",), "flag"),
+    ("deskew", ("-d", "--deskew"), "flag"),
+    ("clean", ("-c", "--clean"), "flag"),
+    ("clean_final", ("-i", "--clean-final"), "flag"),
+    ("output_type", ("--output-type",), "value"),
+    ("optimize", ("-O", "--optimize"), "optimize"),
+    ("force_ocr", ("-f", "--force-ocr"), "flag"),
+    ("skip_text", ("-s", "--skip-text"), "flag"),
+    ("redo_ocr", ("--redo-ocr",), "flag"),
+    ("tesseract_timeout", ("--tesseract-timeout",), "int"),
+    ("sidecar", ("--sidecar",), "sidecar"),
+    ("pages", ("--pages",), "value"),
+    ("title", ("--title",), "value"),
+    ("author", ("--author",), "value"),
+    ("subject", ("--subject",), "value"),
+    ("keywords", ("--keywords",), "value"),
+)
+OPTION_EMPTY_VALUES = {"flag": False, "list": [], "optimize": None, "int": 0, "sidecar": False, "value": ""}
+# 并行数由调度决定，解析命令时忽略
+JOBS_FLAGS = ("--jobs", "-j")
+# 界面中选项变化后延迟多少毫秒刷新命令预览，连续输入只刷新一次
+COMMAND_PREVIEW_DELAY_MS = 150
+
+# 无界面热文件夹模式：文件大小与修改时间保持不变多少秒后视为写入完成
+HOTFOLDER_SETTLE_SECONDS = 5.0
+HOTFOLDER_POLL_SECONDS = 2.0
+# 使用 inotify 时仍定期全量扫描，补上可能遗漏的事件
+HOTFOLDER_RESCAN_SECONDS = 60.0
+
+# 启动性能基准（--bench-startup）的预算（秒）：模块导入，以及创建窗口到首次完成绘制
+STARTUP_IMPORT_BUDGET = 0.3
+STARTUP_GUI_BUDGET = 1.5
+
+# 吞吐量基准（--bench）：合成语料的随机种子、页面类型、扫描分辨率、倾斜角度与噪点比例；
+# 基准选项在默认选项上改用英文并跳过已有文字的页，选项矩阵的每一项再在其上覆盖对应的值
+BENCH_DIR = os.path.join(APP_DIR, "bench")
+BENCH_SEED = 20240601
+BENCH_PAGE_KINDS = ("text", "scanned", "mixed", "skewed", "noisy")
+BENCH_DPIS = (150, 300)
+BENCH_SKEW_DEGREES = 2.5
+BENCH_NOISE_FRACTION = 0.02
+BENCH_PAGE_SIZE = (595, 842)
+BENCH_WORDS = ("the quick brown fox jumps over lazy dog invoice total amount date account number "
+               "report quarter revenue customer order shipping address payment terms contract "
+               "section page figure table summary analysis result value method sample").split()
+BENCH_COMMAND_BUILDS = 10000
+BENCH_BASE_OPTIONS = dict(DEFAULT_OPTIONS, languages=["eng"], skip_text=True)
+BENCH_MATRIX = dict(
+    [(f"O{level}", {"optimize": level}) for level in OPTIMIZE_LEVELS]
+    + [("deskew", {"deskew": True}), ("clean", {"clean": True}), ("clean-final", {"clean_final": True})]
+    + [(f"output-{kind}", {"output_type": kind}) for kind in OUTPUT_TYPES if kind not in ("pdfa", "none")])
+
+# 预检：页面分类及其显示名称；小于此像素数的图像（图标、徽标等）不计为扫描图像
+PAGE_CLASS_NAMES = {"text": "文字", "image": "图像", "mixed": "混合", "vector": "矢量", "blank": "空白"}
+PREFLIGHT_MIN_IMAGE_PIXELS = 150 * 150
+
+# 空白页与重复页检测：低分辨率栅格化的 DPI；忽略的页边比例；比纸张底色（中位灰度）暗多少视为墨迹；
+# 墨迹覆盖率低于阈值视为空白页；差值哈希的边长
+PAGE_FILTER_DPI = 36
+PAGE_FILTER_MARGIN = 0.05
+PAGE_FILTER_INK_CONTRAST = 80
+PAGE_FILTER_BLANK_COVERAGE = 0.002
+PAGE_FILTER_HASH_SIZE = 16
+# 相邻两块的灰度差不超过此值视为相同，避免大片空白处的细小噪点翻转哈希位；
+# 比纸张底色暗此值以上的块计为有内容的块
+PAGE_FILTER_HASH_TOLERANCE = 2
+# 相似页：不同的哈希位数占有内容位数的比例不超过此值（分母至少为 PAGE_FILTER_MIN_ACTIVE_BITS，
+# 避免只有几行字的页因分母太小而误判），再逐块比较：将页面缩成 PAGE_FILTER_BLOCK 像素见方的块，
+# 两页中任一页有墨迹的块里，灰度差超过 PAGE_FILTER_BLOCK_TOLERANCE 的块不超过 PAGE_FILTER_BLOCK_MISMATCH。
+# 同一模板的表单、发票也会相似，所以相似页只报告；只有与紧邻的上一页几乎逐块相同
+# （缩成 PAGE_FILTER_EXACT_BLOCK 像素见方的块后，灰度差都不超过 PAGE_FILTER_EXACT_TOLERANCE，
+# 一个像素宽的笔画不同也能区分）才判为重新进纸的重复页，按设置跳过或删除
+PAGE_FILTER_DUPLICATE_RATIO = 0.1
+PAGE_FILTER_MIN_ACTIVE_BITS = 32
+PAGE_FILTER_BLOCK = 4
+PAGE_FILTER_BLOCK_TOLERANCE = 40
+PAGE_FILTER_BLOCK_MISMATCH = 0.05
+PAGE_FILTER_EXACT_BLOCK = 2
+PAGE_FILTER_EXACT_TOLERANCE = 24
+PAGE_FILTER_MODES = {"": "不检测", "exclude": "不做OCR", "drop": "从输出中删除"}
+
+# 自动识别语言：抽样页数与栅格化 DPI；各语言所属的文字（与 tesseract OSD 输出的 Script 对应），
+# 以及用于区分同一文字下各语言的常用词或特征字；得分不低于最高分此比例的语言一并选用
+AUTO_LANGUAGE_SAMPLES = 3
+AUTO_LANGUAGE_DPI = 150
+LANGUAGE_SCRIPTS = {"chi_sim": ("Han",), "chi_tra": ("Han",), "jpn": ("Han", "Japanese", "Katakana", "Hiragana"),
+                    "kor": ("Hangul", "Korean"), "eng": ("Latin",), "fra": ("Latin",), "deu": ("Latin",), "spa": ("Latin",)}
+LANGUAGE_MARKERS = {
+    "eng": ("the", "and", "of", "to", "is", "in", "that", "for", "with", "this"),
+    "fra": ("le", "les", "des", "et", "est", "une", "du", "pour", "dans", "qui"),
+    "deu": ("der", "die", "das", "und", "ist", "nicht", "mit", "den", "ein", "zu"),
+    "spa": ("el", "los", "las", "y", "es", "del", "que", "para", "con", "por"),
+    "chi_sim": ("这", "个", "们", "说", "对", "时", "会", "为", "国", "来", "学", "发"),
+    "chi_tra": ("這", "個", "們", "說", "對", "時", "會", "為", "國", "來", "學", "發"),
+    "jpn": ("の", "は", "を", "に", "が", "で", "た", "し", "て", "る"),
+    "kor": ("의", "는", "을", "를", "이", "에", "다", "고", "하", "서"),
+}
+AUTO_LANGUAGE_SHARE = 0.5
+
+# 拆分并行模式：默认每块页数，以及断点清单文件名
+SPLIT_CHUNK_PAGES = 100
+SPLIT_MANIFEST = "manifest.json"
+
+# 日志区域最多保留的行数，更早的行只保存在日志文件中
+LOG_MAX_LINES = 5000
+# 每次刷新日志区域的时间预算（秒），超出部分留到下一次刷新
+LOG_FLUSH_BUDGET = 0.02
+
+# 批量队列中可作为输入的文件类型
+INPUT_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg", ".tif", ".tiff")
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELED = "canceled"
+JOB_STATUS_TEXT = {JOB_QUEUED: "⏳排队中", JOB_RUNNING: "▶️运行中",
+                   JOB_DONE: "✅完成", JOB_FAILED: "❌失败", JOB_CANCELED: "⛔已取消"}
+JOB_FINISHED = (JOB_DONE, JOB_FAILED, JOB_CANCELED)
+# 任务日志中用户选择不再恢复的任务
+JOB_ABANDONED = "abandoned"
+
+# 执行引擎
+ENGINE_SUBPROCESS = "subprocess"
+ENGINE_INPROCESS = "inprocess"
+ENGINE_REMOTE = "remote"
+ENGINE_NAMES = {ENGINE_SUBPROCESS: "子进程", ENGINE_INPROCESS: "进程内(预热)", ENGINE_REMOTE: "分布式(工作节点)"}
+
+# 分布式模式：协调节点默认端口；工作节点超过租约时间未发送心跳即视为失联，任务重新分配，
+# 同一任务最多分配的次数；领取任务的长轮询时间；传输文件的块大小
+REMOTE_PORT = 8765
+REMOTE_LEASE_SECONDS = 30.0
+REMOTE_HEARTBEAT_SECONDS = 2.0
+REMOTE_MAX_ATTEMPTS = 3
+REMOTE_POLL_SECONDS = 20.0
+REMOTE_RETRY_SECONDS = 5.0
+REMOTE_CHUNK_BYTES = 1024 * 1024
+# 协调节点与工作节点共用的访问令牌也可通过此环境变量提供
+REMOTE_TOKEN_ENV = "OCRMYPDF_GUI_TOKEN"
+
+# 处理阶段：页面级阶段按页累计耗时，文档级阶段按实际经过时间计
+STAGES = ("scan", "rasterize", "preprocess", "ocr", "pdfa", "optimize")
+STAGE_NAMES = {"scan": "扫描", "rasterize": "栅格化", "preprocess": "预处理",
+               "ocr": "OCR", "pdfa": "PDF/A", "optimize": "优化"}
+PAGE_STAGES = ("rasterize", "preprocess", "ocr")
+# 日志或进度条文字与处理阶段的对应关系，按顺序匹配
+STAGE_PATTERNS = (
+    ("scan", re.compile(r"scanning contents", re.I)),
+    ("rasterize", re.compile(r"rasteriz", re.I)),
+    ("preprocess", re.compile(r"deskew|unpaper|clean|remove.?background|preprocess", re.I)),
+    ("pdfa", re.compile(r"pdf/a|postprocess|ghostscript", re.I)),
+    ("optimize", re.compile(r"optimi|lineariz|recompress|deflat|jbig2|pngquant", re.I)),
+    ("ocr", re.compile(r"^ocr\b|^image processing|tesseract|hocr|grafting", re.I)),
+)
+# 子进程引擎的 ocrmypdf 插件（通过 --plugin 加载）。输出不是终端时 ocrmypdf 不显示进度条，逐页日志也只在调试级别输出，
+# 插件把进度条更新与调试日志写成以 PROGRESS_LINE_PREFIX 开头的 JSON 行输出到标准错误，由 JobProgress.feed_line 解析：
+# ["progress", [标题, 已完成, 总数]] 或 ["record", [日志, 页码]]
+PROGRESS_LINE_PREFIX = "@@ocrmypdf-gui "
+PROGRESS_PLUGIN_FILE = os.path.join(APP_DIR, "ocrmypdf_gui_progress_plugin.py")
+_PROGRESS_PLUGIN_SOURCE = r'''# 由 OcrMyPDF_GUI 自动生成，修改后会被覆盖
+import json
+import logging
+import sys
+
+from ocrmypdf import hookimpl
+
+PREFIX = @PREFIX@
+
+
+def _emit(kind, payload):
+    sys.stderr.write(PREFIX + json.dumps([kind, payload], ensure_ascii=False) + "\n")
+    sys.stderr.flush()
+
+
+class ProgressBar:
+    def __init__(self, *, total=None, desc=None, unit=None, disable=False, **kwargs):
+        self.total = total
+        self.desc = desc or ""
+        self.completed = 0
+
+    def __enter__(self):
+        _emit("progress", [self.desc, self.completed, self.total])
+        return self
+
+    def __exit__(self, *args):
+        _emit("progress", [self.desc, self.completed, self.total])
+        return False
+
+    def update(self, n=1, *, completed=None):
+        self.completed = completed if completed is not None else self.completed + n
+        _emit("progress", [self.desc, self.completed, self.total])
+
+
+# 挂在根日志器上：ocrmypdf 的工作进程会移除根日志器的处理器，日志经队列转回主进程后只输出一次
+class _DebugHandler(logging.Handler):
+    def emit(self, record):
+        if record.levelno >= logging.INFO or not record.name.startswith("ocrmypdf"):
+            return
+        page = getattr(record, "pageno", None)
+        if isinstance(page, str) and page.strip().isdigit():
+            page = int(page)
+        try:
+            _emit("record", [record.getMessage(), page if isinstance(page, int) else None])
+        except Exception:
+            self.handleError(record)
+
+
+@hookimpl
+def initialize(plugin_manager):
+    logging.getLogger().addHandler(_DebugHandler())
+
+
+@hookimpl
+def get_progressbar_class():
+    return ProgressBar
+'''.replace("@PREFIX@", repr(PROGRESS_LINE_PREFIX))
+# ocrmypdf 输出中以页码开头的日志行
+PAGE_LINE_RE = re.compile(r"^\s*(?P<page>\d+)\s+(?P<text>\S.*)$")
+
+# ocrmypdf 的“其他错误”退出码，用于工作进程内的未知异常
+EXIT_OTHER_ERROR = 15
+# 超时与取消的退出码，与 timeout 命令和 Ctrl+C 的惯例一致
+EXIT_TIMEOUT = 124
+EXIT_CANCELED = 130
+
+# 取消或超时先向整个进程组发送 SIGTERM，等待片刻后仍未退出的用 SIGKILL 结束
+KILL_GRACE_SECONDS = 3.0
+# 设置了每页超时（--tesseract-timeout）时，处于页面级阶段超过其若干倍仍无任何进展即视为卡住
+PAGE_STALL_FACTOR = 2
+# 预处理步骤（空白页检测、语言识别）中单个外部命令的超时秒数
+STEP_COMMAND_TIMEOUT = 600
+# 每个任务的临时目录以此开头并带上进程号，启动时清理异常退出后遗留的目录
+JOB_TEMP_PREFIX = "ocrmypdf_gui_job_"
+# 超时任务的降级步骤：每次重试采用下一个会改变选项的步骤，没有可用步骤时判为失败
+TIMEOUT_DEGRADE_STEPS = (
+    ("去掉 -i、-c 和 --remove-background",
+     {"clean_final": False, "clean": False, "remove_background": False}),
+    ("-O 降为 0 并输出普通 PDF", {"optimize": "0", "output_type": "pdf"}),
+    ("去掉 -d 和 -r", {"deskew": False, "rotate": False}),
+)
+
+
+# 根据选项字典生成 ocrmypdf 参数列表
+def build_ocr_args(options, input_file, output_file, jobs=None):
+    cmd = ["ocrmypdf"]
+    for key, flags, kind in OPTION_SPECS:
+        value = options.get(key)
+        if kind == "flag":
+            if value:
+                cmd.append(flags[0])
+        elif kind == "list":
+            if value:
+                cmd.extend([flags[0], "+".join(value)])
+        elif kind == "optimize":
+            if value is not None:
+                cmd.extend([flags[0], str(OPTIMIZE_AUTO_FALLBACK if value == OPTIMIZE_AUTO else value)])
+        elif kind == "sidecar":
+            if value:
+                cmd.extend([flags[0], sidecar_path(input_file, options.get("sidecar_name", ""))])
+        elif value:
+            cmd.extend([flags[0], str(value)])
+    if jobs:
+        cmd.extend(["--jobs", str(jobs)])
+    cmd.extend(options.get("extra_args") or ())
+    cmd.append(input_file or "-")
+    cmd.append(output_file or "-")
+    return cmd
+
+
+# 展开合写的短参数，例如 "-dc" -> ["-d", "-c"]、"-O2" -> ["-O", "2"]、"-leng" -> ["-l", "eng"]；
+# 开关之后可以跟一个带参数的短参数，其余字符为参数值。含有无法识别的字符时返回 None
+def _expand_short_options(arg, specs):
+    if arg.startswith("--") or len(arg) <= 2 or not arg.startswith("-"):
+        return None
+    expanded = []
+    for index, char in enumerate(arg[1:], 1):
+        flag = "-" + char
+        if flag not in specs and flag not in JOBS_FLAGS:
+            return None
+        expanded.append(flag)
+        if specs.get(flag, (None, None))[1] != "flag":
+            if arg[index + 1:]:
+                expanded.append(arg[index + 1:])
+            break
+    return expanded
+
+
+# build_ocr_args 的逆运算，返回 (选项, 输入文件, 输出文件)，无法识别的参数保存在选项的 extra_args 中。
+# 以 base 为基础，命令能表示的选项先置空再按参数填入；base 为自动优化且 -O 仍是其预览值时保持自动。
+# 最后两个参数为输入与输出文件，"-" 表示未指定
+def parse_ocr_args(argv, base=DEFAULT_OPTIONS):
+    if len(argv) < 3:
+        raise ValueError("命令中缺少输入或输出文件")
+    specs = {flag: (key, kind) for key, flags, kind in OPTION_SPECS for flag in flags}
+    options = dict(base, **{key: OPTION_EMPTY_VALUES[kind] for key, _, kind in OPTION_SPECS})
+    input_file, output_file = ("" if path == "-" else path for path in argv[-2:])
+    args, extra = list(argv[1:-2]), []
+    while args:
+        arg = args.pop(0)
+        expanded = _expand_short_options(arg, specs)
+        if expanded:
+            arg = expanded[0]
+            args[:0] = expanded[1:]
+        name, inline, value = arg.partition("=") if arg.startswith("--") else (arg, "", "")
+        if name not in specs and name not in JOBS_FLAGS:
+            extra.append(arg)
+            continue
+        key, kind = specs.get(name, (None, None))
+        if kind == "flag":
+            options[key] = True
+            continue
+        if not inline:
+            if not args:
+                raise ValueError(f"{name} 缺少参数")
+            value = args.pop(0)
+        if key is None:
+            continue
+        if kind == "list":
+            options[key] = [lang for lang in value.split("+") if lang]
+        elif kind == "int":
+            try:
+                options[key] = int(value)
+            except ValueError:
+                raise ValueError(f"{name} 的参数应为整数：{value}")
+        elif kind == "optimize":
+            if value not in OPTIMIZE_LEVELS:
+                raise ValueError(f"{name} 的参数应为 0～3：{value}")
+            auto = base.get("optimize") == OPTIMIZE_AUTO and value == OPTIMIZE_AUTO_FALLBACK
+            options[key] = OPTIMIZE_AUTO if auto else value
+        elif kind == "sidecar":
+            options["sidecar"] = True
+            options["sidecar_name"] = sidecar_name_for(input_file, value)
+        else:
+            options[key] = value
+    options["extra_args"] = extra
+    return options, input_file, output_file
+
+
+# 命令预览按当前平台的规则给含空格、引号的参数加引号，split_command 可将其还原为同样的参数列表
+def format_command(argv):
+    return subprocess.list2cmdline(argv) if os.name == "nt" else shlex.join(argv)
+
+
+# Windows 上按 list2cmdline 对应的规则拆分：反斜杠只在双引号前转义，双引号内的空白不拆分
+def split_command(text):
+    if os.name != "nt":
+        return shlex.split(text)
+    args, current, quoted, backslashes, in_arg = [], [], False, 0, False
+    for char in text:
+        if char == "\\":
+            backslashes += 1
+            in_arg = True
+            continue
+        if char == '"':
+            current.append("\\" * (backslashes // 2))
+            if backslashes % 2:
+                current.append('"')
+            else:
+                quoted = not quoted
+            backslashes, in_arg = 0, True
+            continue
+        current.append("\\" * backslashes)
+        backslashes = 0
+        if char.isspace() and not quoted:
+            if in_arg:
+                args.append("".join(current))
+                current, in_arg = [], False
+            continue
+        current.append(char)
+        in_arg = True
+    current.append("\\" * backslashes)
+    if quoted:
+        raise ValueError("引号不成对")
+    if in_arg:
+        args.append("".join(current))
+    return args
+
+
+# 根据选项字典生成 ocrmypdf.ocr() 的关键字参数，与 build_ocr_args 一一对应
+def build_ocr_kwargs(options, input_file, jobs=None):
+    kwargs = {}
+    if options.get("languages"):
+        kwargs["language"] = list(options["languages"])
+    for key, name in (("rotate", "rotate_pages"), ("remove_background", "remove_background"),
+                      ("deskew", "deskew"), ("clean", "clean"),
+                      ("clean_final", "clean_final"), ("force_ocr", "force_ocr"),
+                      ("skip_text", "skip_text"), ("redo_ocr", "redo_ocr")):
+        if options.get(key):
+            kwargs[name] = True
+    if options.get("output_type"):
+        kwargs["output_type"] = options["output_type"]
+    if options.get("optimize") is not None:
+        level = options["optimize"]
+        kwargs["optimize"] = int(OPTIMIZE_AUTO_FALLBACK if level == OPTIMIZE_AUTO else level)
+    if options.get("tesseract_timeout"):
+        kwargs["tesseract_timeout"] = float(options["tesseract_timeout"])
+    if jobs:
+        kwargs["jobs"] = jobs
+    if options.get("sidecar"):
+        kwargs["sidecar"] = sidecar_path(input_file, options.get("sidecar_name", ""))
+    for key in ("pages", "title", "author", "subject", "keywords"):
+        if options.get(key):
+            kwargs[key] = options[key]
+    kwargs.update(extra_args_kwargs(options.get("extra_args")))
+    return kwargs
+
+
+# 把附加参数（options["extra_args"]）转换为 ocrmypdf.ocr() 的关键字参数：用 ocrmypdf 自己的命令行解析器
+# （连同参数中 --plugin 指定的插件选项）解析，取与默认值不同的选项。ocr() 按 "--参数名 值" 还原命令行，
+# 无法这样还原的选项（计数、关闭型开关等）与无法解析的参数报 ValueError
+def extra_args_kwargs(extra_args):
+    if not extra_args:
+        return {}
+    try:
+        from ocrmypdf._plugin_manager import get_plugin_manager
+        from ocrmypdf.cli import get_parser, plugins_only_parser
+    except ImportError as e:
+        raise ValueError(f"无法加载 ocrmypdf 的参数解析器：{e}") from None
+    files = ["input.pdf", "output.pdf"]
+    try:
+        plugins = plugins_only_parser.parse_known_args(args=[*extra_args, *files])[0].plugins
+        parser = get_parser()
+        manager = get_plugin_manager(plugins)
+        manager.hook.initialize(plugin_manager=manager)
+        manager.hook.add_options(parser=parser)
+        parser.enable_api_mode()
+        defaults = vars(parser.parse_args(files))
+        values = vars(parser.parse_args([*extra_args, *files]))
+    except (ValueError, SystemExit) as e:
+        raise ValueError(f"无法解析附加参数 {format_command(extra_args)}：{e}") from None
+    actions = {action.dest: action for action in parser._actions}
+    kwargs = {}
+    for dest, value in values.items():
+        if value == defaults.get(dest) or dest in ("input_file", "output_file"):
+            continue
+        action = actions.get(dest)
+        if dest == "plugins":
+            kwargs[dest] = value
+            continue
+        if isinstance(value, (list, tuple, set)) and not isinstance(value, str):
+            value = [str(item) for item in value]
+        if (action is None or f"--{dest.replace('_', '-')}" not in action.option_strings
+                or value is False or (action.nargs == 0 and value is not True)
+                or not isinstance(value, (bool, int, float, str, list))):
+            raise ValueError(f"附加参数 {'/'.join(action.option_strings) if action else dest} "
+                             f"无法传给进程内引擎")
+        kwargs[dest] = value
+    return kwargs
+
+
+# sidecar 文件放在输入文件所在目录；未指定名称时使用输入文件名
+def sidecar_path(input_path, sidecar=""):
+    if not sidecar:
+        base, _ = os.path.splitext(input_path)
+        sidecar = os.path.basename(base) + ".txt"
+    else:
+        if not os.path.splitext(sidecar)[1]:
+            sidecar += ".txt"
+    dir_in = os.path.dirname(
+        input_path) if os.path.dirname(input_path) else "."
+    return os.path.join(dir_in, sidecar).replace("\\", "/")
+
+
+# sidecar_path 的逆运算：返回使 sidecar_path(input_path, 名称) 得到 path 的名称
+def sidecar_name_for(input_path, path):
+    if path == sidecar_path(input_path):
+        return ""
+    dir_in = os.path.dirname(input_path) or "."
+    if os.path.normpath(os.path.dirname(path) or ".") != os.path.normpath(dir_in):
+        return os.path.abspath(path)
+    name = os.path.basename(path)
+    stem, ext = os.path.splitext(name)
+    return stem if ext == ".txt" and not os.path.splitext(stem)[1] else name
+
+
+# 展开文件与文件夹列表，返回所有可处理的输入文件
+def collect_input_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, _, filenames in os.walk(path):
+                for name in sorted(filenames):
+                    if name.lower().endswith(INPUT_EXTENSIONS) and not name.endswith("_ocr.pdf"):
+                        files.append(os.path.join(dirpath, name))
+        elif os.path.isfile(path):
+            files.append(path)
+    return files
+
+
+# 批量任务的默认输出路径：输出目录（或输入目录）下的“文件名_ocr.pdf”
+def default_output_path(input_path, output_dir=""):
+    base = os.path.splitext(os.path.basename(input_path))[0]
+    return os.path.join(output_dir or os.path.dirname(input_path), f"{base}_ocr.pdf")
+
+
+# 读取 PDF 页数；未安装 pikepdf 或不是 PDF 时返回 None
+def count_pdf_pages(path):
+    if not path.lower().endswith(".pdf"):
+        return None
+    try:
+        import pikepdf
+    except ImportError:
+        return None
+    try:
+        with pikepdf.open(path) as pdf:
+            return len(pdf.pages)
+    except Exception:
+        return None
+
+
+# 扫描内容流中的文字、图像与矢量绘制，Form XObject 递归检查
+def _scan_content(pikepdf, owner, resources, depth=0):
+    found = {"visible_text": False, "invisible_text": False, "image": False, "vector": False}
+    xobjects = resources.get("/XObject", {}) if resources is not None else {}
+    render_mode = 0
+    for instruction in pikepdf.parse_content_stream(owner, "Tr Tj TJ ' \" Do m re"):
+        op = str(instruction.operator)
+        if op == "Tr":
+            render_mode = int(instruction.operands[0])
+        elif op in ("Tj", "TJ", "'", '"'):
+            found["invisible_text" if render_mode == 3 else "visible_text"] = True
+        elif op in ("m", "re"):
+            found["vector"] = True
+        elif op == "Do":
+            xobject = xobjects.get(instruction.operands[0])
+            if xobject is None:
+                continue
+            subtype = xobject.get("/Subtype")
+            if subtype == "/Image":
+                if int(xobject.get("/Width", 0)) * int(xobject.get("/Height", 0)) >= PREFLIGHT_MIN_IMAGE_PIXELS:
+                    found["image"] = True
+            elif subtype == "/Form" and depth < 3:
+                inner = _scan_content(pikepdf, xobject, xobject.get("/Resources", resources), depth + 1)
+                for key, value in inner.items():
+                    found[key] = found[key] or value
+    return found
+
+
+# 不栅格化，仅检查内容流，将每页分为 text/image/mixed/vector/blank
+def scan_text_layer(input_path):
+    import pikepdf
+    classes = []
+    with pikepdf.open(input_path) as pdf:
+        for page in pdf.pages:
+            found = _scan_content(pikepdf, page, page.obj.get("/Resources"))
+            if not found["image"]:
+                # 内联图像无法通过操作符过滤取得，直接在原始内容中查找
+                contents = page.obj.get("/Contents")
+                streams = contents if isinstance(contents, pikepdf.Array) else [contents] if contents is not None else []
+                raw = b"".join(stream.read_bytes() for stream in streams)
+                found["image"] = re.search(rb"\bBI\b.*?\bID\b", raw, re.S) is not None
+            has_text = found["visible_text"] or found["invisible_text"]
+            if has_text and found["image"]:
+                classes.append("mixed")
+            elif has_text:
+                classes.append("text")
+            elif found["image"]:
+                classes.append("image")
+            elif found["vector"]:
+                classes.append("vector")
+            else:
+                classes.append("blank")
+    return classes
+
+
+# 需要 OCR 的页（从 1 开始）：纯图像页和可能是轮廓文字的矢量页；
+# 混合页已含文字层，只有在强制 OCR 或重做 OCR 时才需要
+def pages_needing_ocr(classes, include_mixed=False):
+    wanted = {"image", "vector"} | ({"mixed"} if include_mixed else set())
+    return [index + 1 for index, page_class in enumerate(classes) if page_class in wanted]
+
+
+# 读取 Ghostscript pgmraw 设备输出的 8 位灰度 PGM（P5）
+def read_pgm(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    fields, pos = [], 0
+    while len(fields) < 4:
+        while data[pos:pos + 1].isspace():
+            pos += 1
+        if data[pos:pos + 1] == b"#":
+            pos = data.index(b"\n", pos)
+            continue
+        end = pos
+        while not data[end:end + 1].isspace():
+            end += 1
+        fields.append(data[pos:end])
+        pos = end
+    if fields[0] != b"P5" or int(fields[3]) > 255:
+        raise ValueError(f"不支持的 PGM 文件：{path}")
+    width, height = int(fields[1]), int(fields[2])
+    return width, height, data[pos + 1:pos + 1 + width * height]
+
+
+# 墨迹覆盖率：去掉页边后，比纸张底色暗 PAGE_FILTER_INK_CONTRAST 以上的像素所占比例
+def page_ink_coverage(width, height, pixels):
+    mx, my = int(width * PAGE_FILTER_MARGIN), int(height * PAGE_FILTER_MARGIN)
+    region = b"".join(pixels[y * width + mx:(y + 1) * width - mx] for y in range(my, height - my))
+    if not region:
+        return 0.0
+    histogram = collections.Counter(region)
+    half, seen = len(region) / 2, 0
+    for level in range(256):
+        seen += histogram[level]
+        if seen >= half:
+            break
+    threshold = level - PAGE_FILTER_INK_CONTRAST
+    return sum(histogram[value] for value in range(max(threshold, 0))) / len(region)
+
+
+# 差值哈希：将页面缩成 (size+1)×size 的块均值，比较每行相邻两块的明暗（左侧明显更亮时为 1）。
+# 返回 (哈希, 掩码)，掩码中相邻两块有任一块比纸张底色（块均值的中位数）明显更暗的位为 1
+def page_dhash(width, height, pixels, size=PAGE_FILTER_HASH_SIZE):
+    cols = [width * i // (size + 1) for i in range(size + 2)]
+    rows = [height * i // size for i in range(size + 1)]
+    grid = []
+    for r in range(size):
+        sums = [0] * (size + 1)
+        for y in range(rows[r], rows[r + 1]):
+            line = pixels[y * width:(y + 1) * width]
+            for c in range(size + 1):
+                sums[c] += sum(line[cols[c]:cols[c + 1]])
+        count = max(1, rows[r + 1] - rows[r])
+        grid.append([sums[c] / count / max(1, cols[c + 1] - cols[c]) for c in range(size + 1)])
+    paper = sorted(cell for cells in grid for cell in cells)[len(grid) * (size + 1) // 2]
+    value = mask = 0
+    for cells in grid:
+        for c in range(size):
+            value = (value << 1) | (cells[c] > cells[c + 1] + PAGE_FILTER_HASH_TOLERANCE)
+            mask = (mask << 1) | (min(cells[c], cells[c + 1]) < paper - PAGE_FILTER_HASH_TOLERANCE)
+    return value, mask
+
+
+# 哈希不同的位数占两页有内容位数的比例
+def dhash_distance(first, second):
+    (value, mask), (other_value, other_mask) = first, second
+    active = max(bin(mask | other_mask).count("1"), PAGE_FILTER_MIN_ACTIVE_BITS)
+    return bin(value ^ other_value).count("1") / active
+
+
+# 将页面缩成 block 像素见方的块均值，返回 (列数, 行数, 块灰度)
+def page_blocks(width, height, pixels, block=PAGE_FILTER_BLOCK):
+    columns, rows = width // block, height // block
+    values = bytearray(columns * rows)
+    for row in range(rows):
+        lines = [pixels[(row * block + dy) * width:(row * block + dy) * width + columns * block]
+                 for dy in range(block)]
+        for column in range(columns):
+            total = sum(sum(line[column * block:(column + 1) * block]) for line in lines)
+            values[row * columns + column] = total // (block * block)
+    return columns, rows, bytes(values)
+
+
+# 逐块比较两页：尺寸须一致，有墨迹的块中灰度差超过 tolerance 的块所占比例不超过 mismatch
+# （mismatch 为 0 时要求每一块都在容差之内）
+def blocks_match(first, second, tolerance=PAGE_FILTER_BLOCK_TOLERANCE, mismatch=PAGE_FILTER_BLOCK_MISMATCH):
+    if first[:2] != second[:2]:
+        return False
+    values, other_values = first[2], second[2]
+    paper = sorted(values)[len(values) // 2] if values else 255
+    ink = paper - PAGE_FILTER_INK_CONTRAST // 2
+    inked = mismatched = 0
+    for value, other in zip(values, other_values):
+        if value < ink or other < ink:
+            inked += 1
+            mismatched += abs(value - other) > tolerance
+    return mismatched <= inked * mismatch
+
+
+def _tesseract():
+    path = shutil.which("tesseract")
+    if not path:
+        raise OSError("未找到 tesseract")
+    return path
+
+
+# 各语言在识别文本中的特征得分：拉丁文字按常用词计，中日韩文字按特征字计
+def language_marker_scores(text, languages):
+    words = collections.Counter(re.findall(r"[^\W\d_]+", text.lower()))
+    chars = collections.Counter(text)
+    scores = {}
+    for lang in languages:
+        markers = LANGUAGE_MARKERS.get(lang, ())
+        counter = words if "Latin" in LANGUAGE_SCRIPTS.get(lang, ()) else chars
+        scores[lang] = sum(counter[marker] for marker in markers)
+    return scores
+
+
+# 运行预处理步骤中的外部命令，参数与返回值同 subprocess.run(capture_output=True)。命令自成进程组，
+# 给出 job 时登记为任务的进程组，取消或超时时随任务一起结束，结束后抛出 InterruptedError；
+# 超过 timeout 秒时结束整个进程组并抛出 subprocess.TimeoutExpired
+def run_step_command(cmd, job=None, timeout=STEP_COMMAND_TIMEOUT, check=False, text=False):
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=text,
+                            encoding="utf-8" if text else None, errors="replace" if text else None,
+                            **process_group_kwargs())
+    if job is not None:
+        job.process_group = proc.pid
+        if job.cancel_reason:
+            cancel_job_processes(job)
+    try:
+        stdout, stderr = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        terminate_process_group(proc.pid)
+        proc.communicate()
+        raise
+    finally:
+        if job is not None:
+            job.process_group = None
+    if job is not None and job.cancel_reason:
+        raise InterruptedError("任务已取消")
+    if check and proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stdout, stderr)
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+
+# 抽样若干页（跳过 exclude 中的页），先用 tesseract OSD 判断文字类型，
+# 同一文字下有多个候选语言时再用这些语言识别一次，按常用词/特征字得分选出语言。
+# 返回 {"languages": 选用的语言（保持候选顺序）, "samples": 各页判断依据, "fallback": 是否未能判断}
+def detect_languages(input_path, candidates, exclude=(), samples=AUTO_LANGUAGE_SAMPLES, job=None):
+    tesseract = _tesseract()
+    chosen, details = set(), []
+    with tempfile.TemporaryDirectory(prefix="ocrmypdf_lang_") as tmp_dir:
+        if input_path.lower().endswith(".pdf"):
+            total = count_pdf_pages(input_path) or 1
+            pages = [page for page in range(1, total + 1) if page not in set(exclude)] or [1]
+            step = max(1, len(pages) // samples)
+            images = []
+            for page in pages[step // 2::step][:samples]:
+                image = os.path.join(tmp_dir, f"p{page}.pgm")
+                run_step_command([_ghostscript(), "-q", "-dNOPAUSE", "-dBATCH", "-dSAFER", "-sDEVICE=pgmraw",
+                                  f"-r{AUTO_LANGUAGE_DPI}", f"-dFirstPage={page}", f"-dLastPage={page}",
+                                  f"-sOutputFile={image}", input_path], job, check=True)
+                images.append((page, image))
+        else:
+            images = [(1, input_path)]
+        for page, image in images:
+            osd = run_step_command([tesseract, image, "stdout", "--psm", "0"], job, text=True).stdout
+            script = re.search(r"^Script:\s*(\S+)", osd, re.M)
+            confidence = re.search(r"^Script confidence:\s*([\d.]+)", osd, re.M)
+            detail = {"page": page, "script": script.group(1) if script else None,
+                      "script_confidence": float(confidence.group(1)) if confidence else 0.0}
+            group = [lang for lang in candidates if detail["script"] in LANGUAGE_SCRIPTS.get(lang, ())]
+            if len(group) > 1:
+                text = run_step_command([tesseract, image, "stdout", "-l", "+".join(group), "--psm", "3"],
+                                        job, text=True).stdout
+                scores = language_marker_scores(text, group)
+                best = max(scores.values())
+                group = [lang for lang in group if best and scores[lang] >= best * AUTO_LANGUAGE_SHARE] or group[:1]
+                detail["scores"] = scores
+            detail["languages"] = group
+            chosen.update(group)
+            details.append(detail)
+    languages = [lang for lang in candidates if lang in chosen]
+    return {"languages": languages or list(candidates), "samples": details, "fallback": not languages}
+
+
+def language_report(result, candidates):
+    parts = []
+    for detail in result["samples"]:
+        text = f"第 {detail['page']} 页 {detail['script'] or '未知'}（置信度 {detail['script_confidence']:.1f}）"
+        if detail.get("scores"):
+            text += " " + "/".join(f"{lang} {score}" for lang, score in detail["scores"].items())
+        parts.append(text)
+    decision = "+".join(result["languages"])
+    if result["fallback"]:
+        decision += "（未能判断，使用全部候选语言）"
+    return f"自动识别语言：{'；'.join(parts)} → 选用 {decision}，候选 {'+'.join(candidates)}"
+
+
+# 运行命令并返回其 CPU 秒数（含已回收的子孙进程）；没有 wait4 时用 psutil 采样，也没有 psutil 时以经过时间代替。
+# 给出 job 时把进程登记为任务的进程组，取消或超时时随任务一起结束
+def _run_cpu_seconds(cmd, job=None):
+    started = time.monotonic()
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **process_group_kwargs())
+    if job is not None:
+        job.process_group = proc.pid
+        if job.cancel_reason:
+            cancel_job_processes(job)
+    try:
+        if hasattr(os, "wait4"):
+            _, status, ru = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            cpu = ru.ru_utime + ru.ru_stime
+        else:
+            sampler = ResourceSampler(proc.pid).start()
+            proc.wait()
+            resources = sampler.stop()
+            cpu = resources["cpu_user"] + resources["cpu_system"] or time.monotonic() - started
+    finally:
+        if job is not None:
+            job.process_group = None
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return cpu
+
+
+# 自动优化：均匀抽样几页（跳过 exclude 中的页）另存为小 PDF，用 --tesseract-timeout 0 关闭 OCR，
+# 未指定 --force-ocr 或 --redo-ocr 时加上 --skip-text（已有文字的页否则会使 ocrmypdf 以退出码 6 结束），
+# 其余选项不变，依次按 -O 0～3 处理并记录输出大小与 CPU 时间；给出 job 时试算进程随任务取消，
+# 每级之间发现任务已取消则抛出 InterruptedError。从 -O 0 开始逐级比较，
+# 更高一级比当前选用的级别每多用 1 CPU 秒至少多节省 target 字节时才改用该级别。
+# 返回 {"level": 选用级别, "target": 目标, "pages": 抽样页, "trials": {级别: {"bytes", "cpu"}}}
+def choose_optimize_level(input_path, options, target=OPTIMIZE_AUTO_TARGET, exclude=(),
+                          samples=OPTIMIZE_AUTO_SAMPLES, job=None):
+    trial_options = dict(options, tesseract_timeout=0, sidecar=False, pages="", auto_language=False,
+                         title="", author="", subject="", keywords="")
+    if not (options.get("force_ocr") or options.get("redo_ocr")):
+        trial_options["skip_text"] = True
+    with tempfile.TemporaryDirectory(prefix="ocrmypdf_optimize_") as tmp_dir:
+        if input_path.lower().endswith(".pdf"):
+            try:
+                import pikepdf
+            except ImportError:
+                raise OSError("未安装 pikepdf，无法抽样")
+            sample_path = os.path.join(tmp_dir, "sample.pdf")
+            with pikepdf.open(input_path) as pdf:
+                total = len(pdf.pages)
+                pages = [page for page in range(1, total + 1) if page not in set(exclude)] or [1]
+                step = max(1, len(pages) // samples)
+                pages = pages[step // 2::step][:samples]
+                with pikepdf.new() as sample:
+                    sample.pages.extend(pdf.pages[page - 1] for page in pages)
+                    sample.save(sample_path)
+        else:
+            sample_path, pages = input_path, [1]
+        trials = {}
+        for level in OPTIMIZE_LEVELS:
+            if job is not None and job.cancel_reason:
+                raise InterruptedError("任务已取消，停止自动优化试算")
+            output = os.path.join(tmp_dir, f"O{level}.pdf")
+            cmd = build_ocr_args(dict(trial_options, optimize=level), sample_path, output)
+            cmd[-2:-2] = ["--tesseract-timeout", "0"]
+            cpu = _run_cpu_seconds(cmd, job)
+            trials[level] = {"bytes": os.path.getsize(output), "cpu": round(cpu, 3)}
+    level = OPTIMIZE_LEVELS[0]
+    for candidate in OPTIMIZE_LEVELS[1:]:
+        saved = trials[level]["bytes"] - trials[candidate]["bytes"]
+        extra = max(trials[candidate]["cpu"] - trials[level]["cpu"], OPTIMIZE_AUTO_MIN_CPU)
+        if saved > 0 and saved / extra >= target:
+            level = candidate
+    return {"level": level, "target": target, "pages": pages, "trials": trials}
+
+
+def optimize_report(result):
+    trials = result["trials"]
+    base = trials[OPTIMIZE_LEVELS[0]]
+    parts = [f"-O {OPTIMIZE_LEVELS[0]} {format_bytes(base['bytes'])} / {base['cpu']:.2f}s"]
+    for level in OPTIMIZE_LEVELS[1:]:
+        saved = base["bytes"] - trials[level]["bytes"]
+        parts.append(f"-O {level} 节省 {format_bytes(saved) or '0'}（{100 * saved / max(base['bytes'], 1):.0f}%）"
+                     f" / {trials[level]['cpu']:.2f}s")
+    return (f"自动优化：抽样第 {format_page_ranges(result['pages'])} 页，{'；'.join(parts)} → "
+            f"选用 -O {result['level']}（目标每 CPU 秒节省 {format_bytes(result['target'])}）")
+
+
+def _ghostscript():
+    for name in ("gs", "gswin64c", "gswin32c"):
+        path = shutil.which(name)
+        if path:
+            return path
+    raise OSError("未找到 Ghostscript")
+
+
+# 按页面图像（依次产生 (宽, 高, 灰度像素) 的可迭代对象）找出近乎空白的页、与紧邻的上一页几乎逐块相同的页（重新进纸），
+# 以及与之前某页相似的页（只报告，不跳过）。
+# 返回 {"pages": 总页数, "blank": [页码], "duplicate": [(页码, 上一页页码)], "similar": [(页码, 相似的页码)]}
+def classify_pages(images):
+    blank, duplicate, similar, hashes = [], [], [], []
+    previous, pages = None, 0
+    for page, (width, height, pixels) in enumerate(images, 1):
+        pages = page
+        if page_ink_coverage(width, height, pixels) < PAGE_FILTER_BLANK_COVERAGE:
+            blank.append(page)
+            previous = None
+            continue
+        value = page_dhash(width, height, pixels)
+        blocks = page_blocks(width, height, pixels)
+        fine = page_blocks(width, height, pixels, PAGE_FILTER_EXACT_BLOCK)
+        if (previous and previous[0] == page - 1
+                and dhash_distance(value, previous[1]) <= PAGE_FILTER_DUPLICATE_RATIO
+                and blocks_match(fine, previous[2], PAGE_FILTER_EXACT_TOLERANCE, 0)):
+            duplicate.append((page, previous[0]))
+        else:
+            original = next((other for other, other_value, other_blocks in hashes
+                             if dhash_distance(value, other_value) <= PAGE_FILTER_DUPLICATE_RATIO
+                             and blocks_match(blocks, other_blocks)), None)
+            if original:
+                similar.append((page, original))
+            hashes.append((page, value, blocks))
+        previous = (page, value, fine)
+    return {"pages": pages, "blank": blank, "duplicate": duplicate, "similar": similar}
+
+
+# 低分辨率栅格化每页后按 classify_pages 分类
+def detect_skippable_pages(input_path, dpi=PAGE_FILTER_DPI, job=None):
+    with tempfile.TemporaryDirectory(prefix="ocrmypdf_pages_") as tmp_dir:
+        run_step_command([_ghostscript(), "-q", "-dNOPAUSE", "-dBATCH", "-dSAFER", "-sDEVICE=pgmraw",
+                          f"-r{dpi}", f"-sOutputFile={os.path.join(tmp_dir, 'p%06d.pgm')}", input_path],
+                         job, check=True)
+        names = sorted(name for name in os.listdir(tmp_dir) if name.endswith(".pgm"))
+        return classify_pages(read_pgm(os.path.join(tmp_dir, name)) for name in names)
+
+
+def page_filter_report(result):
+    duplicates = "、".join(f"{page}(同{original})" for page, original in result["duplicate"])
+    text = (f"空白页 {len(result['blank'])} 页（{format_page_ranges(result['blank']) or '无'}），"
+            f"重复页 {len(result['duplicate'])} 页（{duplicates or '无'}）")
+    if result.get("similar"):
+        similar = "、".join(f"{page}(似{original})" for page, original in result["similar"])
+        text += f"；另有相似页 {len(result['similar'])} 页（{similar}），照常处理"
+    return text
+
+
+# 删除指定页（从 1 开始）后另存，其余结构与文档信息保持不变
+def write_pdf_without_pages(input_path, output_path, pages):
+    import pikepdf
+    with pikepdf.open(input_path) as pdf:
+        for page in sorted(pages, reverse=True):
+            del pdf.pages[page - 1]
+        pdf.save(output_path)
+
+
+# 渲染第 first~last 页的缩略图（等比缩放到 THUMBNAIL_SIZE 以内的 PNG），返回 {页码: PNG 数据}
+def render_thumbnails(input_path, first, last, size=THUMBNAIL_SIZE):
+    width, height = size
+    with tempfile.TemporaryDirectory(prefix="ocrmypdf_thumbs_") as tmp_dir:
+        subprocess.run([_ghostscript(), "-q", "-dNOPAUSE", "-dBATCH", "-dSAFER", "-sDEVICE=png16m",
+                        f"-g{width}x{height}", "-dFIXEDMEDIA", "-dPDFFitPage",
+                        "-dTextAlphaBits=4", "-dGraphicsAlphaBits=4", f"-dFirstPage={first}", f"-dLastPage={last}",
+                        f"-sOutputFile={os.path.join(tmp_dir, 'p%06d.png')}", input_path],
+                       check=True, capture_output=True)
+        thumbnails = {}
+        for page, name in enumerate(sorted(os.listdir(tmp_dir)), first):
+            with open(os.path.join(tmp_dir, name), "rb") as f:
+                thumbnails[page] = f.read()
+    return thumbnails
+
+
+# 将页码列表压缩为 ocrmypdf --pages 的格式，例如 [1, 2, 3, 5] -> "1-3,5"
+def format_page_ranges(pages):
+    ranges = []
+    for page in sorted(set(pages)):
+        if ranges and page == ranges[-1][1] + 1:
+            ranges[-1][1] = page
+        else:
+            ranges.append([page, page])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+
+# 解析 --pages 格式的页码范围，例如 "1-3,5" -> [1, 2, 3, 5]；空文本返回空列表，
+# 格式错误、页码为 0、范围倒置或超出总页数时抛出 ValueError
+def parse_page_ranges(text, total):
+    pages = set()
+    if not text.strip():
+        return []
+    for part in text.split(","):
+        first, dash, last = (value.strip() for value in part.partition("-"))
+        if not first.isdigit() or (dash and not last.isdigit()):
+            raise ValueError(f"页码格式错误：{part.strip() or '（空）'}")
+        first, last = int(first), int(last) if dash else int(first)
+        if first < 1 or last < first:
+            raise ValueError(f"页码范围无效：{part.strip()}")
+        if last > total:
+            raise ValueError(f"页码超出范围（共 {total} 页）：{part.strip()}")
+        pages.update(range(first, last + 1))
+    return sorted(pages)
+
+
+def preflight_report(classes, pages):
+    counts = collections.Counter(classes)
+    detail = "、".join(f"{PAGE_CLASS_NAMES[name]} {counts[name]}" for name in PAGE_CLASS_NAMES if counts[name])
+    return (f"预检：共 {len(classes)} 页（{detail}），需要 OCR {len(pages)} 页，"
+            f"免去 {len(classes) - len(pages)} 页")
+
+
+def classify_stage(text):
+    for stage, pattern in STAGE_PATTERNS:
+        if pattern.search(text):
+            return stage
+    return None
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "--"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+# 单个任务的进度：页数、吞吐量、剩余时间与各阶段耗时；
+# 由执行线程写入、界面线程读取，因此所有访问都加锁
+class JobProgress:
+    def __init__(self, pages_total=None):
+        self._lock = threading.Lock()
+        self.pages_total = pages_total
+        self.pages_done = 0
+        self.stage = None
+        self.stage_times = {stage: 0.0 for stage in STAGES}
+        self._page_stages = {}
+        self._ocr_pages = set()
+        self._doc_stage = None
+        self._page_detail = False
+        # 收到 OCR 进度条后以进度条的页数为准，不再按逐页日志估算
+        self._bar_pages = False
+        self._started = time.monotonic()
+        self._ocr_started = None
+        self._finished = None
+        # 最近一次收到进度或日志的时间，用于判断任务是否卡住
+        self.last_activity = self._started
+
+    # 解析子进程输出的一行；进度插件输出的结构化行返回 True，调用方不必再写入日志
+    def feed_line(self, line):
+        if line.startswith(PROGRESS_LINE_PREFIX):
+            try:
+                kind, payload = json.loads(line[len(PROGRESS_LINE_PREFIX):])
+                if kind == "progress":
+                    self.feed_bar(*payload)
+                elif kind == "record":
+                    self.feed_record(*payload)
+            except (ValueError, TypeError):
+                pass
+            return True
+        match = PAGE_LINE_RE.match(line)
+        if match:
+            self.feed_record(match.group("text"), int(match.group("page")))
+        else:
+            self.feed_record(line)
+        return False
+
+    # 进度条事件：desc 为 ocrmypdf 的进度条标题
+    def feed_bar(self, desc, completed, total):
+        self.last_activity = time.monotonic()
+        stage = classify_stage(desc)
+        if stage is None:
+            return
+        with self._lock:
+            if stage == "ocr" and total:
+                self._bar_pages = True
+                self.pages_total = int(total)
+                self.pages_done = int(completed)
+            self._enter(stage, None, time.monotonic())
+
+    # 日志记录：page 为日志所属页码（文档级日志为 None）
+    def feed_record(self, text, page=None):
+        self.last_activity = time.monotonic()
+        stage = classify_stage(text)
+        if stage is None:
+            return
+        with self._lock:
+            if page is not None and stage in PAGE_STAGES:
+                self._page_detail = True
+                if stage == "ocr" and not self._bar_pages:
+                    self._ocr_pages.add(page)
+                    self.pages_done = max(self.pages_done, len(self._ocr_pages) - 1)
+            self._enter(stage, page if stage in PAGE_STAGES else None, time.monotonic())
+
+    def _enter(self, stage, page, now):
+        if stage in PAGE_STAGES and self._ocr_started is None:
+            self._ocr_started = now
+        if page is not None:
+            if self._doc_stage and self._doc_stage[0] not in PAGE_STAGES:
+                self._close_doc_stage(now)
+            previous = self._page_stages.get(page)
+            if previous and previous[0] == stage:
+                return
+            if previous:
+                self.stage_times[previous[0]] += now - previous[1]
+            self._page_stages[page] = (stage, now)
+        else:
+            if self._doc_stage and self._doc_stage[0] == stage:
+                return
+            self._close_doc_stage(now)
+            if stage not in PAGE_STAGES:
+                self._close_page_stages(now)
+                if self.pages_total:
+                    self.pages_done = self.pages_total
+            self._doc_stage = (stage, now)
+        self.stage = stage
+
+    def _close_doc_stage(self, now):
+        if self._doc_stage:
+            stage, start = self._doc_stage
+            # 已有逐页明细时，页面级阶段不再按整段时间重复计入
+            if not (self._page_detail and stage in PAGE_STAGES):
+                self.stage_times[stage] += now - start
+            self._doc_stage = None
+
+    def _close_page_stages(self, now):
+        for stage, start in self._page_stages.values():
+            self.stage_times[stage] += now - start
+        self._page_stages.clear()
+
+    # 由外部直接设置页数（拆分任务按已完成分块汇总）
+    def set_pages(self, done, total=None):
+        with self._lock:
+            if self._ocr_started is None:
+                self._ocr_started = self._started
+            self.pages_done = done
+            if total is not None:
+                self.pages_total = total
+
+    def finish(self, success):
+        with self._lock:
+            now = time.monotonic()
+            self._close_doc_stage(now)
+            self._close_page_stages(now)
+            if success and self.pages_total:
+                self.pages_done = self.pages_total
+            self.stage = None
+            self._finished = now
+
+    def snapshot(self):
+        with self._lock:
+            now = self._finished or time.monotonic()
+            rate = None
+            if self._ocr_started is not None and self.pages_done:
+                rate = self.pages_done / max(now - self._ocr_started, 1e-6)
+            eta = None
+            if rate and self.pages_total and self._finished is None:
+                eta = max(self.pages_total - self.pages_done, 0) / rate
+            stage_times = dict(self.stage_times)
+            for page_stage, start in self._page_stages.values():
+                stage_times[page_stage] += now - start
+            if self._doc_stage and not (self._page_detail and self._doc_stage[0] in PAGE_STAGES):
+                stage_times[self._doc_stage[0]] += now - self._doc_stage[1]
+            return {
+                "pages_total": self.pages_total,
+                "pages_done": self.pages_done,
+                "pages_per_sec": rate,
+                "eta": eta,
+                "stage": self.stage,
+                "stage_seconds": {stage: round(value, 3) for stage, value in stage_times.items()},
+            }
+
+
+def load_profile(path):
+    with open(path, encoding="utf-8") as f:
+        profile = json.load(f)
+    options = dict(DEFAULT_OPTIONS)
+    options.update({key: value for key, value in profile.items() if key in DEFAULT_OPTIONS})
+    return options
+
+
+def save_profile(path, options):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(options, f, ensure_ascii=False, indent=2)
+
+
+class OCRJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, input_path, output_path, options):
+        self.id = next(OCRJob._ids)
+        self.input_path = input_path
+        self.output_path = output_path
+        self.options = options
+        self.status = JOB_QUEUED
+        self.jobs = None
+        self.return_code = None
+        self.started_at = None
+        self.finished_at = None
+        self.progress = JobProgress()
+        self.use_cache = True
+        self.cached = False
+        self.preflight = False
+        # 空白页与重复页：page_filter 为 PAGE_FILTER_MODES 的键；删除页面时 work_input 为删除后的临时输入
+        self.page_filter = ""
+        self.skipped_pages = []
+        self.work_input = None
+        # 本地暂存：暂存的输入与输出路径，以及完成后需要上传的 (本地文件, 目标路径)
+        self.staging = None
+        self.staged_input = None
+        self.staged_output = None
+        self.uploads = []
+        self.resources = None
+        self.engine_name = None
+        self.cache_key = None
+        # 内存准入：页面信息、修正后的预估峰值内存，以及用于学习修正系数的未修正估算值
+        self.geometry = None
+        self.memory_estimate = None
+        self.memory_raw = None
+        self.memory_waiting = False
+        # 任务日志中的行号；reused 表示任务日志确认已有有效输出，未重新处理
+        self.journal_id = None
+        self.reused = False
+        self.output_hash = None
+        # 最终写入的 sidecar 路径，任务完成后加入全文索引
+        self.sidecar_output = None
+        # 自动优化的试算结果（choose_optimize_level 的返回值），记入任务日志的 metadata
+        self.optimize_decision = None
+        # 取消与超时：cancel_reason 为 "cancel" 或 "timeout"；engine 与 process_group 为正在执行的引擎
+        # 和需要结束的进程组；temp_dir 为本次运行的临时目录；submitted_options 为预检等步骤修改之前的选项，
+        # 超时降级重试时以此为基础
+        self.cancel_reason = None
+        self.engine = None
+        self.process_group = None
+        self.temp_dir = None
+        self.submitted_options = None
+        self.retries = 0
+        # 拆分并行：split_pages 为每块页数（0 表示不拆分）；
+        # 父任务记录分块子任务，子任务通过 parent/chunk 指回父任务和清单中的分块
+        self.split_pages = 0
+        self.parent = None
+        self.chunk = None
+        self.children = []
+        self.manifest = None
+        self.split_dir = None
+        self.split_lock = threading.Lock()
+        self.merging = False
+
+    # 实际交给 ocrmypdf 的输入与输出文件
+    def ocr_input(self):
+        return self.work_input or self.staged_input or self.input_path
+
+    def ocr_output(self):
+        return self.staged_output or self.output_path
+
+    def build_args(self):
+        return build_ocr_args(self.options, self.ocr_input(), self.ocr_output(), jobs=self.jobs)
+
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return end - self.started_at
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# 以“输入文件内容 + 规范化选项”的哈希为键的结果缓存；
+# 每个条目是一个目录，包含 output.pdf、sidecar.txt（如有）和 meta.json，
+# 条目目录的修改时间即最近使用时间，用于 LRU 淘汰
+class ResultCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._used = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_options(options):
+        return {key: value for key, value in options.items()
+                if key not in CACHE_IGNORED_OPTIONS and value not in (None, "", False, [])
+                and (key != "optimize_target_kb" or options.get("optimize") == OPTIMIZE_AUTO)}
+
+    def key(self, input_path, options):
+        payload = json.dumps({"version": CACHE_VERSION,
+                              "input": file_sha256(input_path),
+                              "options": self.normalize_options(options)},
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    # 命中时把缓存结果放到目标位置并返回 True
+    def restore(self, key, output_path, sidecar=None):
+        entry = self._entry_dir(key)
+        meta_path = os.path.join(entry, "meta.json")
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return False
+        if (sidecar and not meta.get("sidecar")) or (output_path != "-" and not meta.get("output")):
+            with self._lock:
+                self.misses += 1
+            return False
+        if meta.get("output") and output_path != "-":
+            self._link_or_copy(os.path.join(entry, "output.pdf"), output_path)
+        if sidecar and meta.get("sidecar"):
+            self._link_or_copy(os.path.join(entry, "sidecar.txt"), sidecar)
+        os.utime(entry)
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, key, output_path, sidecar=None):
+        entry = self._entry_dir(key)
+        if os.path.exists(entry):
+            return
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=os.path.dirname(entry))
+        try:
+            meta = {"output": False, "sidecar": False,
+                    "created": datetime.datetime.now().isoformat(timespec="seconds")}
+            if output_path != "-" and os.path.isfile(output_path):
+                shutil.copyfile(output_path, os.path.join(tmp_dir, "output.pdf"))
+                meta["output"] = True
+            if sidecar and os.path.isfile(sidecar):
+                shutil.copyfile(sidecar, os.path.join(tmp_dir, "sidecar.txt"))
+                meta["sidecar"] = True
+            with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            size = sum(os.path.getsize(os.path.join(tmp_dir, f)) for f in os.listdir(tmp_dir))
+            try:
+                os.replace(tmp_dir, entry)
+            except OSError:
+                # 相同的任务同时完成时，另一个任务已先写入同一条目，视为成功
+                if not os.path.isdir(entry):
+                    raise
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                return
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        with self._lock:
+            if self._used is not None:
+                self._used += size
+        self.evict()
+
+    # 优先硬链接，跨文件系统等情况下退回复制；先写临时名再替换，保证目标文件完整
+    @staticmethod
+    def _link_or_copy(src, dst):
+        tmp = f"{dst}.cache-tmp"
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                entry = os.path.join(prefix_dir, name)
+                if name.startswith(".tmp-") or not os.path.isdir(entry):
+                    continue
+                size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+                entries.append((os.path.getmtime(entry), size, entry))
+        return entries
+
+    # 已用量只在首次淘汰时统计一次，之后随写入累加；超出上限时才遍历条目，按最近使用时间删到上限的 80%。
+    # 遍历目录不持有锁，只在更新已用量时加锁
+    def evict(self):
+        with self._lock:
+            used = self._used
+        if used is None:
+            used = sum(size for _, size, _ in self._entries())
+            with self._lock:
+                if self._used is None:
+                    self._used = used
+        if used <= self.max_bytes:
+            return
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes * 0.8:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+        with self._lock:
+            self._used = total
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            self._used = 0
+
+
+# 缩略图的两级缓存：内存中按字节数限制的 LRU，磁盘上每页一个 PNG 文件。
+# 文档按路径、大小与修改时间区分，文件被替换后旧缩略图不再命中，由淘汰逐步清理
+class ThumbnailCache:
+    def __init__(self, cache_dir=THUMBNAIL_DIR, memory_bytes=THUMBNAIL_MEMORY_BYTES,
+                 disk_bytes=THUMBNAIL_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = collections.OrderedDict()
+        self._memory_used = 0
+        self._disk_used = None
+        self._evicting = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def document_key(path):
+        stat = os.stat(path)
+        payload = json.dumps([os.path.abspath(path), stat.st_size, stat.st_mtime_ns, THUMBNAIL_SIZE])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def _path(self, doc_key, page):
+        return os.path.join(self.cache_dir, doc_key[:2], doc_key, f"{page:06d}.png")
+
+    def _remember(self, key, data):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = data
+            self._memory_used += len(data)
+            while self._memory_used > self.memory_bytes and len(self._memory) > 1:
+                _, old = self._memory.popitem(last=False)
+                self._memory_used -= len(old)
+
+    # 只查内存，供界面线程调用
+    def cached(self, doc_key, page):
+        with self._lock:
+            data = self._memory.get((doc_key, page))
+            if data is not None:
+                self._memory.move_to_end((doc_key, page))
+            return data
+
+    def get(self, doc_key, page):
+        data = self.cached(doc_key, page)
+        if data is not None:
+            return data
+        path = self._path(doc_key, page)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        self._remember((doc_key, page), data)
+        return data
+
+    def put(self, doc_key, page, data):
+        self._remember((doc_key, page), data)
+        path = self._path(doc_key, page)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(f"{path}.tmp", "wb") as f:
+                f.write(data)
+            os.replace(f"{path}.tmp", path)
+        except OSError:
+            return
+        with self._lock:
+            if self._disk_used is not None:
+                self._disk_used += len(data)
+        self.evict()
+
+    def _files(self):
+        files = []
+        for dirpath, _, names in os.walk(self.cache_dir):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    # 已用量只在首次淘汰时统计一次，之后随写入累加；超出上限时删到上限的 80%，避免每次写入都遍历目录。
+    # 遍历与删除文件不持有锁，界面线程读取内存缓存不会因此停顿；同一时间只有一个线程做淘汰
+    def evict(self):
+        with self._lock:
+            if self._evicting:
+                return
+            self._evicting = True
+            used = self._disk_used
+        try:
+            if used is None:
+                used = sum(size for _, size, _ in self._files())
+                with self._lock:
+                    if self._disk_used is None:
+                        self._disk_used = used
+            if used <= self.disk_bytes:
+                return
+            files = sorted(self._files())
+            total = sum(size for _, size, _ in files)
+            for _, size, path in files:
+                if total <= self.disk_bytes * 0.8:
+                    break
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+                    total -= size
+                with contextlib.suppress(OSError):
+                    os.rmdir(os.path.dirname(path))
+            with self._lock:
+                self._disk_used = total
+        finally:
+            with self._lock:
+                self._evicting = False
+
+
+# 后台渲染缩略图的单个线程。只保留最近一次请求的页，滚动过去的页不再渲染；
+# 缺失的页按连续区间分批交给 Ghostscript，每批完成后通过 on_ready(文档键, 页码列表) 通知
+class ThumbnailRenderer:
+    def __init__(self, cache, on_ready, on_error=None):
+        self.cache = cache
+        self.on_ready = on_ready
+        self.on_error = on_error
+        self._wanted = None
+        self._failed = set()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def request(self, input_path, doc_key, pages):
+        with self._cond:
+            pages = [page for page in pages if (doc_key, page) not in self._failed]
+            self._wanted = (input_path, doc_key, pages) if pages else None
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def forget_failures(self, doc_key):
+        with self._cond:
+            self._failed = {key for key in self._failed if key[0] != doc_key}
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._wanted:
+                    self._cond.wait()
+                wanted = self._wanted
+            input_path, doc_key, pages = wanted
+            ready, missing = [], []
+            for page in pages:
+                (ready if self.cache.get(doc_key, page) is not None else missing).append(page)
+            batch = missing[:1]
+            for page in missing[1:THUMBNAIL_BATCH]:
+                if page != batch[-1] + 1:
+                    break
+                batch.append(page)
+            thumbnails = {}
+            if batch:
+                try:
+                    thumbnails = render_thumbnails(input_path, batch[0], batch[-1])
+                except (OSError, subprocess.CalledProcessError) as e:
+                    if self.on_error:
+                        self.on_error(doc_key, e)
+                for page, data in thumbnails.items():
+                    self.cache.put(doc_key, page, data)
+                ready.extend(thumbnails)
+            done = set(ready) | set(batch)
+            with self._cond:
+                self._failed.update((doc_key, page) for page in batch if page not in thumbnails)
+                if self._wanted is wanted:
+                    remaining = [page for page in pages if page not in done]
+                    self._wanted = (input_path, doc_key, remaining) if remaining else None
+            if ready:
+                self.on_ready(doc_key, sorted(ready))
+
+
+# SQLite 任务日志：记录每个任务的输入、选项、状态、输出哈希与耗时，程序崩溃或重启后据此恢复未完成的任务。
+# 每次状态变化立即提交（WAL 模式），多个线程共用一个连接，由锁串行化
+class JobJournal:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            input_path TEXT NOT NULL,
+            output_path TEXT NOT NULL,
+            options TEXT NOT NULL,
+            command TEXT NOT NULL,
+            settings TEXT NOT NULL,
+            status TEXT NOT NULL,
+            return_code INTEGER,
+            input_size INTEGER,
+            input_mtime REAL,
+            output_size INTEGER,
+            output_mtime REAL,
+            output_hash TEXT,
+            submitted_at TEXT,
+            started_at TEXT,
+            finished_at TEXT,
+            elapsed REAL,
+            metadata TEXT
+        );
+        CREATE INDEX IF NOT EXISTS jobs_by_path ON jobs (input_path, output_path);
+    """
+
+    def __init__(self, path=JOURNAL_FILE):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        # 早期版本创建的表没有 metadata 列
+        if "metadata" not in {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN metadata TEXT")
+
+    @staticmethod
+    def _now():
+        return datetime.datetime.now().isoformat(timespec="seconds")
+
+    @staticmethod
+    def _options_json(options):
+        return json.dumps(options, ensure_ascii=False, sort_keys=True)
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params)
+
+    # 新任务插入一行；从日志恢复的任务沿用原来的行
+    def record_submit(self, job):
+        stat = os.stat(job.input_path)
+        settings = json.dumps({"use_cache": job.use_cache, "split_pages": job.split_pages,
+                               "preflight": job.preflight, "page_filter": job.page_filter})
+        if job.journal_id is not None:
+            self._execute("UPDATE jobs SET status=?, return_code=NULL, input_size=?, input_mtime=?, "
+                          "submitted_at=? WHERE id=?",
+                          (JOB_QUEUED, stat.st_size, stat.st_mtime, self._now(), job.journal_id))
+            return
+        command = format_command(build_ocr_args(job.options, job.input_path, job.output_path))
+        cursor = self._execute(
+            "INSERT INTO jobs (input_path, output_path, options, command, settings, status, "
+            "input_size, input_mtime, submitted_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job.input_path, job.output_path, self._options_json(job.options), command, settings,
+             JOB_QUEUED, stat.st_size, stat.st_mtime, self._now()))
+        job.journal_id = cursor.lastrowid
+
+    def record_start(self, job):
+        self._execute("UPDATE jobs SET status=?, started_at=? WHERE id=?",
+                      (JOB_RUNNING, self._now(), job.journal_id))
+
+    def record_finish(self, job):
+        output_size = output_mtime = output_hash = None
+        if job.status == JOB_DONE:
+            stat = os.stat(job.output_path)
+            output_size, output_mtime = stat.st_size, stat.st_mtime
+            output_hash = job.output_hash or file_sha256(job.output_path)
+        metadata = json.dumps({"optimize": job.optimize_decision}) if job.optimize_decision else None
+        self._execute("UPDATE jobs SET status=?, return_code=?, output_size=?, output_mtime=?, "
+                      "output_hash=?, finished_at=?, elapsed=?, metadata=? WHERE id=?",
+                      (job.status, job.return_code, output_size, output_mtime, output_hash,
+                       self._now(), round(job.elapsed(), 3), metadata, job.journal_id))
+
+    # 查找同一输入、输出和选项已成功完成的记录：输入的大小与修改时间未变，
+    # 且输出文件大小一致、修改时间一致（不一致时再比较哈希）即视为有效输出，返回该行
+    def find_valid_output(self, job):
+        try:
+            input_stat = os.stat(job.input_path)
+            output_stat = os.stat(job.output_path)
+        except OSError:
+            return None
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, input_size, input_mtime, output_size, output_mtime, output_hash FROM jobs "
+                "WHERE input_path=? AND output_path=? AND options=? AND status=? ORDER BY id DESC",
+                (job.input_path, job.output_path, self._options_json(job.options), JOB_DONE)).fetchall()
+        output_hash = None
+        for row in rows:
+            if (row["input_size"], row["input_mtime"]) != (input_stat.st_size, input_stat.st_mtime):
+                continue
+            if row["output_size"] != output_stat.st_size:
+                continue
+            if row["output_mtime"] == output_stat.st_mtime:
+                return row
+            if output_hash is None:
+                output_hash = file_sha256(job.output_path)
+            if row["output_hash"] == output_hash:
+                self._execute("UPDATE jobs SET output_mtime=? WHERE id=?", (output_stat.st_mtime, row["id"]))
+                return row
+        return None
+
+    # 每个输入/输出组合只看最新一条记录：排队中、运行中（上次中断）或失败的即为需要恢复的任务
+    def unfinished(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT * FROM jobs AS j WHERE status IN (?, ?, ?) AND id = "
+                "(SELECT MAX(id) FROM jobs WHERE input_path=j.input_path AND output_path=j.output_path) "
+                "ORDER BY id", (JOB_QUEUED, JOB_RUNNING, JOB_FAILED)).fetchall()
+
+    # 由日志中的一行重建任务
+    @staticmethod
+    def job_from_row(row):
+        job = OCRJob(row["input_path"], row["output_path"], dict(DEFAULT_OPTIONS, **json.loads(row["options"])))
+        settings = json.loads(row["settings"])
+        job.use_cache = settings.get("use_cache", True)
+        job.split_pages = settings.get("split_pages", 0)
+        job.preflight = settings.get("preflight", False)
+        job.page_filter = settings.get("page_filter", "")
+        job.journal_id = row["id"]
+        return job
+
+    def abandon(self, ids):
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE jobs SET status=? WHERE id=?", [(JOB_ABANDONED, i) for i in ids])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# sidecar 全文索引：按页保存文字及其在 sidecar 中的字符偏移；
+# sidecar 的大小和修改时间未变的文件不会重新索引
+class SearchIndex:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pdf_path TEXT NOT NULL UNIQUE,
+            sidecar_path TEXT NOT NULL,
+            sidecar_size INTEGER,
+            sidecar_mtime REAL,
+            page_count INTEGER,
+            indexed_at TEXT
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(text, offset UNINDEXED);
+    """
+
+    def __init__(self, path=SEARCH_INDEX_FILE):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+
+    @staticmethod
+    def _spaced(text):
+        return SEARCH_CJK_RE.sub(r" \1 ", text)
+
+    # 去掉索引时插入的空格，用于显示摘要
+    @staticmethod
+    def _unspaced(text):
+        return re.sub(f"(?<=[{SEARCH_CJK_CHARS}]) +(?=[{SEARCH_CJK_CHARS}])", "", text)
+
+    # 每个空白分隔的词作为一个短语，各词之间为“与”关系
+    @classmethod
+    def _match_query(cls, query):
+        phrases = []
+        for term in query.split():
+            tokens = cls._spaced(term).split()
+            if tokens:
+                phrases.append('"' + " ".join(tokens).replace('"', '""') + '"')
+        return " AND ".join(phrases)
+
+    def _delete_pages(self, document_id):
+        self._conn.execute("DELETE FROM pages WHERE rowid >= ? AND rowid < ?",
+                           (document_id * SEARCH_ROWID_PAGES, (document_id + 1) * SEARCH_ROWID_PAGES))
+
+    # 索引一个 PDF 的 sidecar；内容未变时返回 False
+    def index_document(self, pdf_path, sidecar):
+        pdf_path, sidecar = os.path.abspath(pdf_path), os.path.abspath(sidecar)
+        stat = os.stat(sidecar)
+        with self._lock:
+            row = self._conn.execute("SELECT id, sidecar_path, sidecar_size, sidecar_mtime FROM documents "
+                                     "WHERE pdf_path=?", (pdf_path,)).fetchone()
+        if row and row[1:] == (sidecar, stat.st_size, stat.st_mtime):
+            return False
+        with open(sidecar, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        # ocrmypdf 的 sidecar 以换页符分隔各页，末尾通常还有一个换页符（不是新的一页）；跳过无文字的页
+        if text.endswith("\f"):
+            text = text[:-1]
+        pages, offset = [], 0
+        for number, page_text in enumerate(text.split("\f"), 1):
+            if page_text.strip():
+                pages.append((number, self._spaced(page_text), offset))
+            offset += len(page_text) + 1
+        now = datetime.datetime.now().isoformat(timespec="seconds")
+        with self._lock, self._conn:
+            if row:
+                document_id = row[0]
+                self._delete_pages(document_id)
+                self._conn.execute("UPDATE documents SET sidecar_path=?, sidecar_size=?, sidecar_mtime=?, "
+                                   "page_count=?, indexed_at=? WHERE id=?",
+                                   (sidecar, stat.st_size, stat.st_mtime, number, now, document_id))
+            else:
+                document_id = self._conn.execute(
+                    "INSERT INTO documents (pdf_path, sidecar_path, sidecar_size, sidecar_mtime, page_count, indexed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (pdf_path, sidecar, stat.st_size, stat.st_mtime, number, now)).lastrowid
+            self._conn.executemany("INSERT INTO pages (rowid, text, offset) VALUES (?, ?, ?)",
+                                   [(document_id * SEARCH_ROWID_PAGES + page, page_text, page_offset)
+                                    for page, page_text, page_offset in pages])
+        return True
+
+    def remove_document(self, pdf_path):
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT id FROM documents WHERE pdf_path=?",
+                                     (os.path.abspath(pdf_path),)).fetchone()
+            if row:
+                self._delete_pages(row[0])
+                self._conn.execute("DELETE FROM documents WHERE id=?", (row[0],))
+
+    # 重新检查已索引的文件：sidecar 有变化的重新索引，PDF 或 sidecar 已不存在的移出索引
+    def refresh(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT pdf_path, sidecar_path FROM documents").fetchall()
+        updated = removed = 0
+        for pdf_path, sidecar in rows:
+            if not (os.path.exists(pdf_path) and os.path.exists(sidecar)):
+                self.remove_document(pdf_path)
+                removed += 1
+            elif self.index_document(pdf_path, sidecar):
+                updated += 1
+        return updated, removed
+
+    # 索引文件夹中已有的 sidecar：与 a.txt 配对的是 a.pdf 或 a_ocr.pdf（默认输出文件名）
+    def index_folder(self, folder):
+        indexed = 0
+        for dirpath, _, filenames in os.walk(folder):
+            names = set(filenames)
+            for name in filenames:
+                base, ext = os.path.splitext(name)
+                if ext.lower() != ".txt":
+                    continue
+                pdf_name = next((candidate for candidate in (base + ".pdf", base + "_ocr.pdf")
+                                 if candidate in names), None)
+                if pdf_name and self.index_document(os.path.join(dirpath, pdf_name),
+                                                    os.path.join(dirpath, name)):
+                    indexed += 1
+        return indexed
+
+    # 返回 [(pdf_path, 页码, 页首在 sidecar 中的偏移, 摘要)]，按相关度排序
+    def search(self, query, limit=SEARCH_RESULT_LIMIT):
+        match = self._match_query(query)
+        if not match:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT d.pdf_path, p.rowid % ?, p.offset, snippet(pages, 0, '【', '】', '…', 24) "
+                "FROM pages AS p JOIN documents AS d ON d.id = p.rowid / ? "
+                "WHERE pages MATCH ? ORDER BY rank LIMIT ?",
+                (SEARCH_ROWID_PAGES, SEARCH_ROWID_PAGES, match, limit)).fetchall()
+        return [(pdf_path, page, offset, " ".join(self._unspaced(snippet).split()))
+                for pdf_path, page, offset, snippet in rows]
+
+    def stats(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*), COALESCE(SUM(page_count), 0) FROM documents").fetchone()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# 用系统中的阅读器在指定页打开 PDF；找不到支持跳页的阅读器时按系统默认方式打开
+def open_pdf_at_page(path, page):
+    viewers = (("SumatraPDF", ["-page", str(page)]), ("evince", [f"--page-index={page}"]),
+               ("okular", ["-p", str(page)]), ("zathura", ["-P", str(page)]))
+    for name, args in viewers:
+        viewer = shutil.which(name)
+        if viewer:
+            subprocess.Popen([viewer] + args + [path])
+            return True
+    if hasattr(os, "startfile"):
+        os.startfile(path)
+    else:
+        subprocess.Popen(["open" if sys.platform == "darwin" else "xdg-open", path])
+    return False
+
+
+def _write_split_manifest(work_dir, manifest):
+    path = os.path.join(work_dir, SPLIT_MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+# 将大文件按页拆分到 work_dir 中，返回分块清单；
+# 若 work_dir 中已有与输入文件、每块页数和选项都一致的清单，则直接复用（断点续跑）
+def plan_split(input_path, work_dir, chunk_pages, options):
+    stat = os.stat(input_path)
+    signature = json.loads(json.dumps({
+        "input_size": stat.st_size,
+        "input_mtime": stat.st_mtime,
+        "chunk_pages": chunk_pages,
+        "options": ResultCache.normalize_options(options),
+    }))
+    try:
+        with open(os.path.join(work_dir, SPLIT_MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("signature") == signature:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    import pikepdf
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+    chunks = []
+    with pikepdf.open(input_path) as pdf:
+        total = len(pdf.pages)
+        for index, first in enumerate(range(0, total, chunk_pages)):
+            last = min(first + chunk_pages, total)
+            name = f"chunk-{index + 1:04d}"
+            with pikepdf.new() as part:
+                part.pages.extend(pdf.pages[first:last])
+                part.save(os.path.join(work_dir, name + ".pdf"))
+            chunks.append({"index": index, "first": first + 1, "last": last,
+                           "input": os.path.join(work_dir, name + ".pdf"),
+                           "output": os.path.join(work_dir, name + "_ocr.pdf"),
+                           "done": False})
+    manifest = {"signature": signature, "pages": total, "chunks": chunks}
+    _write_split_manifest(work_dir, manifest)
+    return manifest
+
+
+# 按清单顺序合并各分块的输出与 sidecar；文档信息取自原始输入，再用选项中的元数据覆盖
+def merge_split_outputs(manifest, input_path, output_path, options):
+    import pikepdf
+    chunks = sorted(manifest["chunks"], key=lambda chunk: chunk["index"])
+    with contextlib.ExitStack() as stack:
+        # 追加页面时对象按需从源文件复制，源文件须保持打开直到保存完成
+        merged = stack.enter_context(pikepdf.open(chunks[0]["output"]))
+        # PDF/A 输出：合并结果沿用第一块的输出意图（OutputIntents）与 XMP 中的 PDF/A 标识
+        output_intents = merged.Root.get("/OutputIntents")
+        first_meta = merged.open_metadata()
+        pdfa_ids = {key: first_meta[key] for key in ("pdfaid:part", "pdfaid:conformance") if key in first_meta}
+        for chunk in chunks[1:]:
+            part = stack.enter_context(pikepdf.open(chunk["output"]))
+            merged.pages.extend(part.pages)
+        original = stack.enter_context(pikepdf.open(input_path))
+        for key, value in original.docinfo.items():
+            if key not in ("/Producer", "/ModDate"):
+                merged.docinfo[key] = merged.copy_foreign(value) if value.is_indirect else value
+        for option, key in (("title", "/Title"), ("author", "/Author"), ("subject", "/Subject"),
+                            ("keywords", "/Keywords")):
+            if options.get(option):
+                merged.docinfo[key] = options[option]
+        # 文档信息与 XMP 须一致（PDF/A 的要求）：以文档信息为准写入 XMP，再补回 PDF/A 标识
+        with merged.open_metadata(set_pikepdf_as_editor=False) as meta:
+            meta.load_from_docinfo(merged.docinfo)
+            for key, value in pdfa_ids.items():
+                meta[key] = value
+        if output_intents is not None:
+            merged.Root.OutputIntents = output_intents
+        tmp_path = output_path + ".merge-tmp"
+        merged.save(tmp_path)
+    os.replace(tmp_path, output_path)
+    if options.get("sidecar"):
+        # ocrmypdf 的 sidecar 以换页符分隔各页，按分块顺序拼接即可保持页序
+        texts = []
+        for chunk in chunks:
+            with open(sidecar_path(chunk["input"]), encoding="utf-8") as f:
+                text = f.read()
+            if text and not text.endswith("\f"):
+                text += "\f"
+            texts.append(text)
+        sidecar = sidecar_path(input_path, options.get("sidecar_name", ""))
+        with open(sidecar, "w", encoding="utf-8") as f:
+            f.write("".join(texts))
+
+
+# 传输限速：所有传输共用一个速率，每次传输一块前按已预约的时间排队等待
+class _Throttle:
+    def __init__(self, rate=0):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def consume(self, size):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + size / self.rate
+        time.sleep(start - now)
+
+
+# 本地暂存：网络共享上的输入在排队时预先复制到本地暂存目录（可指向 tmpfs），
+# 任务完全在本地路径上运行，输出由后台线程先写入目标目录中的临时文件再原子替换。
+# 预取与上传共用同一个带宽上限
+class StagingArea:
+    def __init__(self, scratch_dir=STAGING_DIR, prefetch_depth=STAGING_PREFETCH, bandwidth=0, on_log=None):
+        os.makedirs(scratch_dir, exist_ok=True)
+        self.scratch_dir = scratch_dir
+        self.prefetch_depth = prefetch_depth
+        self.throttle = _Throttle(bandwidth)
+        self.on_log = on_log
+        self._cond = threading.Condition()
+        self._staged = {}
+        self._wanted = []
+        self._uploads = queue.Queue()
+        threading.Thread(target=self._prefetch_loop, daemon=True).start()
+        threading.Thread(target=self._upload_loop, daemon=True).start()
+        atexit.register(self.shutdown)
+
+    def local_path(self, job, name):
+        return os.path.join(self.scratch_dir, f"{os.getpid()}-{job.id}-{name}")
+
+    def _copy(self, src, dst):
+        tmp_path = dst + ".part"
+        with open(src, "rb") as fin, open(tmp_path, "wb") as fout:
+            while True:
+                chunk = fin.read(STAGING_CHUNK_BYTES)
+                if not chunk:
+                    break
+                self.throttle.consume(len(chunk))
+                fout.write(chunk)
+        shutil.copystat(src, tmp_path)
+        os.replace(tmp_path, dst)
+
+    def _stage(self, job, entry):
+        try:
+            size = os.path.getsize(job.input_path)
+            if shutil.disk_usage(self.scratch_dir).free - size < STAGING_MIN_FREE_BYTES:
+                raise OSError("暂存目录空间不足")
+            started = time.monotonic()
+            self._copy(job.input_path, entry["path"])
+            entry["seconds"] = time.monotonic() - started
+        except OSError as e:
+            entry["error"] = e
+            with contextlib.suppress(OSError):
+                os.remove(entry["path"])
+        entry["ready"].set()
+
+    def _new_entry(self, job):
+        name = "input" + os.path.splitext(job.input_path)[1].lower()
+        entry = {"path": self.local_path(job, name), "ready": threading.Event(), "error": None,
+                 "seconds": None, "claimed": False}
+        self._staged[job] = entry
+        return entry
+
+    # 更新需要预取的任务（排队顺序中最前面的若干个）
+    def prefetch(self, jobs):
+        with self._cond:
+            self._wanted = [job for job in jobs[:self.prefetch_depth] if job not in self._staged]
+            self._cond.notify_all()
+
+    def _prefetch_loop(self):
+        while True:
+            with self._cond:
+                while not self._wanted:
+                    self._cond.wait()
+                job = self._wanted.pop(0)
+                if job in self._staged:
+                    continue
+                entry = self._new_entry(job)
+                self._cond.notify_all()
+            self._stage(job, entry)
+
+    # 等待任务的输入预取完成并返回本地副本（供调度线程读取页面信息，不必打开网络共享上的原文件）；
+    # 任务不在预取范围内或复制失败时返回 None
+    def staged_path(self, job):
+        with self._cond:
+            while job not in self._staged and job in self._wanted:
+                self._cond.wait()
+            entry = self._staged.get(job)
+        if entry is None:
+            return None
+        entry["ready"].wait()
+        return None if entry["error"] else entry["path"]
+
+    # 任务开始时取得本地输入：已预取则直接使用，正在预取则等待，否则立即复制；失败时返回 None
+    def acquire(self, job):
+        with self._cond:
+            entry = self._staged.get(job)
+            if entry is None:
+                entry = self._new_entry(job)
+                prefetched = False
+            else:
+                prefetched = True
+            entry["claimed"] = True
+        if not prefetched:
+            self._stage(job, entry)
+        entry["ready"].wait()
+        if entry["error"]:
+            self._release_entry(job)
+            raise entry["error"]
+        return entry["path"], prefetched, entry["seconds"]
+
+    def _release_entry(self, job):
+        with self._cond:
+            entry = self._staged.pop(job, None)
+        if entry:
+            # 仍在预取中时等复制结束再删除，以免复制完成后留下文件
+            entry["ready"].wait()
+            with contextlib.suppress(OSError):
+                os.remove(entry["path"])
+
+    def release(self, job):
+        self._release_entry(job)
+
+    # 后台上传 [(本地文件, 目标路径)]，全部完成后调用 callback(job, error)
+    def upload(self, job, files, callback):
+        self._uploads.put((job, files, callback))
+
+    def _upload_loop(self):
+        while True:
+            job, files, callback = self._uploads.get()
+            error = None
+            for local, target in files:
+                # 输出类型为 none 时没有输出文件
+                if not os.path.exists(local):
+                    continue
+                try:
+                    tmp_path = f"{target}.{os.getpid()}.uploading"
+                    self._copy(local, tmp_path)
+                    os.replace(tmp_path, target)
+                except OSError as e:
+                    error = e
+                    with contextlib.suppress(OSError):
+                        os.remove(tmp_path)
+                with contextlib.suppress(OSError):
+                    os.remove(local)
+            # 回调出错不能结束上传线程，否则之后的上传都会停住
+            try:
+                callback(job, error)
+            except Exception as e:
+                message = f"任务 #{job.id} 上传后的处理出错：{e}"
+                if self.on_log:
+                    self.on_log(message, "error")
+                else:
+                    logging.getLogger("ocrmypdf_gui").error(message)
+
+    # 删除已预取但尚未被任务取用的文件
+    def drop_prefetched(self):
+        with self._cond:
+            self._wanted = []
+            unclaimed = [(job, entry) for job, entry in self._staged.items() if not entry["claimed"]]
+        for job, entry in unclaimed:
+            entry["ready"].wait()
+            self._release_entry(job)
+
+    def shutdown(self):
+        with self._cond:
+            self._wanted = []
+            jobs = list(self._staged)
+        for job in jobs:
+            self._release_entry(job)
+
+
+# 按固定间隔采样一个进程及其全部子进程（tesseract、gs、pngquant、jbig2 等）：
+# 峰值内存为同一时刻整棵进程树 RSS 之和的最大值，CPU 与 I/O 为各进程最后一次采样值之和。
+# 启动时已存在的进程（进程内引擎的常驻工作进程）以启动时的值为基线，只计增量。
+# 寿命短于采样间隔的子进程可能漏计，因此调用方会再与 rusage 的结果取较大值。需要 psutil
+class ResourceSampler:
+    def __init__(self, pid, interval=RESOURCE_SAMPLE_SECONDS):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = 0
+        self._baseline = {}
+        self._last = {}
+        self._stop = threading.Event()
+        self._thread = None
+        try:
+            import psutil
+        except ImportError:
+            psutil = None
+        self._psutil = psutil
+
+    def start(self):
+        if self._psutil is None:
+            return self
+        self._sample(baseline=True)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self, baseline=False):
+        psutil = self._psutil
+        try:
+            root = psutil.Process(self.pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return
+        rss = 0
+        for process in processes:
+            try:
+                with process.oneshot():
+                    key = (process.pid, process.create_time())
+                    cpu = process.cpu_times()
+                    rss += process.memory_info().rss
+                    io = process.io_counters() if hasattr(process, "io_counters") else None
+            except psutil.Error:
+                continue
+            values = (cpu.user, cpu.system,
+                      io.read_bytes if io else 0, io.write_bytes if io else 0)
+            if baseline:
+                self._baseline[key] = values
+            self._last[key] = values
+        self.peak_rss = max(self.peak_rss, rss)
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+        totals = [0.0, 0.0, 0, 0]
+        for key, values in self._last.items():
+            base = self._baseline.get(key, (0.0, 0.0, 0, 0))
+            for i in range(4):
+                totals[i] += max(values[i] - base[i], 0)
+        return {"cpu_user": totals[0], "cpu_system": totals[1], "peak_rss": self.peak_rss,
+                "read_bytes": totals[2], "write_bytes": totals[3]}
+
+
+# ru_maxrss 在 macOS 上以字节计，其他系统以 KB 计
+def _rusage_to_resources(ru_utime, ru_stime, ru_maxrss, ru_inblock, ru_oublock):
+    return {"cpu_user": ru_utime, "cpu_system": ru_stime,
+            "peak_rss": ru_maxrss if sys.platform == "darwin" else ru_maxrss * 1024,
+            "read_bytes": ru_inblock * 512, "write_bytes": ru_oublock * 512}
+
+
+# 合并采样结果与 rusage 结果，每项取较大值
+def merge_resources(*sources):
+    merged = {}
+    for source in sources:
+        for key, value in (source or {}).items():
+            merged[key] = max(merged.get(key, 0), value)
+    return merged
+
+
+# 汇总多个任务（拆分任务的各分块）的资源占用；峰值内存取最大值
+def sum_resources(items):
+    total = {"wall_seconds": 0.0, "cpu_user": 0.0, "cpu_system": 0.0,
+             "peak_rss": 0, "read_bytes": 0, "write_bytes": 0}
+    for item in items:
+        for key, value in (item or {}).items():
+            total[key] = max(total[key], value) if key == "peak_rss" else total[key] + value
+    return total
+
+
+def format_bytes(value):
+    if not value:
+        return ""
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024 or unit == "GB":
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+
+
+_metrics_lock = threading.Lock()
+
+
+# 每个任务结束后向 CSV 指标文件追加一行，便于评估机器规格和比较不同选项配置
+def append_job_metrics(job, path=METRICS_FILE):
+    resources = job.resources or {}
+    row = {
+        "finished_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "input": job.input_path,
+        "output": job.output_path,
+        "status": job.status,
+        "return_code": job.return_code,
+        "engine": job.engine_name or "",
+        "jobs": job.jobs or "",
+        "pages": job.progress.pages_total or "",
+        "wall_seconds": round(job.elapsed(), 3),
+        "cpu_user": round(resources.get("cpu_user", 0.0), 3),
+        "cpu_system": round(resources.get("cpu_system", 0.0), 3),
+        "peak_rss": resources.get("peak_rss", 0),
+        "estimated_rss": job.memory_estimate or "",
+        "read_bytes": resources.get("read_bytes", 0),
+        "write_bytes": resources.get("write_bytes", 0),
+        "options": json.dumps(job.options, ensure_ascii=False, sort_keys=True),
+    }
+    with _metrics_lock:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        new_file = not os.path.exists(path)
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=METRICS_FIELDS)
+            if new_file:
+                writer.writeheader()
+            writer.writerow(row)
+
+
+def physical_memory():
+    try:
+        import psutil
+        return psutil.virtual_memory().total
+    except ImportError:
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+# 默认内存预算；无法取得物理内存大小时返回 0（不限制）
+def default_memory_budget():
+    total = physical_memory()
+    return int(total * MEMORY_BUDGET_FRACTION) if total else 0
+
+
+# 页数未知、按默认幅面与分辨率估算的页面信息
+def default_page_geometry():
+    width, height = MEMORY_DEFAULT_PAGE
+    return {"pages": None, "dpi": MEMORY_DEFAULT_DPI,
+            "pixels": (width / 72 * MEMORY_DEFAULT_DPI) * (height / 72 * MEMORY_DEFAULT_DPI)}
+
+
+# 读取估算内存所需的页面信息：页数，以及按图像分辨率栅格化后单页的最大像素数。
+# PDF 只均匀抽查部分页；图像文件需要 Pillow（随 ocrmypdf 安装）；读取失败时按默认幅面估算
+def inspect_page_geometry(path):
+    geometry = default_page_geometry()
+    try:
+        if path.lower().endswith(".pdf"):
+            import pikepdf
+            with pikepdf.open(path) as pdf:
+                total = len(pdf.pages)
+                step = max(1, total // MEMORY_SAMPLE_PAGES)
+                pixels, max_dpi = 0, 0
+                for index in range(0, total, step):
+                    page = pdf.pages[index]
+                    box = [float(v) for v in page.mediabox]
+                    width, height = abs(box[2] - box[0]) or 1, abs(box[3] - box[1]) or 1
+                    dpi = 0
+                    for image in page.images.values():
+                        dpi = max(dpi, int(image.get("/Width", 0)) * 72 / width,
+                                  int(image.get("/Height", 0)) * 72 / height)
+                    dpi = min(dpi, MEMORY_MAX_DPI) or MEMORY_DEFAULT_DPI
+                    pixels = max(pixels, (width / 72 * dpi) * (height / 72 * dpi))
+                    max_dpi = max(max_dpi, dpi)
+            geometry.update(pages=total, dpi=round(max_dpi), pixels=pixels)
+        else:
+            from PIL import Image
+            with Image.open(path) as image:
+                dpi = image.info.get("dpi", (MEMORY_DEFAULT_DPI,))[0]
+                geometry.update(pages=getattr(image, "n_frames", 1), dpi=round(float(dpi)),
+                                pixels=image.width * image.height)
+    except Exception:
+        pass
+    return geometry
+
+
+# 按选项估算峰值内存的两部分：与页数无关的固定开销，以及每个同时处理的页面的开销（均未修正）
+def estimate_job_memory(geometry, options):
+    per_pixel = MEMORY_BYTES_PER_PIXEL["raster"] + MEMORY_BYTES_PER_PIXEL["ocr"]
+    per_pixel += sum(MEMORY_BYTES_PER_PIXEL[name] for name in MEMORY_PREPROCESS_OPTIONS if options.get(name))
+    languages = max(1, len(options.get("languages") or []))
+    return MEMORY_BASE_BYTES, geometry["pixels"] * per_pixel + MEMORY_LANGUAGE_BYTES * languages
+
+
+# 根据任务结束时实测的进程树峰值内存学习估算的修正系数，按预处理组合分别记录并保存到程序数据目录
+class MemoryModel:
+    def __init__(self, path=MEMORY_MODEL_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.factors = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.factors = json.load(f).get("factors", {})
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    @staticmethod
+    def signature(options):
+        return "+".join(name for name in MEMORY_PREPROCESS_OPTIONS if options.get(name)) or "none"
+
+    def factor(self, options):
+        with self._lock:
+            for key in (self.signature(options), "*"):
+                entry = self.factors.get(key)
+                if entry and entry["samples"] >= MEMORY_MIN_SAMPLES:
+                    return entry["factor"]
+        return 1.0
+
+    def observe(self, options, estimated, measured):
+        if not estimated or not measured:
+            return
+        ratio = min(max(measured / estimated, 0.1), 10.0)
+        with self._lock:
+            for key in (self.signature(options), "*"):
+                entry = self.factors.setdefault(key, {"factor": ratio, "samples": 0})
+                if entry["samples"]:
+                    entry["factor"] += (ratio - entry["factor"]) * MEMORY_LEARNING_RATE
+                entry["samples"] += 1
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"factors": self.factors}, f, indent=2)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                pass
+
+
+# 让子进程成为新进程组的首进程，取消时可连同 ocrmypdf 启动的 tesseract、gs 等子孙进程一起结束
+def process_group_kwargs():
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+# 结束以 pid 为首进程的整个进程组：先 SIGTERM，超过 grace 秒仍有进程存活则 SIGKILL；
+# Windows 上用 taskkill 结束进程树
+def terminate_process_group(pid, grace=KILL_GRACE_SECONDS):
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/T", "/F", "/PID", str(pid)], capture_output=True)
+        return
+    try:
+        os.killpg(pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        return
+    deadline = time.monotonic() + grace
+    while time.monotonic() < deadline:
+        time.sleep(0.1)
+        try:
+            os.killpg(pid, 0)
+        except (ProcessLookupError, PermissionError):
+            return
+    with contextlib.suppress(ProcessLookupError, PermissionError):
+        os.killpg(pid, signal.SIGKILL)
+
+
+# 结束任务正在运行的进程组；wait 为 False 时在后台线程中等待进程退出
+def cancel_job_processes(job, wait=False):
+    pid = job.process_group
+    if pid is None:
+        return
+    if wait:
+        terminate_process_group(pid)
+    else:
+        threading.Thread(target=terminate_process_group, args=(pid,), daemon=True).start()
+
+
+# 让 ocrmypdf 及其子进程把临时文件写到任务自己的临时目录中，任务结束后整个目录删除
+def temp_env(temp_dir):
+    return {"TMPDIR": temp_dir, "TEMP": temp_dir, "TMP": temp_dir}
+
+
+def make_job_temp_dir():
+    return tempfile.mkdtemp(prefix=f"{JOB_TEMP_PREFIX}{os.getpid()}_")
+
+
+def _pid_alive(pid):
+    try:
+        import psutil
+        return psutil.pid_exists(pid)
+    except ImportError:
+        pass
+    if os.name == "nt":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# 删除创建它的进程已不存在的任务临时目录（程序崩溃或被强制结束时遗留）
+def cleanup_stale_temp_dirs():
+    root = tempfile.gettempdir()
+    removed = 0
+    with contextlib.suppress(OSError):
+        for name in os.listdir(root):
+            match = re.match(re.escape(JOB_TEMP_PREFIX) + r"(\d+)_", name)
+            if match and not _pid_alive(int(match.group(1))):
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+                removed += 1
+    return removed
+
+
+# 超时任务的降级选项：返回 (新选项, 说明)；没有可降级的选项时说明为 None
+def degrade_options(options):
+    for description, changes in TIMEOUT_DEGRADE_STEPS:
+        if any(options.get(key) != value for key, value in changes.items()):
+            return dict(options, **changes), description
+    return options, None
+
+
+# 写出进度插件文件（内容有变化时才重写），返回其路径
+def progress_plugin_path():
+    with contextlib.suppress(OSError):
+        with open(PROGRESS_PLUGIN_FILE, encoding="utf-8") as f:
+            if f.read() == _PROGRESS_PLUGIN_SOURCE:
+                return PROGRESS_PLUGIN_FILE
+    os.makedirs(APP_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=APP_DIR)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(_PROGRESS_PLUGIN_SOURCE)
+    os.replace(tmp, PROGRESS_PLUGIN_FILE)
+    return PROGRESS_PLUGIN_FILE
+
+
+# 子进程引擎：每个任务启动一个 ocrmypdf 命令行进程
+class SubprocessEngine:
+    name = ENGINE_SUBPROCESS
+
+    # 在程序名之后加上 --plugin 加载进度插件；插件文件无法写出时不显示进度
+    def command(self, job):
+        args = job.build_args()
+        try:
+            args[1:1] = ["--plugin", progress_plugin_path()]
+        except OSError:
+            pass
+        return args
+
+    def run(self, job, log):
+        started = time.monotonic()
+        env = dict(os.environ, **temp_env(job.temp_dir)) if job.temp_dir else None
+        proc = subprocess.Popen(self.command(job),
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT,
+                                bufsize=1,
+                                universal_newlines=True,
+                                encoding='utf-8',
+                                errors='replace',
+                                env=env,
+                                **process_group_kwargs())
+        job.process_group = proc.pid
+        # 启动进程前已请求取消时立即结束
+        if job.cancel_reason:
+            self.cancel(job)
+        sampler = ResourceSampler(proc.pid).start()
+        for line in proc.stdout:
+            line = line.strip()
+            if line and not job.progress.feed_line(line):
+                log(line, "info")
+        usage = None
+        if hasattr(os, "wait4"):
+            # wait4 返回的 rusage 包含 ocrmypdf 已回收的全部子孙进程，可补上采样漏计的短命进程
+            _, status, ru = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            usage = _rusage_to_resources(ru.ru_utime, ru.ru_stime, ru.ru_maxrss,
+                                         ru.ru_inblock, ru.ru_oublock)
+        else:
+            proc.wait()
+        job.process_group = None
+        job.resources = merge_resources(sampler.stop(), usage,
+                                        {"wall_seconds": time.monotonic() - started})
+        return proc.returncode
+
+    def cancel(self, job, wait=False):
+        cancel_job_processes(job, wait)
+
+    def shutdown(self):
+        pass
+
+
+# 代替 ocrmypdf 的桩脚本：与 ocrmypdf 一样加载 --plugin 指定的进度插件，通过插件输出进度条与逐页调试日志，
+# 信息级日志按 "页码 消息" 的格式写到标准错误，最后原样复制输入
+_STUB_OCRMYPDF = r"""
+import importlib.util, logging, re, shutil, sys, types
+args = sys.argv[1:]
+input_path, output_path = args[-2], args[-1]
+with open(input_path, "rb") as f:
+    pages = max(1, len(re.findall(rb"/Type\s*/Page(?![A-Za-z])", f.read())))
+
+
+class NullProgressBar:
+    def __init__(self, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def update(self, n=1, *, completed=None):
+        pass
+
+
+class PageNumberFilter(logging.Filter):
+    def filter(self, record):
+        page = getattr(record, "pageno", None)
+        record.pageno = f"{page:5d} " if isinstance(page, int) else ""
+        return True
+
+
+progress_bar = NullProgressBar
+if "--plugin" in args:
+    sys.modules["ocrmypdf"] = types.SimpleNamespace(hookimpl=lambda function: function)
+    spec = importlib.util.spec_from_file_location("plugin", args[args.index("--plugin") + 1])
+    plugin = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(plugin)
+    plugin.initialize(plugin_manager=None)
+    progress_bar = plugin.get_progressbar_class()
+root = logging.getLogger()
+root.setLevel(logging.DEBUG)
+console = logging.StreamHandler(sys.stderr)
+console.setLevel(logging.INFO)
+console.addFilter(PageNumberFilter())
+console.setFormatter(logging.Formatter("%(pageno)s%(message)s"))
+root.addHandler(console)
+log = logging.getLogger("ocrmypdf._pipeline")
+with progress_bar(total=pages, desc="Scanning contents", unit="page") as bar:
+    for page in range(pages):
+        bar.update()
+log.info("Start processing %d pages concurrently", 1)
+with progress_bar(total=pages, desc="OCR", unit="page") as bar:
+    for page in range(1, pages + 1):
+        log.debug("Rasterize with pgmraw, rotation 0", extra={"pageno": page})
+        log.debug("Running: %s", ["tesseract", "-l", "eng", f"{page:06d}.png", "stdout"], extra={"pageno": page})
+        bar.update()
+log.info("Postprocessing...")
+shutil.copyfile(input_path, output_path)
+if "--sidecar" in args:
+    with open(args[args.index("--sidecar") + 1], "w", encoding="utf-8") as f:
+        f.write("\f" * (pages - 1))
+"""
+
+
+# 基准测试用的桩引擎：照常生成命令行、读取输出和统计资源，只是不真正做 OCR，
+# 用于测量排队、日志处理和命令生成本身的开销
+class StubEngine(SubprocessEngine):
+    name = "stub"
+
+    def command(self, job):
+        return [sys.executable, "-c", _STUB_OCRMYPDF] + super().command(job)[1:]
+
+
+# 将工作进程中 ocrmypdf 的日志转发到主进程，事件为 (job_id, kind, payload)；
+# 调试级别的日志只转发能识别出处理阶段的记录，用于统计阶段耗时
+class _QueueLogHandler(logging.Handler):
+    def __init__(self, event_queue):
+        super().__init__()
+        self.event_queue = event_queue
+        self.job_id = None
+
+    def emit(self, record):
+        try:
+            message = self.format(record)
+            page = getattr(record, "pageno", None)
+            page = page if isinstance(page, int) else None
+            if record.levelno < logging.INFO:
+                if classify_stage(message):
+                    self.event_queue.put((self.job_id, "stage", (message, page)))
+                return
+            if record.levelno >= logging.ERROR:
+                level = "error"
+            elif record.levelno >= logging.WARNING:
+                level = "warning"
+            else:
+                level = "info"
+            if page is not None:
+                message = f"{page:4d} {message}"
+            self.event_queue.put((self.job_id, "log", (message, level, page)))
+        except Exception:
+            self.handleError(record)
+
+
+# 工作进程内的当前日志转发器，供进度条插件使用
+_WORKER_STATE = {}
+# 工作进程中以此名称注册本模块，作为 ocrmypdf 插件加载
+PROGRESS_PLUGIN_NAME = "ocrmypdf_gui_progress"
+
+
+# ocrmypdf 进度条插件：将进度条更新转为事件发送到主进程
+class _EventProgressBar:
+    def __init__(self, *, total=None, desc=None, unit=None, disable=False, **kwargs):
+        self.total = total
+        self.desc = desc or ""
+        self.completed = 0
+
+    def __enter__(self):
+        self._send()
+        return self
+
+    def __exit__(self, *args):
+        self._send()
+        return False
+
+    def update(self, n=1, *, completed=None):
+        if completed is not None:
+            self.completed = completed
+        else:
+            self.completed += n
+        self._send()
+
+    def _send(self):
+        handler = _WORKER_STATE.get("handler")
+        if handler is not None:
+            handler.event_queue.put((handler.job_id, "progress",
+                                     (self.desc, self.completed, self.total)))
+
+
+if _hookimpl is not None:
+    @_hookimpl
+    def get_progressbar_class():
+        return _EventProgressBar
+
+
+# 进程内引擎的工作进程：只导入一次 ocrmypdf，之后循环接收任务并调用 ocrmypdf.ocr()
+def _inprocess_worker_main(task_conn, event_queue):
+    # 工作进程自成一个进程组，取消任务时连同 ocrmypdf 的子进程一起结束
+    if hasattr(os, "setsid"):
+        os.setsid()
+    handler = _QueueLogHandler(event_queue)
+    try:
+        import ocrmypdf
+    except Exception as e:
+        event_queue.put((None, "log", (f"进程内引擎加载 ocrmypdf 失败：{e}", "error", None)))
+        return
+    ocr_logger = logging.getLogger("ocrmypdf")
+    ocr_logger.addHandler(handler)
+    ocr_logger.setLevel(logging.DEBUG)
+    _WORKER_STATE["handler"] = handler
+    plugins = []
+    if _hookimpl is not None:
+        sys.modules[PROGRESS_PLUGIN_NAME] = sys.modules[__name__]
+        plugins.append(PROGRESS_PLUGIN_NAME)
+    while True:
+        try:
+            task = task_conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        job_id, input_file, output_file, kwargs, temp_dir = task
+        handler.job_id = job_id
+        if temp_dir:
+            tempfile.tempdir = temp_dir
+            os.environ.update(temp_env(temp_dir))
+        usage_before = _worker_rusage()
+        try:
+            code = int(ocrmypdf.ocr(input_file, output_file, plugins=plugins,
+                                    progress_bar=bool(plugins), **kwargs))
+        except ocrmypdf.exceptions.ExitCodeException as e:
+            event_queue.put((job_id, "log", (f"{type(e).__name__}: {e}", "error", None)))
+            code = int(e.exit_code)
+        except Exception as e:
+            event_queue.put((job_id, "log", (f"{type(e).__name__}: {e}", "error", None)))
+            code = EXIT_OTHER_ERROR
+        handler.job_id = None
+        task_conn.send((code, _worker_rusage_delta(usage_before)))
+
+
+# 工作进程自身及已回收子进程的 rusage（仅 POSIX），用于计算单个任务的 CPU 与 I/O 增量
+def _worker_rusage():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+
+
+def _worker_rusage_delta(before):
+    after = _worker_rusage()
+    if before is None or after is None:
+        return None
+    delta = [sum(getattr(a, field) - getattr(b, field) for a, b in zip(after, before))
+             for field in ("ru_utime", "ru_stime", "ru_inblock", "ru_oublock")]
+    # ru_maxrss 是整个生命周期内的最大值，不能求差，这里取子进程中的最大值作为参考
+    return _rusage_to_resources(delta[0], delta[1], after[1].ru_maxrss, delta[2], delta[3])
+
+
+class _PoolWorker:
+    def __init__(self, ctx, event_queue):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_inprocess_worker_main,
+                                   args=(child_conn, event_queue),
+                                   name="ocrmypdf-worker")
+        self.process.start()
+        child_conn.close()
+
+
+# 进程内引擎：维护一组常驻工作进程，ocrmypdf/pikepdf 的导入开销只付一次；
+# 工作进程不能是守护进程，因为 ocrmypdf 自身还要创建子进程并行处理页面
+class InProcessEngine:
+    name = ENGINE_INPROCESS
+
+    def __init__(self, size=1, on_log=None):
+        self.size = max(1, size)
+        self.on_log = on_log
+        self._ctx = multiprocessing.get_context("spawn")
+        self._event_queue = self._ctx.Queue()
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._active = {}
+        self._closed = False
+        threading.Thread(target=self._drain_events, daemon=True).start()
+        atexit.register(self.shutdown)
+
+    @staticmethod
+    def available():
+        return importlib.util.find_spec("ocrmypdf") is not None
+
+    # 预先启动工作进程，使第一批任务无需等待导入
+    def prewarm(self, size=None):
+        with self._lock:
+            if size:
+                self.size = max(self.size, size)
+            while len(self._workers) < self.size:
+                worker = _PoolWorker(self._ctx, self._event_queue)
+                self._workers.append(worker)
+                self._idle.put(worker)
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle.empty() and len(self._workers) < self.size:
+                worker = _PoolWorker(self._ctx, self._event_queue)
+                self._workers.append(worker)
+                return worker
+        return self._idle.get()
+
+    def _discard(self, worker):
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        worker.conn.close()
+        worker.process.join(timeout=1)
+
+    def run(self, job, log):
+        # 附加参数无法转换为 ocr() 的关键字参数时，该任务改用子进程引擎，保证按预览中的命令运行
+        try:
+            kwargs = build_ocr_kwargs(job.options, job.ocr_input(), jobs=job.jobs)
+        except ValueError as e:
+            log(f"{e}，该任务改用子进程引擎运行", "warning")
+            return SubprocessEngine().run(job, log)
+        worker = self._acquire()
+        if not worker.process.is_alive():
+            self._discard(worker)
+            worker = self._acquire()
+        self._active[job.id] = (job, log)
+        started = time.monotonic()
+        job.process_group = worker.process.pid
+        if job.cancel_reason:
+            self.cancel(job)
+        sampler = ResourceSampler(worker.process.pid).start()
+        try:
+            worker.conn.send((job.id, job.ocr_input(), job.ocr_output(), kwargs, job.temp_dir))
+            code, usage = worker.conn.recv()
+        except (EOFError, OSError):
+            self._discard(worker)
+            if job.cancel_reason:
+                return EXIT_CANCELED
+            log("工作进程意外退出", "error")
+            return EXIT_OTHER_ERROR
+        finally:
+            job.process_group = None
+            self._active.pop(job.id, None)
+            job.resources = merge_resources(sampler.stop(),
+                                            {"wall_seconds": time.monotonic() - started})
+        job.resources = merge_resources(job.resources, usage)
+        self._idle.put(worker)
+        return code
+
+    # 结束运行该任务的工作进程（连同其子进程），之后按需重新启动工作进程
+    def cancel(self, job, wait=False):
+        cancel_job_processes(job, wait)
+
+    def _drain_events(self):
+        while True:
+            try:
+                job_id, kind, payload = self._event_queue.get()
+            except (EOFError, OSError):
+                break
+            job, log = self._active.get(job_id, (None, self.on_log))
+            if kind == "progress":
+                if job:
+                    job.progress.feed_bar(*payload)
+            elif kind == "stage":
+                if job:
+                    job.progress.feed_record(*payload)
+            else:
+                message, level, page = payload
+                if job:
+                    job.progress.feed_record(message, page)
+                if log:
+                    log(message, level)
+
+    def shutdown(self):
+        if self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+
+class _RemoteTask:
+    def __init__(self, job, log):
+        self.job = job
+        self.log = log
+        self.lease = None
+        self.worker = None
+        self.deadline = 0.0
+        self.attempts = 0
+        self.parts = {}
+        self.return_code = None
+        # 已确定结果（完成、取消或放弃）；与 lease、parts 一样只在 RemoteEngine._cond 下修改
+        self.finished = False
+        self.done = threading.Event()
+
+
+# 协调节点的 HTTP 接口（http.server 按需导入，不影响启动速度）：
+#   POST /lease                         领取任务（长轮询），无任务时返回 204
+#   GET  /tasks/<id>/input?lease=...    下载输入文件
+#   POST /tasks/<id>/heartbeat?lease=.. 续约并上报输出行，租约已失效时返回 409
+#   PUT  /tasks/<id>/output|sidecar     上传结果文件
+#   POST /tasks/<id>/complete?lease=..  上报返回码、资源占用和剩余输出行
+def _make_coordinator_handler(engine):
+    from http.server import BaseHTTPRequestHandler
+    import urllib.parse
+
+    class CoordinatorHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def reply(self, code, payload=None):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else b""
+            # 出错时请求体可能未读完，不能复用连接
+            if code >= 400:
+                self.close_connection = True
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+        def dispatch(self, method):
+            url = urllib.parse.urlsplit(self.path)
+            parts = url.path.strip("/").split("/")
+            lease = urllib.parse.parse_qs(url.query).get("lease", [""])[0]
+            if not engine.authorized(self.headers.get("Authorization", "")):
+                return self.reply(401, {"error": "unauthorized"})
+            try:
+                if method == "POST" and parts == ["lease"]:
+                    return engine.handle_lease(self, self.read_json())
+                if len(parts) == 3 and parts[0] == "tasks" and parts[1].isdigit():
+                    task = engine.leased_task(int(parts[1]), lease)
+                    if task is None:
+                        return self.reply(409, {"error": "lease expired"})
+                    action = (method, parts[2])
+                    if action == ("GET", "input"):
+                        return engine.handle_input(self, task)
+                    if action == ("POST", "heartbeat"):
+                        return engine.handle_heartbeat(self, task, self.read_json())
+                    if method == "PUT" and parts[2] in ("output", "sidecar"):
+                        return engine.handle_upload(self, task, parts[2], lease)
+                    if action == ("POST", "complete"):
+                        return engine.handle_complete(self, task, self.read_json(), lease)
+                self.reply(404, {"error": "not found"})
+            except (OSError, ValueError) as e:
+                self.reply(500, {"error": str(e)})
+
+        def do_GET(self):
+            self.dispatch("GET")
+
+        def do_POST(self):
+            self.dispatch("POST")
+
+        def do_PUT(self):
+            self.dispatch("PUT")
+
+    return CoordinatorHandler
+
+
+# 分布式引擎：本进程作为协调节点，在 HTTP 端口上等待其他机器上的工作节点（--worker）领取任务。
+# 工作节点下载输入与选项，在本地运行 ocrmypdf，并回传输出 PDF、sidecar 和输出行；
+# 预检、缓存、拆分与任务日志仍在协调节点完成。工作节点失联（租约过期）时任务重新排队
+class RemoteEngine:
+    name = ENGINE_REMOTE
+
+    def __init__(self, host="0.0.0.0", port=REMOTE_PORT, token=None, on_log=None,
+                 lease_seconds=REMOTE_LEASE_SECONDS):
+        from http.server import ThreadingHTTPServer
+        self.token = token or os.environ.get(REMOTE_TOKEN_ENV) or secrets.token_urlsafe(16)
+        self.on_log = on_log
+        self.lease_seconds = lease_seconds
+        self._pending = collections.deque()
+        self._tasks = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self.server = ThreadingHTTPServer((host, port), _make_coordinator_handler(self))
+        self.server.daemon_threads = True
+        self.address = self.server.server_address[:2]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self._reap_leases, daemon=True).start()
+        atexit.register(self.shutdown)
+        if on_log:
+            on_log(f"协调节点已在端口 {self.address[1]} 监听；在工作节点上运行："
+                   f"python OcrMyPDF_GUI.py --worker http://{socket.gethostname()}:{self.address[1]} "
+                   f"--token {self.token}", "info")
+
+    def authorized(self, header):
+        return hmac.compare_digest(header.encode("utf-8"), f"Bearer {self.token}".encode("utf-8"))
+
+    def run(self, job, log):
+        task = _RemoteTask(job, log)
+        started = time.monotonic()
+        with self._cond:
+            if self._closed:
+                return EXIT_OTHER_ERROR
+            self._tasks[job.id] = task
+            self._pending.append(task)
+            self._cond.notify_all()
+        task.done.wait()
+        with self._cond:
+            self._tasks.pop(job.id, None)
+        job.resources = merge_resources(job.resources, {"wall_seconds": time.monotonic() - started})
+        return task.return_code
+
+    # 取消任务：尚未分配的移出队列，已分配的使租约失效，工作节点在下次心跳时结束本地进程。
+    # 与 handle_complete 在 self._cond 下争用 task.finished，先确定结果的一方生效
+    def cancel(self, job, wait=False):
+        with self._cond:
+            task = self._tasks.get(job.id)
+            if task is None or task.finished:
+                return
+            if task in self._pending:
+                self._pending.remove(task)
+            task.lease = None
+            task.finished = True
+            task.return_code = EXIT_CANCELED
+        self._discard_parts(task)
+        task.done.set()
+
+    # 调用方持有 self._cond
+    @staticmethod
+    def _holds_lease(task, lease):
+        return task.lease is not None and not task.finished and hmac.compare_digest(task.lease, lease)
+
+    def leased_task(self, task_id, lease):
+        with self._cond:
+            task = self._tasks.get(task_id)
+            if task and task.lease and hmac.compare_digest(task.lease, lease):
+                return task
+        return None
+
+    def handle_lease(self, handler, payload):
+        worker = str(payload.get("worker", ""))[:100] or handler.client_address[0]
+        deadline = time.monotonic() + REMOTE_POLL_SECONDS
+        with self._cond:
+            while not self._pending and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            if not self._pending or self._closed:
+                return handler.reply(204)
+            task = self._pending.popleft()
+            task.lease = secrets.token_hex(16)
+            task.worker = worker
+            task.deadline = time.monotonic() + self.lease_seconds
+            task.attempts += 1
+        job = task.job
+        task.log(f"分配给工作节点 {worker}（第 {task.attempts} 次）", "info")
+        handler.reply(200, {"task": job.id, "lease": task.lease, "name": os.path.basename(job.input_path),
+                            "options": job.options, "lease_seconds": self.lease_seconds})
+
+    def handle_input(self, handler, task):
+        size = os.path.getsize(task.job.ocr_input())
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/octet-stream")
+        handler.send_header("Content-Length", str(size))
+        handler.end_headers()
+        with open(task.job.ocr_input(), "rb") as f:
+            shutil.copyfileobj(f, handler.wfile, REMOTE_CHUNK_BYTES)
+
+    def _renew(self, task):
+        with self._cond:
+            task.deadline = time.monotonic() + self.lease_seconds
+
+    # 工作节点回传 ocrmypdf 的原始输出行，进度与阶段在这里解析，与本机运行时一致
+    def _feed_lines(self, task, lines):
+        for line in lines:
+            line = str(line).strip()
+            if line and not task.job.progress.feed_line(line):
+                task.log(line, "info")
+
+    def handle_heartbeat(self, handler, task, payload):
+        self._renew(task)
+        self._feed_lines(task, payload.get("lines", []))
+        handler.reply(200, {})
+
+    def handle_upload(self, handler, task, kind, lease):
+        if kind == "output":
+            target = task.job.ocr_output()
+        else:
+            target = JobScheduler._job_sidecar(task.job)
+            if not target:
+                return handler.reply(400, {"error": "sidecar not requested"})
+        part = f"{target}.{task.lease[:8]}.part"
+        remaining = int(handler.headers.get("Content-Length") or 0)
+        with open(part, "wb") as f:
+            while remaining > 0:
+                chunk = handler.rfile.read(min(remaining, REMOTE_CHUNK_BYTES))
+                if not chunk:
+                    break
+                f.write(chunk)
+                remaining -= len(chunk)
+                self._renew(task)
+        if remaining:
+            os.remove(part)
+            return handler.reply(400, {"error": "incomplete upload"})
+        # 上传期间任务被取消或租约过期时丢弃，不留下临时文件
+        with self._cond:
+            current = self._holds_lease(task, lease)
+            if current:
+                task.parts[target] = part
+        if not current:
+            os.remove(part)
+            return handler.reply(409, {"error": "lease expired"})
+        handler.reply(200, {})
+
+    # 在 self._cond 下先确定结果：任务已取消或租约已失效（已重新分配）时忽略此次完成，
+    # 之后 cancel 不会再改动该任务，替换输出文件在锁外进行
+    def handle_complete(self, handler, task, payload, lease):
+        with self._cond:
+            if not self._holds_lease(task, lease):
+                return handler.reply(409, {"error": "lease expired"})
+            task.lease = None
+            task.finished = True
+            parts, task.parts = task.parts, {}
+        self._feed_lines(task, payload.get("lines", []))
+        code = int(payload.get("return_code", EXIT_OTHER_ERROR))
+        if code == 0 and task.job.ocr_output() not in parts:
+            task.log(f"工作节点 {task.worker} 未上传输出文件", "error")
+            code = EXIT_OTHER_ERROR
+        for target, part in parts.items():
+            if code == 0:
+                os.replace(part, target)
+            else:
+                os.remove(part)
+        task.job.resources = {key: value for key, value in (payload.get("resources") or {}).items()
+                              if key in ("cpu_user", "cpu_system", "peak_rss", "read_bytes", "write_bytes")}
+        task.return_code = code
+        task.done.set()
+        handler.reply(200, {})
+
+    def _discard_parts(self, task):
+        with self._cond:
+            parts, task.parts = task.parts, {}
+        for part in parts.values():
+            with contextlib.suppress(OSError):
+                os.remove(part)
+
+    # 租约过期的任务重新排到队首；分配次数用尽则判为失败
+    def _reap_leases(self):
+        while not self._closed:
+            time.sleep(1.0)
+            now = time.monotonic()
+            with self._cond:
+                expired = [task for task in self._tasks.values()
+                           if task.lease and not task.finished and task.deadline < now]
+                # 已上传的部分在锁内取出，以免删掉重新分配后新租约上传的文件
+                stale = [part for task in expired for part in task.parts.values()]
+                for task in expired:
+                    task.lease = None
+                    task.parts = {}
+                    if task.attempts < REMOTE_MAX_ATTEMPTS:
+                        self._pending.appendleft(task)
+                    else:
+                        task.finished = True
+                        task.return_code = EXIT_OTHER_ERROR
+                self._cond.notify_all()
+            for part in stale:
+                with contextlib.suppress(OSError):
+                    os.remove(part)
+            for task in expired:
+                if task.attempts < REMOTE_MAX_ATTEMPTS:
+                    task.log(f"工作节点 {task.worker} 失联，任务重新分配", "warning")
+                else:
+                    task.log(f"工作节点 {task.worker} 失联，已分配 {task.attempts} 次，放弃该任务", "error")
+                    task.done.set()
+
+    def shutdown(self):
+        if self._closed:
+            return
+        with self._cond:
+            self._closed = True
+            self._pending.clear()
+            tasks = [task for task in self._tasks.values() if not task.finished]
+            for task in tasks:
+                task.lease = None
+                task.finished = True
+                task.return_code = EXIT_OTHER_ERROR
+            self._cond.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+        for task in tasks:
+            self._discard_parts(task)
+            task.done.set()
+
+
+# 批量任务调度器：同时运行至多 max_workers 个 ocrmypdf 进程，
+# 并为每个任务分配 --jobs，使所有运行中任务的线程数之和不超过 CPU 核数
+class JobScheduler:
+    def __init__(self, max_workers=None, cpu_count=None, on_update=None, on_log=None, engine=None,
+                 cache=None, metrics_path=METRICS_FILE, memory_budget=None, memory_model=None,
+                 journal=None, remote_config=None, staging=None, search_index=None, job_timeout=0):
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+        self.metrics_path = metrics_path
+        # 内存预算（字节），0 表示不限制
+        self.memory_budget = default_memory_budget() if memory_budget is None else memory_budget
+        self.memory_model = memory_model or MemoryModel()
+        self._reserved = {}
+        self.max_workers = max_workers or max(1, self.cpu_count // 2)
+        self.engine = engine or SubprocessEngine()
+        self.cache = cache
+        self.journal = journal
+        self.search_index = search_index
+        # 分布式引擎的监听地址与令牌：{"host": ..., "port": ..., "token": ...}
+        self.remote_config = remote_config or {}
+        self.staging = staging
+        # 每个任务的运行时间上限（秒），0 表示不限制
+        self.job_timeout = job_timeout
+        self.on_update = on_update
+        self.on_log = on_log
+        self._pending = collections.deque()
+        self._running = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._dispatcher.start()
+        threading.Thread(target=self._watchdog_loop, daemon=True).start()
+        threading.Thread(target=cleanup_stale_temp_dirs, daemon=True).start()
+
+    def submit(self, job):
+        self._journal_record("record_submit", job)
+        with self._cond:
+            self._pending.append(job)
+            self._update_prefetch()
+            self._cond.notify_all()
+        self._notify(job)
+
+    def set_max_workers(self, value):
+        with self._cond:
+            self.max_workers = max(1, int(value))
+            self._cond.notify_all()
+        if isinstance(self.engine, InProcessEngine):
+            self.engine.prewarm(self.max_workers)
+
+    # 启用、关闭或更换本地暂存；运行中的任务继续使用原来的暂存区
+    def set_staging(self, staging):
+        with self._cond:
+            old, self.staging = self.staging, staging
+            self._update_prefetch()
+        if old and old is not staging:
+            threading.Thread(target=old.drop_prefetched, daemon=True).start()
+
+    # 调用方持有 self._cond
+    def _update_prefetch(self):
+        if self.staging:
+            self.staging.prefetch(list(itertools.islice(self._pending, self.staging.prefetch_depth)))
+
+    def set_memory_budget(self, value):
+        with self._cond:
+            self.memory_budget = max(0, int(value))
+            self._cond.notify_all()
+
+    # 切换执行引擎；运行中的任务继续使用原引擎直到结束
+    def set_engine(self, name):
+        if name == self.engine.name:
+            return
+        if name == ENGINE_INPROCESS and not InProcessEngine.available():
+            if self.on_log:
+                self.on_log("未找到 ocrmypdf Python 模块，继续使用子进程引擎", "warning")
+            return
+        old_engine = self.engine
+        if name == ENGINE_INPROCESS:
+            self.engine = InProcessEngine(self.max_workers, on_log=self.on_log)
+            self.engine.prewarm()
+        elif name == ENGINE_REMOTE:
+            try:
+                self.engine = RemoteEngine(on_log=self.on_log, **self.remote_config)
+            except OSError as e:
+                if self.on_log:
+                    self.on_log(f"无法启动协调节点：{e}", "error")
+                return
+        else:
+            self.engine = SubprocessEngine()
+        threading.Thread(target=self._wait_and_shutdown, args=(old_engine,), daemon=True).start()
+
+    def _wait_and_shutdown(self, engine):
+        with self._cond:
+            while self._running:
+                self._cond.wait()
+        if engine is not self.engine:
+            engine.shutdown()
+
+    # 退出时结束所有运行中的任务（连同子进程）并清理临时文件；
+    # 这些任务在任务日志中保持未完成状态，下次启动时可以恢复
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            self._pending.clear()
+            running = list(self._running)
+        threads = []
+        for job in running:
+            job.cancel_reason = job.cancel_reason or "cancel"
+            if job.engine or job.process_group:
+                cancel = job.engine.cancel if job.engine else cancel_job_processes
+                thread = threading.Thread(target=cancel, args=(job, True), daemon=True)
+                thread.start()
+                threads.append(thread)
+        for thread in threads:
+            thread.join(KILL_GRACE_SECONDS + 2)
+        for job in running:
+            if job.temp_dir:
+                shutil.rmtree(job.temp_dir, ignore_errors=True)
+        self.engine.shutdown()
+
+    # 取消任务：排队中的直接移出队列，运行中的结束其整个进程树；拆分任务连同各分块一起取消
+    def cancel(self, job):
+        if job.status in JOB_FINISHED:
+            return
+        with self._cond:
+            queued = job in self._pending
+            if queued:
+                self._pending.remove(job)
+                self._update_prefetch()
+        job.cancel_reason = "cancel"
+        if queued:
+            if self.staging:
+                threading.Thread(target=self.staging.release, args=(job,), daemon=True).start()
+            self._complete(job, EXIT_CANCELED)
+            return
+        for child in job.children:
+            self.cancel(child)
+        self._abort(job, "cancel", "已请求取消，结束运行中的进程")
+
+    # 结束任务当前的执行；尚未开始执行时，_execute 看到 cancel_reason 后不再启动
+    def _abort(self, job, reason, message):
+        if job.cancel_reason and job.cancel_reason != reason:
+            return
+        job.cancel_reason = reason
+        self._log(job, message, "warning")
+        if job.engine:
+            job.engine.cancel(job)
+        else:
+            # 尚未交给引擎时结束预处理步骤（如自动优化试算）登记的进程组
+            cancel_job_processes(job)
+
+    # 每秒检查运行中的任务：超过任务超时，或设置了每页超时且在页面级阶段长时间没有进展时结束任务
+    def _watchdog_loop(self):
+        while not self._closed:
+            time.sleep(1.0)
+            now = time.monotonic()
+            with self._cond:
+                running = [job for job in self._running if not job.children and not job.cancel_reason]
+            for job in running:
+                if self.job_timeout and job.started_at and now - job.started_at > self.job_timeout:
+                    self._abort(job, "timeout", f"任务超过 {format_duration(self.job_timeout)} 未完成，结束运行中的进程")
+                    continue
+                page_timeout = job.options.get("tesseract_timeout") or 0
+                progress = job.progress
+                stalled = now - progress.last_activity
+                if page_timeout and progress.stage in PAGE_STAGES and stalled > page_timeout * PAGE_STALL_FACTOR:
+                    self._abort(job, "timeout", f"{STAGE_NAMES[progress.stage]}阶段 {stalled:.0f}s 无进展"
+                                                f"（每页超时 {page_timeout}s），结束运行中的进程")
+
+    def counts(self):
+        with self._cond:
+            return len(self._pending), len(self._running)
+
+    # 按剩余空闲核数平均分配给即将启动的任务，至少 1 个
+    def _allocate_jobs(self):
+        free_cores = self.cpu_count - sum(self._running.values())
+        slots = min(self.max_workers - len(self._running), len(self._pending) + 1)
+        return max(1, free_cores // max(1, slots))
+
+    # 内存准入：按剩余预算决定能否启动任务，以及最多同时处理几页（--jobs）。
+    # 预算不足时返回 None 等待运行中的任务结束；没有运行中的任务时总是启动，避免单个大任务永远等待
+    def _admit(self, job):
+        jobs = self._allocate_jobs()
+        base, per_page = estimate_job_memory(job.geometry, job.options)
+        factor = self.memory_model.factor(job.options)
+        concurrent = min(jobs, job.geometry["pages"] or jobs)
+        # 分布式引擎的任务在其他机器上运行，不占用本机内存预算
+        if self.memory_budget and self.engine.name != ENGINE_REMOTE:
+            remaining = self.memory_budget - sum(self._reserved.values())
+            fit = int((remaining / factor - base) // per_page)
+            if fit < 1 and self._running:
+                if not job.memory_waiting:
+                    job.memory_waiting = True
+                    self._log(job, f"等待内存：预估需要 {format_bytes((base + per_page) * factor)}，"
+                                   f"剩余预算 {format_bytes(max(remaining, 0)) or '0'}", "info")
+                return None
+            if fit < concurrent:
+                concurrent = max(1, fit)
+                jobs = concurrent
+                self._log(job, f"内存预算有限，--jobs 降为 {jobs}", "warning")
+        job.memory_raw = base + concurrent * per_page
+        job.memory_estimate = int(job.memory_raw * factor)
+        self._reserved[job] = job.memory_estimate
+        return jobs
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending or len(self._running) >= self.max_workers:
+                    self._cond.wait()
+                job = self._pending[0]
+            # 读取页面信息需要打开文件，在锁外完成。使用本地暂存时等预取完成后读取本地副本，
+            # 不在调度线程中读取网络共享（也不绕过带宽上限）；没有本地副本时按默认幅面估算
+            if job.geometry is None:
+                if self.staging:
+                    local = self.staging.staged_path(job)
+                    job.geometry = inspect_page_geometry(local) if local else default_page_geometry()
+                else:
+                    job.geometry = inspect_page_geometry(job.input_path)
+            with self._cond:
+                if not self._pending or self._pending[0] is not job or len(self._running) >= self.max_workers:
+                    continue
+                jobs = self._admit(job)
+                if jobs is None:
+                    self._cond.wait()
+                    continue
+                self._pending.popleft()
+                self._update_prefetch()
+                job.jobs = jobs
+                self._running[job] = job.jobs
+                job.status = JOB_RUNNING
+                job.started_at = time.monotonic()
+            self._notify(job)
+            threading.Thread(target=self._run_job, args=(job,), daemon=True).start()
+
+    def _run_job(self, job):
+        # PDF 的页数取自调度时读取的页面信息，不再打开原文件
+        is_pdf = job.input_path.lower().endswith(".pdf")
+        job.progress = JobProgress(job.geometry["pages"] if is_pdf and job.geometry else None)
+        if job.submitted_options is None:
+            job.submitted_options = dict(job.options)
+        job.sidecar_output = self._job_sidecar(job)
+        self._journal_record("record_start", job)
+        try:
+            if not self._reuse_journaled(job):
+                self._stage_input(job)
+                # 调度时没能读到页数（未预取等）时在暂存后的输入上补读
+                if is_pdf and job.progress.pages_total is None:
+                    job.progress.pages_total = count_pdf_pages(job.ocr_input())
+                job.cache_key = self._cache_key(job)
+            if job.reused:
+                return_code = 0
+            elif job.cache_key and self._restore_cached(job, job.cache_key):
+                return_code = 0
+            elif self._should_split(job):
+                return_code = self._start_split(job)
+            else:
+                self._stage_output(job)
+                # 各预处理步骤之间检查是否已取消；运行中的外部命令由 _abort 结束
+                if job.preflight and not job.cancel_reason:
+                    self._apply_preflight(job)
+                if job.page_filter and not job.cancel_reason:
+                    self._apply_page_filter(job)
+                if job.options.get("auto_language") and not job.cancel_reason:
+                    self._apply_auto_language(job)
+                if job.options.get("optimize") == OPTIMIZE_AUTO and not job.cancel_reason:
+                    self._apply_auto_optimize(job)
+                try:
+                    return_code = self._execute(job)
+                finally:
+                    if job.work_input:
+                        with contextlib.suppress(OSError):
+                            os.remove(job.work_input)
+                if job.cache_key and return_code == 0:
+                    self._store_cache(job, job.ocr_output())
+                return_code = self._upload_outputs(job, return_code)
+        except Exception as e:
+            self._log(job, "执行过程中出错：" + str(e), "error")
+            return_code = self._upload_outputs(job, -1)
+        if job.staged_input:
+            job.staging.release(job)
+            job.staged_input = None
+        if job.temp_dir:
+            shutil.rmtree(job.temp_dir, ignore_errors=True)
+            job.temp_dir = None
+        with self._cond:
+            self._running.pop(job, None)
+            self._reserved.pop(job, None)
+            self._cond.notify_all()
+        if self._closed:
+            return
+        # 拆分任务在所有分块结束后、暂存的输出在上传完成后才完成，这里只释放运行名额
+        if return_code is None:
+            self._notify(job)
+        elif return_code == EXIT_TIMEOUT and self._requeue_degraded(job):
+            self._notify(job)
+        else:
+            self._complete(job, return_code)
+
+    # 超时的任务去掉开销较大的选项后重新排队；没有可降级的选项时返回 False
+    def _requeue_degraded(self, job):
+        options, description = degrade_options(job.submitted_options)
+        if description is None:
+            self._log(job, "任务超时，已没有可降级的选项", "error")
+            return False
+        job.retries += 1
+        self._log(job, f"任务超时，{description}后重新排队（第 {job.retries} 次重试）", "warning")
+        job.options = dict(options)
+        job.submitted_options = options
+        job.status = JOB_QUEUED
+        job.cancel_reason = None
+        job.started_at = None
+        job.engine = job.engine_name = None
+        job.resources = None
+        job.cache_key = None
+        job.skipped_pages = []
+        job.optimize_decision = None
+        job.work_input = None
+        job.staged_output = None
+        job.memory_estimate = job.memory_raw = None
+        job.memory_waiting = False
+        self.submit(job)
+        return True
+
+    def _complete(self, job, return_code):
+        job.return_code = return_code
+        job.finished_at = time.monotonic()
+        job.progress.finish(job.return_code == 0)
+        if job.return_code == 0:
+            job.status = JOB_DONE
+        else:
+            job.status = JOB_CANCELED if job.cancel_reason == "cancel" else JOB_FAILED
+        if job.children:
+            job.resources = sum_resources(child.resources for child in job.children)
+        if job.status == JOB_DONE:
+            self._log(job, "任务完成" + self._format_resources(job), "success")
+            if job.engine_name and not job.children and job.resources:
+                self.memory_model.observe(job.options, job.memory_raw, job.resources.get("peak_rss"))
+        elif job.status == JOB_CANCELED:
+            self._log(job, "任务已取消", "warning")
+        else:
+            self._log(job, f"任务失败，返回码：{job.return_code}", "error")
+        if (self.metrics_path and job.parent is None and not (job.cached or job.reused)
+                and job.status != JOB_CANCELED):
+            try:
+                append_job_metrics(job, self.metrics_path)
+            except OSError as e:
+                self._log(job, f"写入指标文件失败：{e}", "warning")
+        self._journal_record("record_finish", job)
+        if job.status == JOB_DONE:
+            self._index_sidecar(job)
+        self._notify(job)
+        if job.parent is not None:
+            self._chunk_finished(job)
+
+    # 分块子任务由拆分清单负责断点续跑，不写入任务日志；任务日志出错不影响任务本身
+    def _journal_record(self, method, job):
+        if not self.journal or job.parent is not None:
+            return
+        try:
+            getattr(self.journal, method)(job)
+        except (sqlite3.Error, OSError) as e:
+            self._log(job, f"写入任务日志失败：{e}", "warning")
+
+    def _index_sidecar(self, job):
+        if not self.search_index or job.parent is not None or not job.sidecar_output:
+            return
+        if not os.path.exists(job.sidecar_output):
+            return
+        try:
+            self.search_index.index_document(job.output_path, job.sidecar_output)
+        except (sqlite3.Error, OSError) as e:
+            self._log(job, f"加入全文索引失败：{e}", "warning")
+
+    def _reuse_journaled(self, job):
+        if not self.journal or job.parent is not None:
+            return False
+        try:
+            row = self.journal.find_valid_output(job)
+        except sqlite3.Error as e:
+            self._log(job, f"读取任务日志失败：{e}", "warning")
+            return False
+        if row is None:
+            return False
+        job.reused = True
+        job.output_hash = row["output_hash"]
+        self._log(job, f"任务日志显示输出已有效（记录 #{row['id']}），跳过处理", "success")
+        return True
+
+    # 本地暂存输入；复制失败时直接读取原文件
+    def _stage_input(self, job):
+        if not self.staging:
+            return
+        job.staging = self.staging
+        try:
+            job.staged_input, prefetched, seconds = job.staging.acquire(job)
+        except OSError as e:
+            self._log(job, f"暂存输入失败，直接读取原文件：{e}", "warning")
+            return
+        self._log(job, f"输入已暂存到本地（{'预取' if prefetched else '复制'}耗时 {seconds:.1f}s）", "info")
+
+    # ocrmypdf 的输出与 sidecar 先写入暂存目录，成功后再上传
+    def _stage_output(self, job):
+        if not job.staging:
+            return
+        job.staged_output = job.staging.local_path(job, "output.pdf")
+        job.uploads = [(job.staged_output, job.output_path)]
+        sidecar = self._job_sidecar(job)
+        if sidecar:
+            local = job.staging.local_path(job, "sidecar.txt")
+            job.options = dict(job.options, sidecar_name=local)
+            job.uploads.append((local, sidecar))
+
+    # 成功时交给后台上传并返回 None（上传完成后再结束任务），失败时删除暂存的输出
+    def _upload_outputs(self, job, return_code):
+        uploads, job.uploads = job.uploads, []
+        if not uploads:
+            return return_code
+        if return_code != 0:
+            for local, _ in uploads:
+                with contextlib.suppress(OSError):
+                    os.remove(local)
+            return return_code
+        self._log(job, "后台上传输出", "info")
+        job.staging.upload(job, uploads, self._uploaded)
+        return None
+
+    def _uploaded(self, job, error):
+        if error:
+            self._log(job, f"上传输出失败：{error}", "error")
+        self._complete(job, EXIT_OTHER_ERROR if error else 0)
+
+    def _should_split(self, job):
+        pages = job.progress.pages_total
+        if not job.split_pages or not pages or pages <= job.split_pages:
+            return False
+        if job.options.get("pages"):
+            self._log(job, "已指定处理页数，不进行拆分", "warning")
+            return False
+        if importlib.util.find_spec("pikepdf") is None:
+            self._log(job, "未安装 pikepdf，无法拆分，按整个文件处理", "warning")
+            return False
+        return True
+
+    # 拆分输入并提交尚未完成的分块；所有分块都已完成时直接合并并返回退出码，否则返回 None
+    def _start_split(self, job):
+        job.split_dir = job.output_path + ".parts"
+        job.manifest = plan_split(job.ocr_input(), job.split_dir, job.split_pages, job.options)
+        # 语言与优化级别只对整个文件判断一次，各分块沿用
+        if job.options.get("auto_language") and not job.cancel_reason:
+            self._apply_auto_language(job)
+        if job.options.get("optimize") == OPTIMIZE_AUTO and not job.cancel_reason:
+            self._apply_auto_optimize(job)
+        if job.cancel_reason:
+            return EXIT_TIMEOUT if job.cancel_reason == "timeout" else EXIT_CANCELED
+        chunk_options = dict(job.options, sidecar_name="", pages="",
+                             title="", author="", subject="", keywords="")
+        for chunk in job.manifest["chunks"]:
+            if chunk["done"] and os.path.exists(chunk["output"]):
+                continue
+            chunk["done"] = False
+            child = OCRJob(chunk["input"], chunk["output"], chunk_options)
+            child.parent = job
+            child.chunk = chunk
+            child.use_cache = job.use_cache
+            child.preflight = job.preflight
+            child.page_filter = job.page_filter
+            job.children.append(child)
+        total = len(job.manifest["chunks"])
+        self._log(job, f"拆分为 {total} 块（每块 {job.split_pages} 页），"
+                       f"其中 {total - len(job.children)} 块已在之前完成", "info")
+        job.progress.set_pages(self._split_pages_done(job), job.manifest["pages"])
+        if not job.children:
+            return self._merge_split(job)
+        for child in job.children:
+            self.submit(child)
+        return None
+
+    @staticmethod
+    def _split_pages_done(job):
+        return sum(chunk["last"] - chunk["first"] + 1
+                   for chunk in job.manifest["chunks"] if chunk["done"])
+
+    def _chunk_finished(self, child):
+        parent = child.parent
+        with parent.split_lock:
+            if child.status == JOB_DONE:
+                child.chunk["done"] = True
+                _write_split_manifest(parent.split_dir, parent.manifest)
+            parent.progress.set_pages(self._split_pages_done(parent))
+            if parent.merging or any(c.status not in JOB_FINISHED for c in parent.children):
+                self._notify(parent)
+                return
+            parent.merging = True
+            failed = [c for c in parent.children if c.status != JOB_DONE]
+        if failed:
+            self._log(parent, f"{len(failed)} 个分块失败；已完成的分块已保存，重新加入该文件即可从断点继续", "error")
+            self._complete(parent, failed[0].return_code)
+        else:
+            self._complete(parent, self._merge_split(parent))
+
+    def _merge_split(self, job):
+        self._log(job, "合并各分块结果", "info")
+        try:
+            merge_split_outputs(job.manifest, job.input_path, job.output_path, job.options)
+        except Exception as e:
+            self._log(job, f"合并失败：{e}", "error")
+            return EXIT_OTHER_ERROR
+        if job.cache_key:
+            self._store_cache(job, job.output_path)
+        shutil.rmtree(job.split_dir, ignore_errors=True)
+        return 0
+
+    # 写入缓存失败不影响任务结果，只记录警告
+    def _store_cache(self, job, output_path):
+        try:
+            self.cache.store(job.cache_key, output_path, self._job_sidecar(job))
+        except OSError as e:
+            self._log(job, f"写入结果缓存失败：{e}", "warning")
+
+    @staticmethod
+    def _job_sidecar(job):
+        if job.options.get("sidecar"):
+            return sidecar_path(job.input_path, job.options.get("sidecar_name", ""))
+        return None
+
+    # 只对需要的页做 OCR：由预检结果生成 --pages；已手动指定页数时不做预检
+    def _apply_preflight(self, job):
+        if job.options.get("pages") or not job.input_path.lower().endswith(".pdf"):
+            return
+        try:
+            classes = scan_text_layer(job.ocr_input())
+        except Exception as e:
+            self._log(job, f"预检失败，按原设置处理：{e}", "warning")
+            return
+        pages = pages_needing_ocr(classes, job.options.get("force_ocr") or job.options.get("redo_ocr"))
+        self._log(job, preflight_report(classes, pages), "info")
+        if not pages:
+            # 没有需要 OCR 的页：跳过已有文字的页，仍按输出类型生成结果
+            job.options = dict(job.options, skip_text=True, force_ocr=False, redo_ocr=False)
+        elif len(pages) < len(classes):
+            job.options = dict(job.options, pages=format_page_ranges(pages))
+
+    # 跳过空白页与重复页：在预检之后进行，与预检或手动指定的 --pages 取交集；
+    # 删除模式下生成删除这些页后的临时输入，并将 --pages 中的页码换算为删除后的页码
+    def _apply_page_filter(self, job):
+        if not job.input_path.lower().endswith(".pdf"):
+            return
+        try:
+            result = detect_skippable_pages(job.ocr_input(), job=job)
+        except (OSError, ValueError, subprocess.SubprocessError) as e:
+            if not job.cancel_reason:
+                self._log(job, f"空白页与重复页检测失败，按原设置处理：{e}", "warning")
+            return
+        total = result["pages"]
+        skipped = set(result["blank"]) | {page for page, _ in result["duplicate"]}
+        self._log(job, page_filter_report(result), "info")
+        if not skipped:
+            return
+        kept = [page for page in range(1, total + 1) if page not in skipped]
+        try:
+            requested = (parse_page_ranges(job.options["pages"], total) if job.options.get("pages")
+                         else list(range(1, total + 1)))
+        except ValueError as e:
+            self._log(job, f"处理页数无效，不跳过空白页与重复页：{e}", "warning")
+            return
+        wanted = [page for page in requested if page not in skipped]
+        if not wanted:
+            self._log(job, "需要处理的页都是空白页或重复页，按原设置处理", "warning")
+            return
+        if job.page_filter == "drop":
+            path = job.ocr_output() + ".filtered.pdf"
+            try:
+                write_pdf_without_pages(job.ocr_input(), path, skipped)
+            except Exception as e:
+                self._log(job, f"删除空白页与重复页失败，按原设置处理：{e}", "warning")
+                return
+            job.work_input = path
+            renumber = {page: index for index, page in enumerate(kept, 1)}
+            options = dict(job.options, pages=format_page_ranges(renumber[page] for page in wanted)
+                           if job.options.get("pages") else "")
+            if options.get("sidecar"):
+                # sidecar 默认按输入文件命名，改为临时输入后须保持原来的位置
+                options["sidecar_name"] = sidecar_path(job.input_path, options.get("sidecar_name", ""))
+            job.options = options
+            self._log(job, f"已从输出中删除 {len(skipped)} 页", "info")
+        else:
+            job.options = dict(job.options, pages=format_page_ranges(wanted))
+            self._log(job, f"跳过 {len(set(requested) - set(wanted))} 页的 OCR", "info")
+        job.skipped_pages = sorted(skipped)
+
+    # 自动识别语言：在勾选的语言中选出覆盖抽样页文字的最小集合，只把这些语言传给 -l
+    def _apply_auto_language(self, job):
+        candidates = job.options.get("languages") or []
+        if len(candidates) > 1:
+            try:
+                result = detect_languages(job.ocr_input(), candidates,
+                                          exclude=job.skipped_pages if not job.work_input else (), job=job)
+            except (OSError, subprocess.SubprocessError) as e:
+                if not job.cancel_reason:
+                    self._log(job, f"自动识别语言失败，使用全部勾选的语言：{e}", "warning")
+            else:
+                self._log(job, language_report(result, candidates), "info")
+                job.options = dict(job.options, languages=result["languages"])
+        job.options = dict(job.options, auto_language=False)
+
+    # 自动优化：抽样试算后把选用的级别写入选项，试算结果保存在任务上
+    def _apply_auto_optimize(self, job):
+        target = (job.options.get("optimize_target_kb") or OPTIMIZE_AUTO_TARGET // 1024) * 1024
+        try:
+            result = choose_optimize_level(job.ocr_input(), job.options, target,
+                                           exclude=job.skipped_pages if not job.work_input else (), job=job)
+        except (OSError, subprocess.SubprocessError) as e:
+            if job.cancel_reason:
+                return
+            self._log(job, f"自动优化试算失败，使用 -O {OPTIMIZE_AUTO_FALLBACK}：{e}", "warning")
+            result = {"level": OPTIMIZE_AUTO_FALLBACK, "target": target, "error": str(e)}
+        else:
+            self._log(job, optimize_report(result), "info")
+        job.optimize_decision = result
+        job.options = dict(job.options, optimize=result["level"])
+
+    def _cache_key(self, job):
+        if not (self.cache and job.use_cache):
+            return None
+        try:
+            options = dict(job.options, preflight=True) if job.preflight else job.options
+            if job.page_filter:
+                options = dict(options, page_filter=job.page_filter)
+            return self.cache.key(job.ocr_input(), options)
+        except OSError as e:
+            self._log(job, f"计算缓存键失败：{e}", "warning")
+            return None
+
+    def _restore_cached(self, job, cache_key):
+        try:
+            restored = self.cache.restore(cache_key, job.output_path, self._job_sidecar(job))
+        except OSError as e:
+            self._log(job, f"读取缓存失败，重新处理：{e}", "warning")
+            return False
+        if restored:
+            job.cached = True
+            self._log(job, "命中结果缓存，跳过 OCR", "success")
+        return restored
+
+    @staticmethod
+    def _format_resources(job):
+        resources = job.resources
+        if not resources:
+            return ""
+        return (f"（CPU {resources.get('cpu_user', 0) + resources.get('cpu_system', 0):.1f}s，"
+                f"峰值内存 {format_bytes(resources.get('peak_rss')) or '--'}，"
+                f"读 {format_bytes(resources.get('read_bytes')) or '0'}，"
+                f"写 {format_bytes(resources.get('write_bytes')) or '0'}）")
+
+    # 临时文件写入任务自己的临时目录；被取消或超时时返回对应的退出码。
+    # 取消到达时引擎已经成功完成（输出已写入）的，仍按成功处理
+    def _execute(self, job):
+        if job.cancel_reason:
+            return EXIT_TIMEOUT if job.cancel_reason == "timeout" else EXIT_CANCELED
+        job.engine = self.engine
+        job.engine_name = self.engine.name
+        job.temp_dir = make_job_temp_dir()
+        self._log(job, f"开始处理（--jobs {job.jobs}，预估峰值内存 {format_bytes(job.memory_estimate) or '--'}）："
+                       f"{job.input_path}", "info")
+        return_code = job.engine.run(job, lambda message, level: self._log(job, message, level))
+        if job.cancel_reason and return_code != 0:
+            return EXIT_TIMEOUT if job.cancel_reason == "timeout" else EXIT_CANCELED
+        return return_code
+
+    def _log(self, job, message, level):
+        if self.on_log:
+            self.on_log(f"[#{job.id} {os.path.basename(job.input_path)}] {message}", level)
+
+    def _notify(self, job):
+        if self.on_update:
+            self.on_update(job)
+
+
+# 热文件夹：监视输入目录，文件写入完成后按配置提交任务；
+# 成功的结果写入输出目录，失败的输入移入失败目录。
+# 优先使用 inotify（需安装 inotify_simple），否则定时轮询
+class HotFolderWatcher:
+    def __init__(self, watch_dirs, output_dir, failed_dir, options, scheduler,
+                 archive_dir=None, settle=HOTFOLDER_SETTLE_SECONDS,
+                 poll_interval=HOTFOLDER_POLL_SECONDS, preflight=False, page_filter=""):
+        self.watch_dirs = [os.path.abspath(d) for d in watch_dirs]
+        self.output_dir = output_dir
+        self.failed_dir = failed_dir
+        self.archive_dir = archive_dir
+        self.options = dict(options, sidecar_name="")
+        self.scheduler = scheduler
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.preflight = preflight
+        self.page_filter = page_filter
+        self.log = logging.getLogger("ocrmypdf_gui.hotfolder")
+        self._candidates = {}
+        self._submitted = {}
+        # 已处理过的文件 -> 提交时的 (大小, 修改时间)；文件未再变化时不重复提交
+        # （输出来自结果缓存或任务日志时修改时间可能早于输入，不能只比较输出的修改时间）
+        self._processed = {}
+        self._watch_descriptors = {}
+        self._lock = threading.Lock()
+        for path in [output_dir, failed_dir, archive_dir]:
+            if path:
+                os.makedirs(path, exist_ok=True)
+
+    def _open_inotify(self):
+        try:
+            from inotify_simple import INotify, flags
+        except ImportError:
+            return None
+        inotify = INotify()
+        self._watch_descriptors = {}
+        for watch_dir in self.watch_dirs:
+            wd = inotify.add_watch(watch_dir, flags.CLOSE_WRITE | flags.MOVED_TO)
+            self._watch_descriptors[wd] = watch_dir
+        return inotify
+
+    def run(self, stop_event):
+        inotify = self._open_inotify()
+        self.log.info("监视目录：%s（%s）", ", ".join(self.watch_dirs),
+                      "inotify" if inotify else f"每 {self.poll_interval:g} 秒轮询")
+        last_scan = 0.0
+        while not stop_event.is_set():
+            now = time.monotonic()
+            if inotify is None or now - last_scan >= HOTFOLDER_RESCAN_SECONDS:
+                for watch_dir in self.watch_dirs:
+                    self._scan(watch_dir)
+                last_scan = now
+            if inotify is not None:
+                # 有待确认的文件时缩短等待，及时判断是否写入完成
+                timeout = 1000 if self._candidates else int(self.poll_interval * 1000)
+                for event in inotify.read(timeout=timeout):
+                    watch_dir = self._watch_descriptors.get(event.wd)
+                    if watch_dir and event.name:
+                        self._consider(os.path.join(watch_dir, event.name))
+            else:
+                stop_event.wait(self.poll_interval)
+            self._check_candidates()
+        if inotify is not None:
+            inotify.close()
+
+    def _scan(self, watch_dir):
+        try:
+            names = os.listdir(watch_dir)
+        except OSError as e:
+            self.log.warning("无法读取目录 %s：%s", watch_dir, e)
+            return
+        paths = {os.path.join(watch_dir, name) for name in names}
+        with self._lock:
+            for path in [path for path in self._processed
+                         if os.path.dirname(path) == watch_dir and path not in paths]:
+                del self._processed[path]
+        for path in paths:
+            self._consider(path)
+
+    def _consider(self, path):
+        if not path.lower().endswith(INPUT_EXTENSIONS) or not os.path.isfile(path):
+            return
+        with self._lock:
+            if path in self._submitted or path in self._candidates:
+                return
+            processed = self._processed.get(path)
+        if processed:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return
+            if (stat.st_size, stat.st_mtime) == processed:
+                return
+        output = default_output_path(path, self.output_dir)
+        try:
+            if os.path.getmtime(output) >= os.path.getmtime(path):
+                return
+        except OSError:
+            pass
+        self._candidates[path] = (None, time.monotonic())
+
+    # 大小和修改时间在 settle 秒内保持不变，且能以只读方式打开，才认为写入完成
+    def _check_candidates(self):
+        now = time.monotonic()
+        for path, (signature, since) in list(self._candidates.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self._candidates[path]
+                continue
+            current = (stat.st_size, stat.st_mtime)
+            if current != signature:
+                self._candidates[path] = (current, now)
+            elif now - since >= self.settle and stat.st_size > 0:
+                try:
+                    with open(path, "rb"):
+                        pass
+                except OSError:
+                    continue
+                del self._candidates[path]
+                self._submit(path, current)
+
+    def _submit(self, path, signature=None):
+        job = OCRJob(path, default_output_path(path, self.output_dir), self.options)
+        job.preflight = self.preflight
+        job.page_filter = self.page_filter
+        with self._lock:
+            self._submitted[path] = signature
+        self.log.info("提交任务 #%d：%s", job.id, path)
+        self.scheduler.submit(job)
+
+    # 由调度器在任务状态变化时调用（任务线程中）
+    def on_job_update(self, job):
+        if job.parent is not None or job.status not in (JOB_DONE, JOB_FAILED):
+            return
+        try:
+            if job.status == JOB_DONE and self.archive_dir:
+                shutil.move(job.input_path, os.path.join(self.archive_dir, os.path.basename(job.input_path)))
+            elif job.status == JOB_FAILED and self.failed_dir:
+                target = os.path.join(self.failed_dir, os.path.basename(job.input_path))
+                shutil.move(job.input_path, target)
+                with open(target + ".error.txt", "w", encoding="utf-8") as f:
+                    f.write(f"ocrmypdf 返回码：{job.return_code}\n")
+        except OSError as e:
+            self.log.error("移动文件失败 %s：%s", job.input_path, e)
+        with self._lock:
+            signature = self._submitted.pop(job.input_path, None)
+            if signature and os.path.exists(job.input_path):
+                self._processed[job.input_path] = signature
+
+
+def _headless_log(message, level):
+    levels = {"error": logging.ERROR, "warning": logging.WARNING}
+    logging.getLogger("ocrmypdf_gui").log(levels.get(level, logging.INFO), message)
+
+
+# 无界面模式入口：不创建任何 Tk 窗口
+def run_headless(args):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    options = load_profile(args.profile) if args.profile else dict(DEFAULT_OPTIONS)
+    if args.page_timeout is not None:
+        options["tesseract_timeout"] = args.page_timeout
+    if args.optimize_target is not None:
+        options["optimize_target_kb"] = args.optimize_target
+    watcher = None
+    scheduler = JobScheduler(max_workers=args.workers,
+                             on_update=lambda job: watcher and watcher.on_job_update(job),
+                             on_log=_headless_log,
+                             cache=ResultCache() if args.cache else None,
+                             memory_budget=None if args.memory_budget is None else int(args.memory_budget * 1024 ** 3),
+                             journal=None if args.no_journal else JobJournal(),
+                             search_index=None if args.no_index else SearchIndex(),
+                             job_timeout=args.job_timeout,
+                             remote_config=_remote_config(args),
+                             staging=StagingArea(args.scratch, args.prefetch, args.bandwidth * 1024 ** 2)
+                             if args.scratch else None)
+    scheduler.set_engine(args.engine)
+    watcher = HotFolderWatcher(args.watch, args.output, args.failed, options, scheduler,
+                               archive_dir=args.archive, settle=args.settle,
+                               poll_interval=args.poll_interval, preflight=args.preflight,
+                               page_filter=args.page_filter or "")
+    stop_event = threading.Event()
+    try:
+        watcher.run(stop_event)
+    except KeyboardInterrupt:
+        stop_event.set()
+    finally:
+        scheduler.shutdown()
+
+
+def _remote_config(args):
+    host, _, port = (args.listen or "").rpartition(":")
+    config = {"token": args.token}
+    if args.listen:
+        config.update(host=host or "0.0.0.0", port=int(port))
+    return config
+
+
+# 工作节点上的进度对象：ocrmypdf 的输出行不在本地解析，原样排队发回协调节点
+class _RelayProgress(JobProgress):
+    def __init__(self, outbox, lock):
+        super().__init__()
+        self.outbox = outbox
+        self.lock = lock
+
+    def feed_line(self, line):
+        with self.lock:
+            self.outbox.append(line)
+        return True
+
+
+class _CoordinatorClient:
+    def __init__(self, url, token):
+        self.url = url.rstrip("/")
+        self.token = token
+
+    def request(self, method, path, data=None, headers=None, timeout=REMOTE_POLL_SECONDS + 30):
+        import urllib.request
+        headers = dict(headers or {}, Authorization=f"Bearer {self.token}")
+        request = urllib.request.Request(self.url + path, data=data, method=method, headers=headers)
+        return urllib.request.urlopen(request, timeout=timeout)
+
+    def call(self, method, path, payload=None):
+        data = json.dumps(payload or {}, ensure_ascii=False).encode("utf-8")
+        with self.request(method, path, data, {"Content-Type": "application/json"}) as response:
+            body = response.read()
+        return json.loads(body) if body else None
+
+    def upload(self, path, file_path):
+        with open(file_path, "rb") as f:
+            with self.request("PUT", path, f, {"Content-Length": str(os.path.getsize(file_path)),
+                                               "Content-Type": "application/octet-stream"}) as response:
+                response.read()
+
+
+# 在工作节点上执行一个任务：下载输入，本地运行 ocrmypdf，心跳线程续约并转发输出行，完成后上传结果。
+# 租约失效（协调节点已将任务重新分配）时丢弃结果
+def _run_remote_task(client, task, engine, jobs, log):
+    import urllib.error
+    prefix = f"/tasks/{task['task']}/"
+    query = f"?lease={task['lease']}"
+    outbox, lock = [], threading.Lock()
+    stop, lost = threading.Event(), threading.Event()
+
+    def take_lines():
+        with lock:
+            lines = outbox[:]
+            outbox.clear()
+        return lines
+
+    def heartbeat():
+        interval = min(REMOTE_HEARTBEAT_SECONDS, task["lease_seconds"] / 3)
+        while not stop.wait(interval):
+            lines = take_lines()
+            try:
+                client.call("POST", prefix + "heartbeat" + query, {"lines": lines})
+            except urllib.error.HTTPError as e:
+                if e.code == 409:
+                    lost.set()
+                    engine.cancel(job)
+                    return
+            except OSError:
+                # 协调节点暂时不可达：保留输出行，下次心跳再发
+                with lock:
+                    outbox[:0] = lines
+
+    work_dir = tempfile.mkdtemp(prefix="ocrmypdf_worker_")
+    try:
+        input_path = os.path.join(work_dir, "input" + os.path.splitext(task["name"])[1].lower())
+        with client.request("GET", prefix + "input" + query) as response, open(input_path, "wb") as f:
+            shutil.copyfileobj(response, f, REMOTE_CHUNK_BYTES)
+        options = dict(task["options"])
+        if options.get("sidecar"):
+            options["sidecar_name"] = os.path.join(work_dir, "sidecar.txt")
+        job = OCRJob(input_path, os.path.join(work_dir, "output.pdf"), options)
+        job.jobs = jobs
+        job.temp_dir = os.path.join(work_dir, "tmp")
+        os.makedirs(job.temp_dir)
+        job.progress = _RelayProgress(outbox, lock)
+        log.info("开始处理任务 #%s：%s", task["task"], task["name"])
+        threading.Thread(target=heartbeat, daemon=True).start()
+        code = engine.run(job, lambda message, level: job.progress.feed_line(message))
+        stop.set()
+        if lost.is_set():
+            log.warning("任务 #%s 的租约已失效，结果丢弃", task["task"])
+            return
+        if code == 0:
+            client.upload(prefix + "output" + query, job.output_path)
+            if options.get("sidecar") and os.path.exists(options["sidecar_name"]):
+                client.upload(prefix + "sidecar" + query, options["sidecar_name"])
+        client.call("POST", prefix + "complete" + query,
+                    {"return_code": code, "resources": job.resources, "lines": take_lines()})
+        log.info("任务 #%s 结束，返回码：%s", task["task"], code)
+    except OSError as e:
+        log.error("任务 #%s 执行失败：%s", task["task"], e)
+    finally:
+        stop.set()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+# 工作节点入口：反复向协调节点领取任务，一次处理一个，--jobs 默认为本机 CPU 核数
+def run_worker(args):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    log = logging.getLogger("ocrmypdf_gui.worker")
+    client = _CoordinatorClient(args.worker, args.token or os.environ.get(REMOTE_TOKEN_ENV, ""))
+    name = args.worker_name or f"{socket.gethostname()}-{os.getpid()}"
+    jobs = args.worker_jobs or os.cpu_count() or 1
+    engine = SubprocessEngine()
+    log.info("工作节点 %s 已启动（--jobs %s），协调节点：%s", name, jobs, client.url)
+    try:
+        while True:
+            try:
+                task = client.call("POST", "/lease", {"worker": name})
+            except OSError as e:
+                log.warning("无法连接协调节点：%s", e)
+                time.sleep(REMOTE_RETRY_SECONDS)
+                continue
+            if task:
+                _run_remote_task(client, task, engine, jobs, log)
+    except KeyboardInterrupt:
+        pass
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="OCRmyPDF 图形化前端；使用 --headless 以热文件夹模式运行")
+    parser.add_argument("--headless", action="store_true", help="无界面热文件夹模式")
+    parser.add_argument("--watch", action="append", default=[], metavar="DIR", help="监视的输入目录，可重复指定")
+    parser.add_argument("--output", metavar="DIR", help="输出目录")
+    parser.add_argument("--failed", metavar="DIR", help="处理失败的输入移入此目录")
+    parser.add_argument("--archive", metavar="DIR", help="处理成功的输入移入此目录（默认保留原处）")
+    parser.add_argument("--profile", metavar="FILE", help="界面中“保存配置”导出的选项配置（JSON）")
+    parser.add_argument("--workers", type=int, default=None, help="同时运行的任务数")
+    parser.add_argument("--engine", choices=list(ENGINE_NAMES), default=ENGINE_SUBPROCESS, help="执行引擎")
+    parser.add_argument("--cache", action="store_true", help="启用结果缓存")
+    parser.add_argument("--preflight", action="store_true", help="预检文字层，只对需要的页做 OCR")
+    parser.add_argument("--page-filter", choices=[mode for mode in PAGE_FILTER_MODES if mode],
+                        help="检测空白页与重复页：exclude 不对其 OCR，drop 从输出中删除")
+    parser.add_argument("--no-journal", action="store_true",
+                        help="不写入任务日志；默认跳过任务日志确认已有有效输出的文件")
+    parser.add_argument("--no-index", action="store_true", help="不把完成任务的 sidecar 加入全文索引")
+    parser.add_argument("--scratch", metavar="DIR",
+                        help="启用本地暂存：输入预取到此目录（可为 tmpfs），输出在后台上传")
+    parser.add_argument("--prefetch", type=int, default=STAGING_PREFETCH, help="提前暂存的排队任务数")
+    parser.add_argument("--bandwidth", type=float, default=0, metavar="MB/s",
+                        help="暂存预取与上传合计的带宽上限，0 表示不限制")
+    parser.add_argument("--memory-budget", type=float, default=None, metavar="GB",
+                        help=f"同时运行任务的预估峰值内存上限，默认为物理内存的 {MEMORY_BUDGET_FRACTION * 100:.0f}%%，0 表示不限制")
+    parser.add_argument("--job-timeout", type=float, default=0, metavar="SECONDS",
+                        help="每个任务的运行时间上限，超时后结束其全部进程并降级选项重新排队；0 表示不限制")
+    parser.add_argument("--page-timeout", type=int, default=None, metavar="SECONDS",
+                        help="每页 OCR 的时间上限（--tesseract-timeout），覆盖配置文件中的设置")
+    parser.add_argument("--optimize-target", type=int, default=None, metavar="KB",
+                        help="自动优化（配置中 optimize 为 auto）的目标：每多用 1 CPU 秒至少节省的 KB 数，覆盖配置文件中的设置")
+    parser.add_argument("--settle", type=float, default=HOTFOLDER_SETTLE_SECONDS,
+                        help="文件保持不变多少秒后开始处理")
+    parser.add_argument("--poll-interval", type=float, default=HOTFOLDER_POLL_SECONDS,
+                        help="轮询间隔（秒）")
+    parser.add_argument("--listen", metavar="HOST:PORT",
+                        help=f"--engine {ENGINE_REMOTE} 时协调节点的监听地址，默认 0.0.0.0:{REMOTE_PORT}")
+    parser.add_argument("--token", help=f"协调节点与工作节点的访问令牌（也可用环境变量 {REMOTE_TOKEN_ENV}），"
+                                        "协调节点未指定时随机生成并写入日志")
+    parser.add_argument("--worker", metavar="URL", help="作为工作节点运行，从该地址的协调节点领取任务")
+    parser.add_argument("--worker-jobs", type=int, default=None, help="工作节点每个任务的 --jobs，默认为 CPU 核数")
+    parser.add_argument("--worker-name", help="工作节点名称，默认为主机名-进程号")
+    parser.add_argument("--bench-startup", action="store_true",
+                        help="测量模块导入与界面启动耗时，超出预算时返回非零退出码")
+    parser.add_argument("--no-gui", action="store_true", help="与 --bench-startup 一起使用，只测量模块导入")
+    parser.add_argument("--bench", action="store_true",
+                        help="吞吐量基准：以选项矩阵处理合成语料，报告页/秒、每页 CPU 秒数和输出大小比")
+    parser.add_argument("--bench-dir", default=BENCH_DIR, metavar="DIR", help="基准语料与输出目录")
+    parser.add_argument("--bench-pages", type=int, default=2, help="合成语料每个文件的页数")
+    parser.add_argument("--bench-matrix", metavar="NAMES",
+                        help=f"只运行选项矩阵中的这些项（逗号分隔），可选：{','.join(BENCH_MATRIX)}")
+    parser.add_argument("--bench-profile", action="append", default=[], metavar="FILE",
+                        help="另外测试“保存配置”导出的选项配置，可重复指定")
+    parser.add_argument("--bench-stub", action="store_true",
+                        help="用桩脚本代替 ocrmypdf，只测量排队、日志处理和命令生成的开销")
+    parser.add_argument("--bench-repeat", type=int, default=1, help="每个语料文件重复处理的次数")
+    parser.add_argument("--bench-report", metavar="FILE", help="同时将 JSON 报告写入此文件")
+    args = parser.parse_args(argv)
+    if args.bench_matrix and not set(args.bench_matrix.split(",")) <= set(BENCH_MATRIX):
+        parser.error(f"--bench-matrix 只能包含：{','.join(BENCH_MATRIX)}")
+    if args.headless and not (args.watch and args.output and args.failed):
+        parser.error("--headless 需要同时指定 --watch、--output 和 --failed")
+    return args
+
 
 # 简单 ToolTip 实现
 
@@ -69,26 +4463,45 @@ class OCRGuiApp:
 
         # 初始化日志队列，用于跨线程日志更新
         self.log_queue = queue.Queue()
+        self._open_log_file()
+
+        # 各标签页的选项保存在 tk 变量中，标签页控件可以延迟创建
+        self._init_option_vars()
+        self.jobs = {}
+        self.job_events = queue.Queue()
+        self.command_process = None
+        try:
+            self.journal = JobJournal()
+        except (sqlite3.Error, OSError) as e:
+            self.journal = None
+            self._log_message(f"无法打开任务日志，本次运行不记录任务：{e}", "warning")
+        try:
+            self.search_index = SearchIndex()
+        except (sqlite3.Error, OSError) as e:
+            self.search_index = None
+            self._log_message(f"无法打开全文索引，本次运行不建立索引：{e}", "warning")
+        self.scheduler = JobScheduler(on_update=self.job_events.put,
+                                      on_log=self._log_message,
+                                      cache=ResultCache(),
+                                      journal=self.journal,
+                                      search_index=self.search_index)
 
-        # 创建 Notebook 与各个标签页
+        # 创建 Notebook 与各个标签页；除第一页外，其余标签页在首次显示时才创建控件
         self.notebook = ttk.Notebook(root)
         self.notebook.pack(fill='both', expand=True, padx=10, pady=10)
+        self._tab_builders = {}
 
         self.tab_basic = ttk.Frame(self.notebook)
         self.notebook.add(self.tab_basic, text="📁基本设置")
         self.create_basic_tab()
 
-        self.tab_image = ttk.Frame(self.notebook)
-        self.notebook.add(self.tab_image, text="🖼️图像预处理")
-        self.create_image_tab()
-
-        self.tab_advanced = ttk.Frame(self.notebook)
-        self.notebook.add(self.tab_advanced, text="⚙️高级选项")
-        self.create_advanced_tab()
-
-        self.tab_meta = ttk.Frame(self.notebook)
-        self.notebook.add(self.tab_meta, text="📝文档元数据")
-        self.create_meta_tab()
+        self.tab_image = self._add_lazy_tab("🖼️图像预处理", self.create_image_tab)
+        self.tab_advanced = self._add_lazy_tab("⚙️高级选项", self.create_advanced_tab)
+        self.tab_thumbs = self._add_lazy_tab("📑页面缩略图", self.create_thumbnail_tab)
+        self.tab_meta = self._add_lazy_tab("📝文档元数据", self.create_meta_tab)
+        self.tab_queue = self._add_lazy_tab("📋批量队列", self.create_queue_tab)
+        self.tab_search = self._add_lazy_tab("🔍全文搜索", self.create_search_tab)
+        self.notebook.bind("<<NotebookTabChanged>>", lambda e: self._on_tab_changed())
 
         # 底部区域：生成命令与日志
         self.bottom_frame = ttk.Frame(root)
@@ -96,11 +4509,52 @@ class OCRGuiApp:
                                padx=10, pady=(0, 10))
         self.create_bottom_area()
 
-        self.bind_update_events()
-        self.update_command()
+        self._init_option_model()
+        self._render_command()
 
         # 定时任务，每100毫秒检测日志队列
         self.root.after(100, self._process_log_queue)
+        self.root.after(500, self._process_job_events)
+        if self.journal:
+            self.root.after(300, self._offer_resume)
+
+    def _init_option_vars(self):
+        self.var_rotate = tk.BooleanVar()
+        self.var_remove_bg = tk.BooleanVar()
+        self.var_deskew = tk.BooleanVar()
+        self.var_clean = tk.BooleanVar()
+        self.var_clean_final = tk.BooleanVar()
+        self.var_pdfopt = tk.StringVar(value="安全无损优化")
+        self.var_optimize_target = tk.IntVar(value=OPTIMIZE_AUTO_TARGET // 1024)
+        self.var_force_ocr = tk.BooleanVar()
+        self.var_skip_text = tk.BooleanVar()
+        self.var_redo = tk.BooleanVar()
+        self.var_sidecar = tk.BooleanVar()
+        self.var_sidecar_name = tk.StringVar()
+        self.var_tesseract_timeout = tk.IntVar(value=0)
+        self.var_pages = tk.StringVar()
+        self.var_title = tk.StringVar()
+        self.var_author = tk.StringVar()
+        self.var_subject = tk.StringVar()
+        self.var_keywords = tk.StringVar()
+        self.var_input = tk.StringVar()
+        self.var_output = tk.StringVar()
+        self.var_output_type = tk.StringVar(value="pdfa")
+
+    def _add_lazy_tab(self, text, builder):
+        frame = ttk.Frame(self.notebook)
+        self.notebook.add(frame, text=text)
+        self._tab_builders[str(frame)] = builder
+        return frame
+
+    # 首次显示时创建标签页控件；其他代码需要访问尚未创建的控件时也可以调用
+    def _ensure_tab(self, frame):
+        builder = self._tab_builders.pop(str(frame), None)
+        if builder:
+            builder()
+
+    def _tab_built(self, frame):
+        return str(frame) not in self._tab_builders
 
     # ----- 基本设置标签页 -----
     def create_basic_tab(self):
@@ -108,7 +4562,7 @@ class OCRGuiApp:
         # 输入文件
         lbl_in = ttk.Label(frame, text="📥输入文件：")
         lbl_in.grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
-        self.entry_input = ttk.Entry(frame, width=60)
+        self.entry_input = ttk.Entry(frame, width=60, textvariable=self.var_input)
         self.entry_input.grid(row=0, column=1, sticky=tk.W, padx=5, pady=5)
         btn_in = ttk.Button(
             frame, text="🔍浏览", style="info.TButton", command=self.select_input_file)
@@ -121,7 +4575,7 @@ class OCRGuiApp:
         # 输出文件
         lbl_out = ttk.Label(frame, text="📤输出文件：")
         lbl_out.grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
-        self.entry_output = ttk.Entry(frame, width=60)
+        self.entry_output = ttk.Entry(frame, width=60, textvariable=self.var_output)
         self.entry_output.grid(row=1, column=1, sticky=tk.W, padx=5, pady=5)
         btn_out = ttk.Button(
             frame, text="🔍浏览", style="info.TButton", command=self.select_output_file)
@@ -152,58 +4606,53 @@ class OCRGuiApp:
             var = tk.BooleanVar(value=True if lang == "简体中文" else False)
             self.lang_vars[lang] = var
             chk = ttk.Checkbutton(self.lang_frame, text=lang,
-                                  variable=var, command=self.update_command)
+                                  variable=var)
             chk.grid(row=0, column=col, sticky=tk.W, padx=2, pady=2)
             ToolTip(chk, f"选择是否使用 {lang} 的OCR识别")
             col += 1
+        self.var_auto_lang = tk.BooleanVar()
+        chk_auto_lang = ttk.Checkbutton(frame, text="🤖自动选择", variable=self.var_auto_lang)
+        chk_auto_lang.grid(row=2, column=2, sticky=tk.NW, padx=5, pady=5)
+        ToolTip(chk_auto_lang, "处理前抽样几页，用 tesseract 判断文字类型和语言，只把勾选语言中实际出现的传给 -l；"
+                               "判断依据记录在日志中。需要安装 tesseract 的 osd 语言包")
 
         # 输出类型
         lbl_outtype = ttk.Label(frame, text="📄输出类型：")
         lbl_outtype.grid(row=3, column=0, sticky=tk.W, padx=5, pady=5)
-        self.combo_outtype = ttk.Combobox(frame,
-                                          values=["pdf", "pdfa", "pdfa-1",
-                                                  "pdfa-2", "pdfa-3", "none"],
-                                          state="readonly")
-        self.combo_outtype.set("pdfa")
+        self.combo_outtype = ttk.Combobox(frame, values=list(OUTPUT_TYPES), state="readonly",
+                                          textvariable=self.var_output_type)
         self.combo_outtype.grid(row=3, column=1, sticky=tk.W, padx=5, pady=5)
         ToolTip(self.combo_outtype, "选择输出PDF类型")
-        self.combo_outtype.bind("<<ComboboxSelected>>",
-                                lambda e: self.update_command())
 
     # ----- 图像预处理标签页 -----
     def create_image_tab(self):
         frame = self.tab_image
-        self.var_rotate = tk.BooleanVar()
         chk_rotate = ttk.Checkbutton(
-            frame, text="↻自动旋转页面", variable=self.var_rotate, command=self.update_command)
+            frame, text="↻自动旋转页面", variable=self.var_rotate)
         chk_rotate.grid(row=0, column=0, columnspan=2,
                         sticky=tk.W, padx=5, pady=5)
         ToolTip(chk_rotate, "启用后根据文本方向自动旋转页面")
 
-        self.var_remove_bg = tk.BooleanVar()
         chk_remove_bg = ttk.Checkbutton(
-            frame, text="🚫移除背景", variable=self.var_remove_bg, command=self.update_command)
+            frame, text="🚫移除背景", variable=self.var_remove_bg)
         chk_remove_bg.grid(row=1, column=0, columnspan=2,
                            sticky=tk.W, padx=5, pady=5)
         ToolTip(chk_remove_bg, "尝试将页面背景设置为白色")
 
-        self.var_deskew = tk.BooleanVar()
         chk_deskew = ttk.Checkbutton(
-            frame, text="📐纠正页面倾斜", variable=self.var_deskew, command=self.update_command)
+            frame, text="📐纠正页面倾斜", variable=self.var_deskew)
         chk_deskew.grid(row=2, column=0, columnspan=2,
                         sticky=tk.W, padx=5, pady=5)
         ToolTip(chk_deskew, "对页面进行去斜处理")
 
-        self.var_clean = tk.BooleanVar()
         chk_clean = ttk.Checkbutton(
-            frame, text="🧹清理扫描伪影", variable=self.var_clean, command=self.update_command)
+            frame, text="🧹清理扫描伪影", variable=self.var_clean)
         chk_clean.grid(row=3, column=0, columnspan=2,
                        sticky=tk.W, padx=5, pady=5)
         ToolTip(chk_clean, "清除页面中的扫描杂点，但不用于最终输出")
 
-        self.var_clean_final = tk.BooleanVar()
         chk_clean_final = ttk.Checkbutton(
-            frame, text="✅清理并使用处理后图像", variable=self.var_clean_final, command=self.update_command)
+            frame, text="✅清理并使用处理后图像", variable=self.var_clean_final)
         chk_clean_final.grid(row=4, column=0, columnspan=2,
                              sticky=tk.W, padx=5, pady=5)
         ToolTip(chk_clean_final, "清理页面后，生成PDF时使用处理后的图像")
@@ -214,44 +4663,45 @@ class OCRGuiApp:
         row = 0
         lbl_pdfopt = ttk.Label(frame, text="🔧PDF优化：")
         lbl_pdfopt.grid(row=row, column=0, sticky=tk.W, padx=5, pady=5)
-        self.combo_pdfopt = ttk.Combobox(frame,
-                                         values=["不优化", "安全无损优化",
-                                                 "有损 JPEG 优化", "更激进的有损优化"],
-                                         state="readonly")
-        self.combo_pdfopt.set("安全无损优化")
+        self.combo_pdfopt = ttk.Combobox(frame, values=list(PDF_OPT_MAP),
+                                         state="readonly", textvariable=self.var_pdfopt)
         self.combo_pdfopt.grid(row=row, column=1, sticky=tk.W, padx=5, pady=5)
-        ToolTip(self.combo_pdfopt, "选择PDF优化方式，对应-O选项（0～3）")
-        self.combo_pdfopt.bind("<<ComboboxSelected>>",
-                               lambda e: self.update_command())
+        ToolTip(self.combo_pdfopt, "选择PDF优化方式，对应-O选项（0～3）；“自动”在处理前抽样几页，"
+                                   "关闭 OCR 按各级别试算，选出达到右侧目标的级别")
+        target_frame = ttk.Frame(frame)
+        target_frame.grid(row=row, column=2, sticky=tk.W, padx=5, pady=5)
+        lbl_target = ttk.Label(target_frame, text="🎯自动目标(KB/CPU秒)：")
+        lbl_target.pack(side=tk.LEFT)
+        spin_target = ttk.Spinbox(target_frame, from_=1, to=100000, increment=64, width=8,
+                                  textvariable=self.var_optimize_target)
+        spin_target.pack(side=tk.LEFT)
+        ToolTip(spin_target, "更高的优化级别每多用 1 CPU 秒至少要多节省这么多输出大小才会被选用；"
+                             "调高偏向省 CPU，调低偏向省存储")
         row += 1
 
-        self.var_force_ocr = tk.BooleanVar()
         chk_force = ttk.Checkbutton(
-            frame, text="💪强制OCR", variable=self.var_force_ocr, command=self.update_command)
+            frame, text="💪强制OCR", variable=self.var_force_ocr)
         chk_force.grid(row=row, column=0, columnspan=2,
                        sticky=tk.W, padx=5, pady=5)
         ToolTip(chk_force, "强制对所有页面进行OCR（对应-f）")
         row += 1
 
-        self.var_skip_text = tk.BooleanVar()
         chk_skip = ttk.Checkbutton(
-            frame, text="🚫跳过已有文本", variable=self.var_skip_text, command=self.update_command)
+            frame, text="🚫跳过已有文本", variable=self.var_skip_text)
         chk_skip.grid(row=row, column=0, columnspan=2,
                       sticky=tk.W, padx=5, pady=5)
         ToolTip(chk_skip, "遇到已有文本的页面则跳过OCR（对应-s）")
         row += 1
 
-        self.var_redo = tk.BooleanVar()
         chk_redo = ttk.Checkbutton(
-            frame, text="🔄重做OCR", variable=self.var_redo, command=self.update_command)
+            frame, text="🔄重做OCR", variable=self.var_redo)
         chk_redo.grid(row=row, column=0, columnspan=2,
                       sticky=tk.W, padx=5, pady=5)
         ToolTip(chk_redo, "对已有OCR结果的文件进行重做OCR（对应--redo-ocr）")
         row += 1
 
-        self.var_sidecar = tk.BooleanVar()
         chk_sidecar = ttk.Checkbutton(
-            frame, text="📑生成Sidecar文本文件", variable=self.var_sidecar, command=self.update_command)
+            frame, text="📑生成Sidecar文本文件", variable=self.var_sidecar)
         chk_sidecar.grid(row=row, column=0, columnspan=2,
                          sticky=tk.W, padx=5, pady=5)
         ToolTip(chk_sidecar, "生成包含OCR文本的Sidecar文件")
@@ -259,20 +4709,29 @@ class OCRGuiApp:
 
         lbl_sidecar = ttk.Label(frame, text="📝Sidecar文件名：")
         lbl_sidecar.grid(row=row, column=0, sticky=tk.W, padx=5, pady=5)
-        self.entry_sidecar = ttk.Entry(frame, width=30)
+        self.entry_sidecar = ttk.Entry(frame, width=30, textvariable=self.var_sidecar_name)
         self.entry_sidecar.grid(row=row, column=1, sticky=tk.W, padx=5, pady=5)
         ToolTip(self.entry_sidecar, '例如输入“名称1”，命令中显示为 "<输入文件目录>/名称1.txt"')
-        self.entry_sidecar.bind(
-            "<KeyRelease>", lambda e: self.update_command())
-        self.entry_sidecar.bind("<FocusOut>", lambda e: self.update_command())
         row += 1
 
         lbl_pages = ttk.Label(frame, text="📄处理页数：")
         lbl_pages.grid(row=row, column=0, sticky=tk.W, padx=5, pady=5)
-        self.entry_pages = ttk.Entry(frame, width=30)
+        self.entry_pages = ttk.Entry(frame, width=30, textvariable=self.var_pages)
         self.entry_pages.grid(row=row, column=1, sticky=tk.W, padx=5, pady=5)
         ToolTip(self.entry_pages, "例如：1-3,5表示仅处理指定页")
-        self.entry_pages.bind("<KeyRelease>", lambda e: self.update_command())
+        btn_preflight = ttk.Button(frame, text="🔎预检", style="info.TButton",
+                                   command=self.run_preflight)
+        btn_preflight.grid(row=row, column=2, sticky=tk.W, padx=5, pady=5)
+        ToolTip(btn_preflight, "检查输入 PDF 各页的文字层（不栅格化），自动填入需要 OCR 的页")
+        row += 1
+
+        lbl_page_timeout = ttk.Label(frame, text="⏱️每页超时(秒)：")
+        lbl_page_timeout.grid(row=row, column=0, sticky=tk.W, padx=5, pady=5)
+        spin_page_timeout = ttk.Spinbox(frame, from_=0, to=3600, increment=10, width=8,
+                                        textvariable=self.var_tesseract_timeout)
+        spin_page_timeout.grid(row=row, column=1, sticky=tk.W, padx=5, pady=5)
+        ToolTip(spin_page_timeout, "单页 OCR 的时间上限（对应--tesseract-timeout），超时的页不含文字层；"
+                                   f"批量任务在页面处理阶段超过此时间的 {PAGE_STALL_FACTOR} 倍仍无进展时结束任务。0 表示不限制")
         row += 1
 
     # ----- 文档元数据标签页 -----
@@ -281,52 +4740,923 @@ class OCRGuiApp:
         row = 0
         lbl_title = ttk.Label(frame, text="🏷️标题：")
         lbl_title.grid(row=row, column=0, sticky=tk.W, padx=5, pady=5)
-        self.entry_title = ttk.Entry(frame, width=30)
+        self.entry_title = ttk.Entry(frame, width=30, textvariable=self.var_title)
         self.entry_title.grid(row=row, column=1, sticky=tk.W, padx=5, pady=5)
         ToolTip(self.entry_title, "设置PDF文档标题")
-        self.entry_title.bind("<KeyRelease>", lambda e: self.update_command())
         row += 1
 
         lbl_author = ttk.Label(frame, text="👤作者：")
         lbl_author.grid(row=row, column=0, sticky=tk.W, padx=5, pady=5)
-        self.entry_author = ttk.Entry(frame, width=30)
+        self.entry_author = ttk.Entry(frame, width=30, textvariable=self.var_author)
         self.entry_author.grid(row=row, column=1, sticky=tk.W, padx=5, pady=5)
         ToolTip(self.entry_author, "设置PDF文档作者")
-        self.entry_author.bind("<KeyRelease>", lambda e: self.update_command())
         row += 1
 
         lbl_subject = ttk.Label(frame, text="📚主题：")
         lbl_subject.grid(row=row, column=0, sticky=tk.W, padx=5, pady=5)
-        self.entry_subject = ttk.Entry(frame, width=30)
+        self.entry_subject = ttk.Entry(frame, width=30, textvariable=self.var_subject)
         self.entry_subject.grid(row=row, column=1, sticky=tk.W, padx=5, pady=5)
         ToolTip(self.entry_subject, "设置PDF文档主题")
-        self.entry_subject.bind(
-            "<KeyRelease>", lambda e: self.update_command())
         row += 1
 
         lbl_keywords = ttk.Label(frame, text="🔑关键字：")
         lbl_keywords.grid(row=row, column=0, sticky=tk.W, padx=5, pady=5)
-        self.entry_keywords = ttk.Entry(frame, width=30)
+        self.entry_keywords = ttk.Entry(frame, width=30, textvariable=self.var_keywords)
         self.entry_keywords.grid(
             row=row, column=1, sticky=tk.W, padx=5, pady=5)
         ToolTip(self.entry_keywords, "设置PDF文档关键字，多个词请用逗号分隔")
-        self.entry_keywords.bind(
-            "<KeyRelease>", lambda e: self.update_command())
         row += 1
 
+    # ----- 批量队列标签页 -----
+    def create_queue_tab(self):
+        frame = self.tab_queue
+        toolbar = ttk.Frame(frame)
+        toolbar.pack(fill='x', padx=5, pady=5)
+        btn_add_files = ttk.Button(toolbar, text="➕添加文件",
+                                   style="info.TButton", command=self.add_queue_files)
+        btn_add_files.pack(side=tk.LEFT, padx=5)
+        ToolTip(btn_add_files, "选择多个文件加入队列，按当前各标签页的设置处理")
+        btn_add_dir = ttk.Button(toolbar, text="📂添加文件夹",
+                                 style="info.TButton", command=self.add_queue_folder)
+        btn_add_dir.pack(side=tk.LEFT, padx=5)
+        ToolTip(btn_add_dir, "递归加入文件夹中的 PDF 与图像文件")
+        btn_clear_done = ttk.Button(toolbar, text="🧹清除已结束",
+                                    style="warning.TButton", command=self.clear_finished_jobs)
+        btn_clear_done.pack(side=tk.LEFT, padx=5)
+        ToolTip(btn_clear_done, "从列表中移除已完成或失败的任务")
+        btn_cancel = ttk.Button(toolbar, text="⛔取消所选",
+                                style="danger.TButton", command=self.cancel_selected_jobs)
+        btn_cancel.pack(side=tk.LEFT, padx=5)
+        ToolTip(btn_cancel, "排队中的任务移出队列；运行中的任务连同其全部子进程一起结束，并删除临时文件")
+        btn_save_profile = ttk.Button(toolbar, text="💾保存配置",
+                                      style="primary.TButton", command=self.save_profile)
+        btn_save_profile.pack(side=tk.LEFT, padx=5)
+        ToolTip(btn_save_profile, "将当前各标签页的选项保存为配置文件，可用于 --headless 热文件夹模式")
+        btn_load_profile = ttk.Button(toolbar, text="📂载入配置",
+                                      style="primary.TButton", command=self.load_profile)
+        btn_load_profile.pack(side=tk.LEFT, padx=5)
+
+        lbl_workers = ttk.Label(toolbar, text="⚡并发任务数：")
+        lbl_workers.pack(side=tk.LEFT, padx=(15, 0))
+        self.var_max_workers = tk.IntVar(value=self.scheduler.max_workers)
+        spin_workers = ttk.Spinbox(toolbar, from_=1, to=self.scheduler.cpu_count,
+                                   width=4, textvariable=self.var_max_workers,
+                                   command=self.update_max_workers)
+        spin_workers.pack(side=tk.LEFT, padx=5)
+        spin_workers.bind("<FocusOut>", lambda e: self.update_max_workers())
+        ToolTip(spin_workers, f"同时运行的 ocrmypdf 进程数，{self.scheduler.cpu_count} 个CPU核心在运行中的任务间平均分配（--jobs）")
+        lbl_engine = ttk.Label(toolbar, text="🧩执行引擎：")
+        lbl_engine.pack(side=tk.LEFT, padx=(15, 0))
+        self.combo_engine = ttk.Combobox(toolbar, values=list(ENGINE_NAMES.values()),
+                                         state="readonly", width=12)
+        self.combo_engine.set(ENGINE_NAMES[self.scheduler.engine.name])
+        self.combo_engine.pack(side=tk.LEFT, padx=5)
+        ToolTip(self.combo_engine, "子进程：每个文件启动一次 ocrmypdf 命令；进程内：在常驻工作进程中调用 ocrmypdf.ocr()，省去每个文件的启动与导入开销；"
+                                   "分布式：本机作为协调节点，由其他机器上以 --worker 运行的工作节点领取任务，命令见日志")
+        self.combo_engine.bind("<<ComboboxSelected>>", lambda e: self.update_engine())
+        self.lbl_queue_status = ttk.Label(toolbar, text="")
+        self.lbl_queue_status.pack(side=tk.RIGHT, padx=5)
+
+        out_frame = ttk.Frame(frame)
+        out_frame.pack(fill='x', padx=5, pady=5)
+        lbl_outdir = ttk.Label(out_frame, text="📤输出目录：")
+        lbl_outdir.pack(side=tk.LEFT, padx=5)
+        self.entry_queue_outdir = ttk.Entry(out_frame, width=60)
+        self.entry_queue_outdir.pack(side=tk.LEFT, padx=5)
+        ToolTip(self.entry_queue_outdir, "留空则输出到输入文件所在目录，文件名为“输入文件名_ocr.pdf”")
+        btn_outdir = ttk.Button(out_frame, text="🔍浏览", style="info.TButton",
+                                command=self.select_queue_outdir)
+        btn_outdir.pack(side=tk.LEFT, padx=5)
+
+        self.var_use_cache = tk.BooleanVar(value=True)
+        chk_cache = ttk.Checkbutton(out_frame, text="♻️使用结果缓存", variable=self.var_use_cache)
+        chk_cache.pack(side=tk.LEFT, padx=(15, 5))
+        ToolTip(chk_cache, "输入文件内容和选项都相同时直接复用之前的结果；取消勾选后新加入的任务将重新处理")
+        btn_clear_cache = ttk.Button(out_frame, text="🗑️清空缓存", style="warning.TButton",
+                                     command=self.clear_result_cache)
+        btn_clear_cache.pack(side=tk.LEFT, padx=5)
+        self.lbl_cache_stats = ttk.Label(out_frame, text="")
+        self.lbl_cache_stats.pack(side=tk.RIGHT, padx=5)
+
+        split_frame = ttk.Frame(frame)
+        split_frame.pack(fill='x', padx=5, pady=5)
+        self.var_split = tk.BooleanVar()
+        chk_split = ttk.Checkbutton(split_frame, text="✂️大文件拆分并行", variable=self.var_split)
+        chk_split.pack(side=tk.LEFT, padx=5)
+        ToolTip(chk_split, "页数超过每块页数的 PDF 拆分为多个分块并行 OCR，完成后按顺序合并；"
+                           "已完成的分块会保存在“输出文件.parts”目录中，失败后重新加入即可断点续跑")
+        lbl_split_pages = ttk.Label(split_frame, text="每块页数：")
+        lbl_split_pages.pack(side=tk.LEFT, padx=(10, 0))
+        self.var_split_pages = tk.IntVar(value=SPLIT_CHUNK_PAGES)
+        spin_split = ttk.Spinbox(split_frame, from_=10, to=5000, increment=10,
+                                 width=6, textvariable=self.var_split_pages)
+        spin_split.pack(side=tk.LEFT, padx=5)
+        self.var_preflight = tk.BooleanVar()
+        chk_preflight = ttk.Checkbutton(split_frame, text="🔎预检仅OCR需要的页", variable=self.var_preflight)
+        chk_preflight.pack(side=tk.LEFT, padx=(15, 5))
+        ToolTip(chk_preflight, "处理前检查每页是否已有文字层，只对纯图像页生成 --pages；"
+                               "已在高级选项中指定处理页数的任务不做预检")
+        lbl_memory = ttk.Label(split_frame, text="🧠内存预算(GB)：")
+        lbl_memory.pack(side=tk.LEFT, padx=(15, 0))
+        self.var_memory_budget = tk.DoubleVar(value=round(self.scheduler.memory_budget / 1024 ** 3, 1))
+        spin_memory = ttk.Spinbox(split_frame, from_=0, to=4096, increment=0.5, width=6,
+                                  textvariable=self.var_memory_budget, command=self.update_memory_budget)
+        spin_memory.pack(side=tk.LEFT, padx=5)
+        spin_memory.bind("<FocusOut>", lambda e: self.update_memory_budget())
+        ToolTip(spin_memory, "按页数、页面尺寸、图像分辨率和预处理选项估算每个任务的峰值内存，"
+                             "预估之和不超过预算时才启动新任务；估算会根据实测峰值内存自动修正。0 表示不限制")
+
+        page_frame = ttk.Frame(frame)
+        page_frame.pack(fill='x', padx=5, pady=5)
+        lbl_page_filter = ttk.Label(page_frame, text="📄空白页/重复页：")
+        lbl_page_filter.pack(side=tk.LEFT, padx=5)
+        self.combo_page_filter = ttk.Combobox(page_frame, values=list(PAGE_FILTER_MODES.values()),
+                                              state="readonly", width=12)
+        self.combo_page_filter.set(PAGE_FILTER_MODES[""])
+        self.combo_page_filter.pack(side=tk.LEFT, padx=5)
+        ToolTip(self.combo_page_filter, "OCR 前以低分辨率栅格化各页（需要 Ghostscript），按墨迹覆盖率识别空白页（分隔页、双面扫描的空白背面），"
+                                        "按感知哈希识别重复进纸的页；不做OCR：这些页原样保留；从输出中删除：结果中不含这些页")
+        self.var_staging = tk.BooleanVar()
+        chk_staging = ttk.Checkbutton(page_frame, text="💾本地暂存", variable=self.var_staging,
+                                      command=self.update_staging)
+        chk_staging.pack(side=tk.LEFT, padx=(15, 5))
+        ToolTip(chk_staging, f"输入输出在网络共享上时使用：排队中的输入预先复制到 {STAGING_DIR}，"
+                             "任务在本地运行，输出在后台上传并原子替换目标文件")
+        lbl_prefetch = ttk.Label(page_frame, text="预取：")
+        lbl_prefetch.pack(side=tk.LEFT, padx=(10, 0))
+        self.var_prefetch = tk.IntVar(value=STAGING_PREFETCH)
+        spin_prefetch = ttk.Spinbox(page_frame, from_=0, to=50, width=4, textvariable=self.var_prefetch,
+                                    command=self.update_staging)
+        spin_prefetch.pack(side=tk.LEFT, padx=5)
+        spin_prefetch.bind("<FocusOut>", lambda e: self.update_staging())
+        ToolTip(spin_prefetch, "提前复制到本地的排队任务数")
+        lbl_bandwidth = ttk.Label(page_frame, text="限速(MB/s)：")
+        lbl_bandwidth.pack(side=tk.LEFT, padx=(10, 0))
+        self.var_bandwidth = tk.DoubleVar(value=0)
+        spin_bandwidth = ttk.Spinbox(page_frame, from_=0, to=10000, increment=5, width=6,
+                                     textvariable=self.var_bandwidth, command=self.update_staging)
+        spin_bandwidth.pack(side=tk.LEFT, padx=5)
+        spin_bandwidth.bind("<FocusOut>", lambda e: self.update_staging())
+        ToolTip(spin_bandwidth, "预取与上传合计的带宽上限，0 表示不限制")
+        lbl_job_timeout = ttk.Label(page_frame, text="⏱️任务超时(分钟)：")
+        lbl_job_timeout.pack(side=tk.LEFT, padx=(15, 0))
+        self.var_job_timeout = tk.DoubleVar(value=round(self.scheduler.job_timeout / 60, 1))
+        spin_job_timeout = ttk.Spinbox(page_frame, from_=0, to=1440, increment=5, width=6,
+                                       textvariable=self.var_job_timeout, command=self.update_job_timeout)
+        spin_job_timeout.pack(side=tk.LEFT, padx=5)
+        spin_job_timeout.bind("<FocusOut>", lambda e: self.update_job_timeout())
+        ToolTip(spin_job_timeout, "单个任务（或分块）的运行时间上限，超时后结束其全部进程，"
+                                  "依次去掉 -i/-c、降低 -O、去掉 -d 后重新排队。0 表示不限制")
+
+        progress_frame = ttk.Frame(frame)
+        progress_frame.pack(fill='x', padx=5, pady=5)
+        lbl_progress = ttk.Label(progress_frame, text="📈总进度：")
+        lbl_progress.pack(side=tk.LEFT, padx=5)
+        self.progress_total = ttk.Progressbar(progress_frame, mode="determinate", maximum=100)
+        self.progress_total.pack(side=tk.LEFT, fill='x', expand=True, padx=5)
+        btn_export = ttk.Button(progress_frame, text="📊导出阶段耗时",
+                                style="primary.TButton", command=self.export_stage_timings)
+        btn_export.pack(side=tk.RIGHT, padx=5)
+        ToolTip(btn_export, "将各任务的页数、吞吐量和各阶段耗时导出为 JSON，便于容量规划")
+
+        columns = ("file", "status", "jobs", "progress", "speed", "eta", "elapsed", "cpu", "rss")
+        self.tree_jobs = ttk.Treeview(frame, columns=columns, show="headings", height=12)
+        self.tree_jobs.heading("file", text="文件")
+        self.tree_jobs.heading("status", text="状态")
+        self.tree_jobs.heading("jobs", text="线程数")
+        self.tree_jobs.heading("progress", text="进度")
+        self.tree_jobs.heading("speed", text="页/秒")
+        self.tree_jobs.heading("eta", text="剩余")
+        self.tree_jobs.heading("elapsed", text="耗时")
+        self.tree_jobs.heading("cpu", text="CPU")
+        self.tree_jobs.heading("rss", text="峰值内存")
+        self.tree_jobs.column("file", width=300)
+        self.tree_jobs.column("status", width=90, anchor=tk.CENTER)
+        self.tree_jobs.column("jobs", width=60, anchor=tk.CENTER)
+        self.tree_jobs.column("progress", width=110, anchor=tk.CENTER)
+        self.tree_jobs.column("speed", width=60, anchor=tk.E)
+        self.tree_jobs.column("eta", width=60, anchor=tk.E)
+        self.tree_jobs.column("elapsed", width=70, anchor=tk.E)
+        self.tree_jobs.column("cpu", width=70, anchor=tk.E)
+        self.tree_jobs.column("rss", width=80, anchor=tk.E)
+        self.tree_jobs.pack(fill='both', expand=True, padx=5, pady=5)
+        self.tree_jobs.bind("<<TreeviewSelect>>", lambda e: self._show_stage_breakdown())
+        self.lbl_stage_times = ttk.Label(frame, text="")
+        self.lbl_stage_times.pack(fill='x', padx=10, pady=(0, 5))
+        ToolTip(self.tree_jobs, "可将多个文件或文件夹直接拖入此列表")
+        if DND_FILES:
+            self.tree_jobs.drop_target_register(DND_FILES)
+            self.tree_jobs.dnd_bind("<<Drop>>", self.drop_queue_files)
+
+    def add_queue_files(self):
+        file_paths = filedialog.askopenfilenames(
+            title="选择输入文件", filetypes=[("PDF 或图像", "*.pdf;*.png;*.jpg;*.jpeg;*.tif;*.tiff")])
+        if file_paths:
+            self.enqueue_paths(file_paths)
+
+    def add_queue_folder(self):
+        dir_path = filedialog.askdirectory(title="选择输入文件夹")
+        if dir_path:
+            self.enqueue_paths([dir_path])
+
+    def drop_queue_files(self, event):
+        self.enqueue_paths(self.root.tk.splitlist(event.data))
+
+    def select_queue_outdir(self):
+        dir_path = filedialog.askdirectory(title="选择输出目录")
+        if dir_path:
+            self.entry_queue_outdir.delete(0, tk.END)
+            self.entry_queue_outdir.insert(0, dir_path)
+
+    # 按当前设置为每个文件创建任务并提交给调度器
+    def enqueue_paths(self, paths):
+        files = collect_input_files(paths)
+        if not files:
+            self._log_message("未找到可处理的文件", "warning")
+            return
+        # 批量模式下 sidecar 按各自输入文件名生成，避免互相覆盖
+        options = dict(self.collect_options(), sidecar_name="")
+        output_dir = self.entry_queue_outdir.get().strip()
+        for path in files:
+            job = OCRJob(path, default_output_path(path, output_dir), options)
+            job.use_cache = self.var_use_cache.get()
+            if self.var_split.get():
+                try:
+                    job.split_pages = max(1, int(self.var_split_pages.get()))
+                except (tk.TclError, ValueError):
+                    job.split_pages = SPLIT_CHUNK_PAGES
+            job.preflight = self.var_preflight.get()
+            job.page_filter = {text: mode for mode, text in PAGE_FILTER_MODES.items()}[self.combo_page_filter.get()]
+            self._add_job(job)
+        self._log_message(f"已加入 {len(files)} 个任务", "info")
+
+    def _add_job(self, job):
+        self.jobs[job.id] = job
+        self.tree_jobs.insert("", tk.END, iid=str(job.id),
+                              values=(job.input_path, JOB_STATUS_TEXT[job.status], "", "", "", "", "", "", ""))
+        self.scheduler.submit(job)
+
+    # 启动时检查任务日志：上次未完成或失败的任务可按原选项重新加入队列；
+    # 选择“否”则不再提示这些任务，选择“取消”则下次启动时再询问
+    def _offer_resume(self):
+        try:
+            rows = self.journal.unfinished()
+        except sqlite3.Error as e:
+            self._log_message(f"读取任务日志失败：{e}", "warning")
+            return
+        if not rows:
+            return
+        failed = sum(1 for row in rows if row["status"] == JOB_FAILED)
+        answer = messagebox.askyesnocancel(
+            "恢复任务", f"任务日志中有 {len(rows)} 个上次未完成的任务（其中 {failed} 个失败）。\n"
+                        "是否重新加入队列？已有有效输出的任务会自动跳过。")
+        if answer is None:
+            return
+        if not answer:
+            self.journal.abandon([row["id"] for row in rows])
+            return
+        missing = [row["id"] for row in rows if not os.path.exists(row["input_path"])]
+        if missing:
+            self.journal.abandon(missing)
+            self._log_message(f"{len(missing)} 个任务的输入文件已不存在，不再恢复", "warning")
+        self._ensure_tab(self.tab_queue)
+        self.notebook.select(self.tab_queue)
+        for row in rows:
+            if row["id"] not in missing:
+                self._add_job(JobJournal.job_from_row(row))
+        self._log_message(f"已从任务日志恢复 {len(rows) - len(missing)} 个任务", "info")
+
+    def update_max_workers(self):
+        try:
+            self.scheduler.set_max_workers(self.var_max_workers.get())
+        except (tk.TclError, ValueError):
+            self.var_max_workers.set(self.scheduler.max_workers)
+
+    def update_staging(self):
+        try:
+            depth = max(0, int(self.var_prefetch.get()))
+            bandwidth = max(0.0, float(self.var_bandwidth.get())) * 1024 ** 2
+        except (tk.TclError, ValueError):
+            return
+        staging = self.scheduler.staging
+        if not self.var_staging.get():
+            self.scheduler.set_staging(None)
+        elif staging is None:
+            try:
+                self.scheduler.set_staging(StagingArea(prefetch_depth=depth, bandwidth=bandwidth))
+            except OSError as e:
+                self.var_staging.set(False)
+                self._log_message(f"无法创建暂存目录：{e}", "error")
+        else:
+            staging.prefetch_depth = depth
+            staging.throttle.rate = bandwidth
+            self.scheduler.set_staging(staging)
+
+    def update_job_timeout(self):
+        try:
+            self.scheduler.job_timeout = max(0.0, float(self.var_job_timeout.get())) * 60
+        except (tk.TclError, ValueError):
+            self.var_job_timeout.set(round(self.scheduler.job_timeout / 60, 1))
+
+    def cancel_selected_jobs(self):
+        for iid in self.tree_jobs.selection():
+            job = self.jobs.get(int(iid))
+            if job:
+                self.scheduler.cancel(job)
+
+    def update_memory_budget(self):
+        try:
+            self.scheduler.set_memory_budget(float(self.var_memory_budget.get()) * 1024 ** 3)
+        except (tk.TclError, ValueError):
+            self.var_memory_budget.set(round(self.scheduler.memory_budget / 1024 ** 3, 1))
+
+    def save_profile(self):
+        file_path = filedialog.asksaveasfilename(
+            title="保存配置", defaultextension=".json", filetypes=[("JSON 文件", "*.json")])
+        if file_path:
+            try:
+                save_profile(file_path, dict(self.collect_options(), sidecar_name=""))
+                self._log_message(f"配置已保存：{file_path}", "success")
+            except OSError as e:
+                messagebox.showerror("错误", f"保存配置失败：{e}")
+
+    def load_profile(self):
+        file_path = filedialog.askopenfilename(
+            title="载入配置", filetypes=[("JSON 文件", "*.json")])
+        if file_path:
+            try:
+                self.apply_options(load_profile(file_path))
+                self._log_message(f"配置已载入：{file_path}", "success")
+            except (OSError, ValueError) as e:
+                messagebox.showerror("错误", f"载入配置失败：{e}")
+
+    # 将选项字典写回界面控件，与 collect_options 相对应
+    def apply_options(self, options):
+        for lang, var in self.lang_vars.items():
+            var.set(self.languages[lang] in options["languages"])
+        self.var_auto_lang.set(options["auto_language"])
+        self.var_rotate.set(options["rotate"])
+        self.var_remove_bg.set(options["remove_background"])
+        self.var_deskew.set(options["deskew"])
+        self.var_clean.set(options["clean"])
+        self.var_clean_final.set(options["clean_final"])
+        self.var_output_type.set(options["output_type"])
+        opt_names = {level: name for name, level in PDF_OPT_MAP.items()}
+        self.var_pdfopt.set(opt_names.get(str(options["optimize"]), ""))
+        self.var_optimize_target.set(options["optimize_target_kb"])
+        self.var_force_ocr.set(options["force_ocr"])
+        self.var_skip_text.set(options["skip_text"])
+        self.var_redo.set(options["redo_ocr"])
+        self.var_tesseract_timeout.set(options["tesseract_timeout"])
+        self.var_sidecar.set(options["sidecar"])
+        self.var_sidecar_name.set(options["sidecar_name"])
+        self.var_pages.set(options["pages"])
+        self.var_title.set(options["title"])
+        self.var_author.set(options["author"])
+        self.var_subject.set(options["subject"])
+        self.var_keywords.set(options["keywords"])
+        # 额外参数没有对应的控件，直接写入选项模型
+        self.options_model["extra_args"] = list(options.get("extra_args") or [])
+        self.update_command()
+
+    # 对“基本设置”中的输入文件做预检，结果填入处理页数
+    def run_preflight(self):
+        input_path = self.entry_input.get().strip()
+        if not input_path.lower().endswith(".pdf") or not os.path.isfile(input_path):
+            messagebox.showwarning("提示", "请先选择输入 PDF 文件")
+            return
+        include_mixed = self.var_force_ocr.get() or self.var_redo.get()
+
+        def preflight_thread():
+            try:
+                classes = scan_text_layer(input_path)
+            except Exception as e:
+                self._log_message(f"预检失败：{e}", "error")
+                return
+            pages = pages_needing_ocr(classes, include_mixed)
+            self._log_message(preflight_report(classes, pages), "success")
+            page_ranges = format_page_ranges(pages) if len(pages) < len(classes) else ""
+            self.root.after(0, lambda: self.var_pages.set(page_ranges))
+        threading.Thread(target=preflight_thread, daemon=True).start()
+
+    def update_engine(self):
+        names = {text: name for name, text in ENGINE_NAMES.items()}
+        self.scheduler.set_engine(names[self.combo_engine.get()])
+        self.combo_engine.set(ENGINE_NAMES[self.scheduler.engine.name])
+
+    def clear_result_cache(self):
+        if messagebox.askyesno("确认", "确定要清空结果缓存吗？"):
+            self.scheduler.cache.clear()
+            self._log_message("结果缓存已清空", "info")
+
+    def clear_finished_jobs(self):
+        for job_id, job in list(self.jobs.items()):
+            if job.parent is None and job.status in JOB_FINISHED:
+                self.tree_jobs.delete(str(job_id))
+                del self.jobs[job_id]
+                for child in job.children:
+                    self.jobs.pop(child.id, None)
+
+    # 拆分任务的分块显示为父任务下的子行
+    def _add_chunk_row(self, job):
+        parent_iid = str(job.parent.id)
+        if not self.tree_jobs.exists(parent_iid):
+            return
+        self.jobs[job.id] = job
+        label = f"第 {job.chunk['first']}-{job.chunk['last']} 页"
+        self.tree_jobs.insert(parent_iid, tk.END, iid=str(job.id),
+                              values=(label, JOB_STATUS_TEXT[job.status], "", "", "", "", "", "", ""))
+
+    def _refresh_job_row(self, job):
+        iid = str(job.id)
+        if job.parent is not None and job.id not in self.jobs:
+            self._add_chunk_row(job)
+        if self.tree_jobs.exists(iid):
+            elapsed = f"{job.elapsed():.1f}s" if job.started_at else ""
+            progress = job.progress.snapshot()
+            pages = ""
+            if progress["pages_total"]:
+                pages = f"{progress['pages_done']}/{progress['pages_total']} 页"
+            if progress["stage"]:
+                pages = f"{pages} {STAGE_NAMES[progress['stage']]}".strip()
+            speed = f"{progress['pages_per_sec']:.2f}" if progress["pages_per_sec"] else ""
+            eta = format_duration(progress["eta"]) if job.status == JOB_RUNNING else ""
+            status = JOB_STATUS_TEXT[job.status] + ("(缓存)" if job.cached else "(已有结果)" if job.reused else "")
+            if job.retries:
+                status += f"(重试{job.retries})"
+            name = job.input_path
+            jobs = job.jobs or ""
+            if job.parent is not None:
+                name = f"第 {job.chunk['first']}-{job.chunk['last']} 页"
+            elif job.children:
+                jobs = f"{len(job.manifest['chunks'])} 块"
+            resources = job.resources or {}
+            cpu = ""
+            if resources:
+                cpu = f"{resources.get('cpu_user', 0) + resources.get('cpu_system', 0):.1f}s"
+            rss = format_bytes(resources.get("peak_rss"))
+            if not rss and job.status == JOB_RUNNING and job.memory_estimate:
+                rss = "≈" + format_bytes(job.memory_estimate)
+            self.tree_jobs.item(iid, values=(name, status, jobs, pages, speed, eta, elapsed, cpu, rss))
+
+    # 显示选中任务的各阶段耗时
+    def _show_stage_breakdown(self):
+        selection = self.tree_jobs.selection()
+        job = self.jobs.get(int(selection[0])) if selection else None
+        if not job:
+            self.lbl_stage_times.configure(text="")
+            return
+        seconds = job.progress.snapshot()["stage_seconds"]
+        parts = [f"{STAGE_NAMES[stage]} {seconds[stage]:.1f}s"
+                 for stage in STAGES if seconds[stage]]
+        text = "⏱️阶段耗时：" + ("  ".join(parts) or "暂无数据")
+        resources = job.resources
+        if resources:
+            text += (f"    💻用户态 {resources.get('cpu_user', 0):.1f}s · 内核态 {resources.get('cpu_system', 0):.1f}s"
+                     f" · 读 {format_bytes(resources.get('read_bytes')) or '0'}"
+                     f" · 写 {format_bytes(resources.get('write_bytes')) or '0'}")
+        if job.memory_estimate:
+            text += f" · 预估峰值内存 {format_bytes(job.memory_estimate)}"
+        if job.skipped_pages:
+            action = "删除" if job.page_filter == "drop" else "跳过"
+            text += f"    📄{action}空白/重复页 {len(job.skipped_pages)} 页"
+        if job.optimize_decision:
+            text += f"    🔧自动优化选用 -O {job.optimize_decision['level']}"
+        self.lbl_stage_times.configure(text=text)
+
+    # 按页累计的阶段为各页耗时之和（页·秒），文档级阶段为实际经过时间
+    def export_stage_timings(self):
+        records = []
+        for job in self.jobs.values():
+            if job.started_at is None:
+                continue
+            progress = job.progress.snapshot()
+            records.append({
+                "input": job.input_path,
+                "output": job.output_path,
+                "status": job.status,
+                "jobs": job.jobs,
+                "elapsed_seconds": round(job.elapsed(), 3),
+                "pages": progress["pages_total"],
+                "pages_per_sec": progress["pages_per_sec"],
+                "stage_seconds": progress["stage_seconds"],
+                "resources": job.resources,
+                "skipped_pages": job.skipped_pages,
+                "optimize": job.optimize_decision,
+            })
+        if not records:
+            messagebox.showinfo("提示", "还没有已开始的任务")
+            return
+        file_path = filedialog.asksaveasfilename(
+            title="导出阶段耗时", defaultextension=".json", filetypes=[("JSON 文件", "*.json")])
+        if file_path:
+            try:
+                with open(file_path, "w", encoding="utf-8") as f:
+                    json.dump({"exported_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                               "cpu_count": self.scheduler.cpu_count,
+                               "jobs": records}, f, ensure_ascii=False, indent=2)
+                self._log_message(f"阶段耗时已导出：{file_path}", "success")
+            except OSError as e:
+                messagebox.showerror("错误", f"导出失败：{e}")
+
+    def _update_total_progress(self):
+        done = total = 0
+        for job in self.jobs.values():
+            if job.parent is not None:
+                continue
+            progress = job.progress.snapshot()
+            pages = progress["pages_total"] or 1
+            total += pages
+            if job.status in JOB_FINISHED:
+                done += pages
+            elif job.status == JOB_RUNNING:
+                done += min(progress["pages_done"], pages)
+        self.progress_total.configure(value=100.0 * done / total if total else 0)
+
+    # 定时处理调度器发出的任务状态变化，并刷新运行中任务的耗时
+    def _process_job_events(self):
+        if not self._tab_built(self.tab_queue):
+            self.root.after(500, self._process_job_events)
+            return
+        while not self.job_events.empty():
+            self._refresh_job_row(self.job_events.get())
+        for job in self.jobs.values():
+            if job.status == JOB_RUNNING:
+                self._refresh_job_row(job)
+        self._update_total_progress()
+        self._show_stage_breakdown()
+        pending, running = self.scheduler.counts()
+        self.lbl_queue_status.configure(text=f"排队 {pending} · 运行 {running}")
+        cache = self.scheduler.cache
+        self.lbl_cache_stats.configure(text=f"缓存 命中 {cache.hits} · 未命中 {cache.misses}")
+        self.root.after(500, self._process_job_events)
+
+    # ----- 页面缩略图标签页 -----
+    def create_thumbnail_tab(self):
+        frame = self.tab_thumbs
+        top_frame = ttk.Frame(frame)
+        top_frame.pack(fill='x', padx=5, pady=5)
+        self.lbl_thumbs_status = ttk.Label(top_frame, text="")
+        self.lbl_thumbs_status.pack(side=tk.LEFT, fill='x', expand=True, padx=5)
+        btn_clear = ttk.Button(top_frame, text="清除选择", style="warning.TButton",
+                               command=self.clear_thumbnail_selection)
+        btn_clear.pack(side=tk.RIGHT, padx=5)
+        ToolTip(btn_clear, "清空处理页数，即处理全部页")
+        btn_reload = ttk.Button(top_frame, text="🔄重新载入", style="info.TButton",
+                                command=lambda: self.load_thumbnails(force=True))
+        btn_reload.pack(side=tk.RIGHT, padx=5)
+        ToolTip(btn_reload, "重新读取输入文件并重试渲染失败的页")
+
+        list_frame = ttk.Frame(frame)
+        list_frame.pack(fill='both', expand=True, padx=5, pady=5)
+        cell_width, cell_height = self._thumbnail_cell()
+        self.canvas_thumbs = tk.Canvas(list_frame, background="white", highlightthickness=0,
+                                       yscrollincrement=cell_height // 4)
+        self.scroll_thumbs = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.canvas_thumbs.yview)
+        self.canvas_thumbs.configure(yscrollcommand=self._on_thumbnail_scroll)
+        self.scroll_thumbs.pack(side=tk.RIGHT, fill='y')
+        self.canvas_thumbs.pack(side=tk.LEFT, fill='both', expand=True)
+        self.canvas_thumbs.bind("<Configure>", lambda e: self._layout_thumbnails())
+        self.canvas_thumbs.bind("<Button-1>", lambda e: self._click_thumbnail(e, extend=False))
+        self.canvas_thumbs.bind("<Shift-Button-1>", lambda e: self._click_thumbnail(e, extend=True))
+        self.canvas_thumbs.bind("<Enter>", lambda e: self.canvas_thumbs.focus_set())
+        self.canvas_thumbs.bind("<MouseWheel>", lambda e: self.canvas_thumbs.yview_scroll(
+            -1 if e.delta > 0 else 1, "units"))
+        self.canvas_thumbs.bind("<Button-4>", lambda e: self.canvas_thumbs.yview_scroll(-1, "units"))
+        self.canvas_thumbs.bind("<Button-5>", lambda e: self.canvas_thumbs.yview_scroll(1, "units"))
+        ToolTip(self.canvas_thumbs, "单击选中或取消一页，Shift+单击选中从上次单击的页到此页的连续范围；"
+                                    "所选页自动填入“处理页数”")
+
+        # 画布只为可见行（及上下预取的行）创建图形项，滚动时回收离开视野的项；
+        # 缩略图由后台线程渲染，PhotoImage 只为当前可见的页保留
+        self.thumb_path = None
+        self.thumb_doc_key = None
+        self.thumb_total = 0
+        self.thumb_columns = 0
+        self.thumb_cells = {}
+        self.thumb_images = {}
+        self.thumb_selection = set()
+        self.thumb_anchor = None
+        self._thumb_draw_pending = False
+        self._thumb_error_docs = set()
+        self.thumbnail_cache = ThumbnailCache()
+        self.thumbnail_renderer = ThumbnailRenderer(
+            self.thumbnail_cache,
+            on_ready=lambda doc_key, pages: self.root.after(0, self._thumbnails_ready, doc_key, pages),
+            on_error=self._thumbnail_error)
+
+    @staticmethod
+    def _thumbnail_cell():
+        width, height = THUMBNAIL_SIZE
+        return width + 16, height + 32
+
+    def _on_tab_changed(self):
+        frame = self.notebook.nametowidget(self.notebook.select())
+        self._ensure_tab(frame)
+        if frame is self.tab_thumbs:
+            self.load_thumbnails()
+
+    # 页数读取放到后台线程；同一文件再次切换到本页时只同步所选页
+    def load_thumbnails(self, force=False):
+        input_path = self.entry_input.get().strip()
+        if not input_path.lower().endswith(".pdf") or not os.path.isfile(input_path):
+            self._show_thumbnail_document(None, None, 0)
+            self.lbl_thumbs_status.configure(text="请先在“基本设置”中选择输入 PDF 文件")
+            return
+        try:
+            doc_key = ThumbnailCache.document_key(input_path)
+        except OSError as e:
+            self.lbl_thumbs_status.configure(text=f"无法读取输入文件：{e}")
+            return
+        if doc_key == self.thumb_doc_key and not force:
+            self._sync_thumbnail_selection()
+            return
+        if force:
+            self.thumbnail_renderer.forget_failures(doc_key)
+            self._thumb_error_docs.discard(doc_key)
+        self.lbl_thumbs_status.configure(text="正在读取页数…")
+
+        def count_thread():
+            total = count_pdf_pages(input_path)
+            self.root.after(0, lambda: self._show_thumbnail_document(input_path, doc_key, total))
+        threading.Thread(target=count_thread, daemon=True).start()
+
+    def _show_thumbnail_document(self, input_path, doc_key, total):
+        if input_path and input_path != self.entry_input.get().strip():
+            return
+        self.thumb_path = input_path
+        self.thumb_doc_key = doc_key
+        self.thumb_total = total or 0
+        self.thumb_columns = 0
+        self.thumb_cells = {}
+        self.thumb_images = {}
+        self.thumb_anchor = None
+        self.canvas_thumbs.delete("all")
+        self.canvas_thumbs.yview_moveto(0)
+        if input_path and total is None:
+            self.lbl_thumbs_status.configure(text="无法读取页数（需要安装 pikepdf）")
+            return
+        self._sync_thumbnail_selection()
+        self._layout_thumbnails()
+
+    # 画布宽度决定每行的列数；列数变化时所有可见项按新位置重画
+    def _layout_thumbnails(self):
+        cell_width, cell_height = self._thumbnail_cell()
+        columns = max(1, self.canvas_thumbs.winfo_width() // cell_width)
+        if columns != self.thumb_columns:
+            for items in self.thumb_cells.values():
+                self.canvas_thumbs.delete(*items)
+            self.thumb_cells = {}
+            self.thumb_columns = columns
+        rows = math.ceil(self.thumb_total / columns)
+        self.canvas_thumbs.configure(scrollregion=(0, 0, columns * cell_width, rows * cell_height))
+        self._draw_visible_thumbnails()
+
+    def _on_thumbnail_scroll(self, first, last):
+        self.scroll_thumbs.set(first, last)
+        if not self._thumb_draw_pending:
+            self._thumb_draw_pending = True
+            self.root.after_idle(self._draw_visible_thumbnails)
+
+    def _draw_visible_thumbnails(self):
+        self._thumb_draw_pending = False
+        if not self.thumb_total or not self.thumb_columns:
+            return
+        cell_width, cell_height = self._thumbnail_cell()
+        columns = self.thumb_columns
+        top = self.canvas_thumbs.canvasy(0)
+        first_row = max(0, int(top // cell_height))
+        last_row = int((top + self.canvas_thumbs.winfo_height()) // cell_height)
+        visible = range(first_row * columns + 1, min(self.thumb_total, (last_row + 1) * columns) + 1)
+        for page in [page for page in self.thumb_cells if page not in visible]:
+            self.canvas_thumbs.delete(*self.thumb_cells.pop(page))
+            self.thumb_images.pop(page, None)
+        for page in visible:
+            if page not in self.thumb_cells:
+                self._draw_thumbnail_cell(page)
+        # 先渲染可见页，再预取下方和上方的行
+        prefetch = THUMBNAIL_PREFETCH_ROWS * columns
+        wanted = (list(visible)
+                  + list(range(visible.stop, min(self.thumb_total, visible.stop - 1 + prefetch) + 1))
+                  + list(range(max(1, visible.start - prefetch), visible.start)))
+        self.thumbnail_renderer.request(self.thumb_path, self.thumb_doc_key,
+                                        [page for page in wanted if page not in self.thumb_images])
+
+    def _draw_thumbnail_cell(self, page):
+        cell_width, cell_height = self._thumbnail_cell()
+        width, height = THUMBNAIL_SIZE
+        x = (page - 1) % self.thumb_columns * cell_width + 8
+        y = (page - 1) // self.thumb_columns * cell_height + 8
+        rect = self.canvas_thumbs.create_rectangle(x - 3, y - 3, x + width + 3, y + height + 3,
+                                                   fill="#f0f0f0", width=3)
+        image = self.canvas_thumbs.create_image(x, y, anchor=tk.NW)
+        text = self.canvas_thumbs.create_text(x + width // 2, y + height + 14, text=str(page))
+        self.thumb_cells[page] = (rect, image, text)
+        self._update_thumbnail_cell(page)
+
+    def _update_thumbnail_cell(self, page):
+        rect, image, text = self.thumb_cells[page]
+        selected = page in self.thumb_selection
+        self.canvas_thumbs.itemconfigure(rect, outline="#0d6efd" if selected else "#d0d0d0")
+        self.canvas_thumbs.itemconfigure(text, fill="#0d6efd" if selected else "black")
+        if page not in self.thumb_images:
+            data = self.thumbnail_cache.cached(self.thumb_doc_key, page)
+            if data is None:
+                return
+            try:
+                self.thumb_images[page] = tk.PhotoImage(data=data)
+            except tk.TclError:
+                return
+            self.canvas_thumbs.itemconfigure(image, image=self.thumb_images[page])
+
+    def _thumbnails_ready(self, doc_key, pages):
+        if doc_key != self.thumb_doc_key:
+            return
+        for page in pages:
+            if page in self.thumb_cells:
+                self._update_thumbnail_cell(page)
+
+    def _thumbnail_error(self, doc_key, error):
+        if doc_key not in self._thumb_error_docs:
+            self._thumb_error_docs.add(doc_key)
+            self._log_message(f"渲染缩略图失败：{error}", "warning")
+
+    # 单击切换一页；Shift+单击把上次单击的页到此页的范围加入所选
+    def _click_thumbnail(self, event, extend):
+        if not self.thumb_total:
+            return
+        cell_width, cell_height = self._thumbnail_cell()
+        column = int(self.canvas_thumbs.canvasx(event.x) // cell_width)
+        page = int(self.canvas_thumbs.canvasy(event.y) // cell_height) * self.thumb_columns + column + 1
+        if column >= self.thumb_columns or not 1 <= page <= self.thumb_total:
+            return
+        if extend and self.thumb_anchor:
+            low, high = sorted((self.thumb_anchor, page))
+            changed = set(range(low, high + 1))
+            self.thumb_selection |= changed
+        else:
+            changed = {page}
+            self.thumb_selection ^= changed
+            self.thumb_anchor = page
+        self.var_pages.set(format_page_ranges(self.thumb_selection))
+        for page in changed & self.thumb_cells.keys():
+            self._update_thumbnail_cell(page)
+        self._show_thumbnail_status()
+
+    # 以“处理页数”为准同步所选页，在高级选项中手动修改后切换回来即可看到
+    def _sync_thumbnail_selection(self):
+        error = None
+        try:
+            self.thumb_selection = set(parse_page_ranges(self.var_pages.get(), self.thumb_total))
+        except ValueError as e:
+            self.thumb_selection, error = set(), e
+        for page in self.thumb_cells:
+            self._update_thumbnail_cell(page)
+        self._show_thumbnail_status(error)
+
+    def clear_thumbnail_selection(self):
+        self.var_pages.set("")
+        self.thumb_anchor = None
+        self._sync_thumbnail_selection()
+
+    def _show_thumbnail_status(self, error=None):
+        if not self.thumb_path:
+            return
+        if error:
+            selected = f"处理页数无效：{error}"
+        else:
+            selected = (f"已选 {len(self.thumb_selection)} 页：{format_page_ranges(self.thumb_selection)}"
+                        if self.thumb_selection else "未选择，处理全部页")
+        self.lbl_thumbs_status.configure(
+            text=f"{os.path.basename(self.thumb_path)} · 共 {self.thumb_total} 页 · {selected}")
+
+    # ----- 全文搜索标签页 -----
+    def create_search_tab(self):
+        frame = self.tab_search
+        search_frame = ttk.Frame(frame)
+        search_frame.pack(fill='x', padx=5, pady=5)
+        lbl_query = ttk.Label(search_frame, text="🔍关键词：")
+        lbl_query.pack(side=tk.LEFT, padx=5)
+        self.entry_search = ttk.Entry(search_frame, width=50)
+        self.entry_search.pack(side=tk.LEFT, fill='x', expand=True, padx=5)
+        self.entry_search.bind("<Return>", lambda e: self.run_search())
+        ToolTip(self.entry_search, "按短语搜索已完成任务的 sidecar 文字；空格分隔的多个词须同时出现在同一页")
+        btn_search = ttk.Button(search_frame, text="搜索", style="primary.TButton", command=self.run_search)
+        btn_search.pack(side=tk.LEFT, padx=5)
+        btn_refresh = ttk.Button(search_frame, text="🔄更新索引", style="info.TButton",
+                                 command=self.refresh_search_index)
+        btn_refresh.pack(side=tk.LEFT, padx=5)
+        ToolTip(btn_refresh, "重新检查已索引的文件：只重建内容有变化的 sidecar，并移除已删除的文件")
+        btn_folder = ttk.Button(search_frame, text="📂索引文件夹", style="info.TButton",
+                                command=self.index_search_folder)
+        btn_folder.pack(side=tk.LEFT, padx=5)
+        ToolTip(btn_folder, "将文件夹中已有的 sidecar（与同名 PDF 或 _ocr.pdf 配对）加入索引")
+
+        self.lbl_search_status = ttk.Label(frame, text="")
+        self.lbl_search_status.pack(fill='x', padx=10)
+
+        columns = ("file", "page", "snippet")
+        self.tree_search = ttk.Treeview(frame, columns=columns, show="headings", height=15)
+        self.tree_search.heading("file", text="文件")
+        self.tree_search.heading("page", text="页码")
+        self.tree_search.heading("snippet", text="摘要")
+        self.tree_search.column("file", width=260)
+        self.tree_search.column("page", width=60, anchor=tk.CENTER)
+        self.tree_search.column("snippet", width=520)
+        self.tree_search.pack(fill='both', expand=True, padx=5, pady=5)
+        self.tree_search.bind("<Double-1>", lambda e: self.open_search_result())
+        ToolTip(self.tree_search, "双击在对应页打开 PDF")
+        self.search_results = {}
+        if not self.search_index:
+            self.lbl_search_status.configure(text="全文索引不可用")
+            return
+        self._show_search_stats()
+
+    def _show_search_stats(self):
+        documents, pages = self.search_index.stats()
+        self.lbl_search_status.configure(text=f"已索引 {documents} 个文件 · {pages} 页")
+
+    def run_search(self):
+        if not self.search_index:
+            return
+        query = self.entry_search.get().strip()
+        started = time.perf_counter()
+        try:
+            results = self.search_index.search(query)
+        except sqlite3.Error as e:
+            self._log_message(f"搜索失败：{e}", "error")
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+        self.tree_search.delete(*self.tree_search.get_children())
+        self.search_results = {}
+        for pdf_path, page, offset, snippet in results:
+            item = self.tree_search.insert("", tk.END, values=(os.path.basename(pdf_path), page, snippet))
+            self.search_results[item] = (pdf_path, page)
+        more = f"（仅显示前 {SEARCH_RESULT_LIMIT} 处）" if len(results) >= SEARCH_RESULT_LIMIT else ""
+        self.lbl_search_status.configure(text=f"找到 {len(results)} 处{more} · 用时 {elapsed:.1f} ms")
+
+    def open_search_result(self):
+        selection = self.tree_search.selection()
+        if not selection:
+            return
+        pdf_path, page = self.search_results[selection[0]]
+        if not os.path.exists(pdf_path):
+            messagebox.showwarning("提示", f"文件已不存在：{pdf_path}")
+            return
+        try:
+            if not open_pdf_at_page(pdf_path, page):
+                self._log_message(f"未找到支持跳页的 PDF 阅读器，请手动翻到第 {page} 页", "info")
+        except OSError as e:
+            self._log_message(f"无法打开文件：{e}", "error")
+
+    def refresh_search_index(self):
+        if not self.search_index:
+            return
+
+        def refresh_thread():
+            try:
+                updated, removed = self.search_index.refresh()
+            except (sqlite3.Error, OSError) as e:
+                self._log_message(f"更新全文索引失败：{e}", "error")
+                return
+            self._log_message(f"全文索引已更新：重建 {updated} 个，移除 {removed} 个", "success")
+            self.root.after(0, self._show_search_stats)
+        threading.Thread(target=refresh_thread, daemon=True).start()
+
+    def index_search_folder(self):
+        if not self.search_index:
+            return
+        folder = filedialog.askdirectory(title="选择包含 sidecar 文本的文件夹")
+        if not folder:
+            return
+
+        def index_thread():
+            try:
+                indexed = self.search_index.index_folder(folder)
+            except (sqlite3.Error, OSError) as e:
+                self._log_message(f"索引文件夹失败：{e}", "error")
+                return
+            self._log_message(f"已索引 {folder} 中 {indexed} 个新增或变化的文件", "success")
+            self.root.after(0, self._show_search_stats)
+        threading.Thread(target=index_thread, daemon=True).start()
+
     # ----- 底部区域：生成命令与日志 -----
     def create_bottom_area(self):
         self.bottom_top = ttk.Frame(self.bottom_frame)
         self.bottom_top.pack(fill='x', padx=5, pady=5)
         lbl_cmd = ttk.Label(self.bottom_top, text="📝生成的命令：")
         lbl_cmd.pack(side=tk.LEFT, padx=5)
-        # 命令文本区域保持可编辑状态，用户可以直接修改命令
+        # 命令文本区域保持可编辑状态，用户可以直接修改命令；修改在失去焦点或运行时解析回界面选项
         self.txt_command = tk.Text(self.bottom_top, height=2, width=80)
         self.txt_command.pack(side=tk.LEFT, padx=5)
         btn_run = ttk.Button(self.bottom_top, text="🚀运行命令",
                              style="success.TButton", command=self.run_command)
         btn_run.pack(side=tk.LEFT, padx=5)
         ToolTip(btn_run, "执行生成的命令")
+        btn_stop = ttk.Button(self.bottom_top, text="⏹停止",
+                              style="danger.TButton", command=self.stop_command)
+        btn_stop.pack(side=tk.LEFT, padx=5)
+        ToolTip(btn_stop, "结束正在运行的命令及其全部子进程")
         btn_clear_cmd = ttk.Button(
             self.bottom_top, text="🗑️清除命令", style="warning.TButton", command=self.clear_command)
         btn_clear_cmd.pack(side=tk.LEFT, padx=5)
@@ -356,23 +5686,51 @@ class OCRGuiApp:
         self.log_text.tag_config("error", foreground="red")
         self.log_text.tag_config("success", foreground="green")
 
-    # 将日志消息压入队列，消息为 (message, level) 的元组
+    # 完整日志写入 APP_DIR/logs 下的文件，日志区域只显示最近的 LOG_MAX_LINES 行
+    def _open_log_file(self):
+        self.log_file = None
+        self.log_file_path = None
+        try:
+            os.makedirs(LOG_DIR, exist_ok=True)
+            name = datetime.datetime.now().strftime("ocr-%Y%m%d-%H%M%S.log")
+            self.log_file_path = os.path.join(LOG_DIR, name)
+            self.log_file = open(self.log_file_path, "a", encoding="utf-8")
+        except OSError as e:
+            self.log_file_path = None
+            self.log_queue.put((datetime.datetime.now(), f"无法创建日志文件：{e}", "warning"))
+
+    # 将日志消息压入队列，消息为 (time, message, level) 的元组
     def _log_message(self, message, level):
-        self.log_queue.put((message, level))
+        self.log_queue.put((datetime.datetime.now(), message, level))
 
-    # 定时处理日志队列，将消息追加到日志文本区域
+    # 定时处理日志队列：在时间预算内取出消息，一次性插入日志区域并写入日志文件
     def _process_log_queue(self):
-        while not self.log_queue.empty():
-            message, level = self.log_queue.get()
-            self._append_log(message, level)
+        deadline = time.monotonic() + LOG_FLUSH_BUDGET
+        chunks = []
+        lines = []
+        while time.monotonic() < deadline:
+            try:
+                when, message, level = self.log_queue.get_nowait()
+            except queue.Empty:
+                break
+            timestamp = when.strftime("[%H:%M:%S] ")
+            chunks.extend((timestamp, "timestamp", message + "\n", level))
+            lines.append(timestamp + message + "\n")
+        if chunks:
+            # 单次积压超过日志区域容量时，只渲染最后 LOG_MAX_LINES 行
+            self._append_log(chunks[-4 * LOG_MAX_LINES:])
+            if self.log_file:
+                self.log_file.write("".join(lines))
+                self.log_file.flush()
         self.root.after(100, self._process_log_queue)
 
-    # 在日志区域进行追加，附加时间戳，并按日志级别设置颜色
-    def _append_log(self, message, level):
-        timestamp = datetime.datetime.now().strftime("[%H:%M:%S] ")
+    # 在日志区域批量追加，超出 LOG_MAX_LINES 的旧行从顶部删除
+    def _append_log(self, chunks):
         self.log_text.configure(state='normal')
-        self.log_text.insert(tk.END, timestamp, "timestamp")
-        self.log_text.insert(tk.END, message + "\n", level)
+        self.log_text.insert(tk.END, *chunks)
+        line_count = int(self.log_text.index("end-1c").split(".")[0])
+        if line_count > LOG_MAX_LINES:
+            self.log_text.delete("1.0", f"{line_count - LOG_MAX_LINES + 1}.0")
         self.log_text.configure(state='disabled')
         self.log_text.see(tk.END)
 
@@ -382,116 +5740,139 @@ class OCRGuiApp:
         self.log_text.configure(state='disabled')
         self._log_message("日志已清空", "info")
 
+    # 保存完整日志（日志文件内容）；日志文件不可用时保存日志区域的内容
     def _save_log(self):
         file_path = filedialog.asksaveasfilename(
             title="保存日志", defaultextension=".txt", filetypes=[("文本文件", "*.txt")])
         if file_path:
             try:
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(self.log_text.get("1.0", tk.END))
+                if self.log_file_path:
+                    self.log_file.flush()
+                    shutil.copyfile(self.log_file_path, file_path)
+                else:
+                    with open(file_path, "w", encoding="utf-8") as f:
+                        f.write(self.log_text.get("1.0", tk.END))
                 messagebox.showinfo("提示", "日志已保存")
             except Exception as e:
                 messagebox.showerror("错误", f"保存日志失败：{e}")
 
-    # 清除生成命令文本
+    # 清除生成命令文本及手动加入的参数，选项变化后按界面选项重新生成
     def clear_command(self):
         self.txt_command.delete("1.0", tk.END)
+        self._preview_text = ""
+        self.command_program = "ocrmypdf"
+        self.options_model["extra_args"] = []
 
-    # 绑定各输入控件事件，实时更新命令
-    def bind_update_events(self):
-        self.entry_input.bind("<KeyRelease>", lambda e: self.update_command())
-        self.entry_output.bind("<KeyRelease>", lambda e: self.update_command())
-        self.entry_sidecar.bind(
-            "<KeyRelease>", lambda e: self.update_command())
-        self.entry_sidecar.bind("<FocusOut>", lambda e: self.update_command())
-        self.entry_pages.bind("<KeyRelease>", lambda e: self.update_command())
-        self.entry_title.bind("<KeyRelease>", lambda e: self.update_command())
-        self.entry_author.bind("<KeyRelease>", lambda e: self.update_command())
-        self.entry_subject.bind(
-            "<KeyRelease>", lambda e: self.update_command())
-        self.entry_keywords.bind(
-            "<KeyRelease>", lambda e: self.update_command())
-        for var in self.lang_vars.values():
+    # 选项模型：每个选项键对应读取控件的函数及其依赖的变量。变量变化时只重新读取对应的键，
+    # 命令预览按 COMMAND_PREVIEW_DELAY_MS 合并刷新；collect_options 直接返回模型的副本
+    def _init_option_model(self):
+        def text(var):
+            return lambda: var.get().strip()
+
+        sources = [
+            ("languages", list(self.lang_vars.values()),
+             lambda: [self.languages[lang] for lang, var in self.lang_vars.items() if var.get()]),
+            ("auto_language", [self.var_auto_lang], self.var_auto_lang.get),
+            ("rotate", [self.var_rotate], self.var_rotate.get),
+            ("remove_background", [self.var_remove_bg], self.var_remove_bg.get),
+            ("deskew", [self.var_deskew], self.var_deskew.get),
+            ("clean", [self.var_clean], self.var_clean.get),
+            ("clean_final", [self.var_clean_final], self.var_clean_final.get),
+            ("output_type", [self.var_output_type], text(self.var_output_type)),
+            ("optimize", [self.var_pdfopt], lambda: PDF_OPT_MAP.get(self.var_pdfopt.get().strip())),
+            ("optimize_target_kb", [self.var_optimize_target], self._optimize_target),
+            ("force_ocr", [self.var_force_ocr], self.var_force_ocr.get),
+            ("skip_text", [self.var_skip_text], self.var_skip_text.get),
+            ("redo_ocr", [self.var_redo], self.var_redo.get),
+            ("tesseract_timeout", [self.var_tesseract_timeout], self._tesseract_timeout),
+            ("sidecar", [self.var_sidecar], self.var_sidecar.get),
+            ("sidecar_name", [self.var_sidecar_name], text(self.var_sidecar_name)),
+            ("pages", [self.var_pages], text(self.var_pages)),
+            ("title", [self.var_title], text(self.var_title)),
+            ("author", [self.var_author], text(self.var_author)),
+            ("subject", [self.var_subject], text(self.var_subject)),
+            ("keywords", [self.var_keywords], text(self.var_keywords)),
+        ]
+        self._option_readers = {}
+        for key, variables, read in sources:
+            self._option_readers[key] = read
+            for var in variables:
+                var.trace_add("write", lambda *args, key=key: self._option_changed(key))
+        self.options_model = {key: read() for key, read in self._option_readers.items()}
+        for var in (self.var_input, self.var_output):
             var.trace_add("write", lambda *args: self.update_command())
-        self.combo_outtype.bind("<<ComboboxSelected>>",
-                                lambda e: self.update_command())
-        self.combo_pdfopt.bind("<<ComboboxSelected>>",
-                               lambda e: self.update_command())
+        # 预览文本：_preview_text 为最近一次渲染的内容，与文本框不同说明用户手动修改过；
+        # 手动加入的模型之外的参数保存在选项的 extra_args 中，随选项进入批量任务与配置文件，程序名保存在 command_program 中
+        self.options_model["extra_args"] = []
+        self._preview_after = None
+        self._preview_text = ""
+        self.command_program = "ocrmypdf"
+        self.txt_command.bind("<FocusOut>", lambda e: self.update_command())
+
+    def _option_changed(self, key):
+        self.options_model[key] = self._option_readers[key]()
+        self.update_command()
 
     def update_command(self):
-        cmd = self.generate_command(update_only=True)
-        self.txt_command.delete("1.0", tk.END)
-        self.txt_command.insert(tk.END, " ".join(cmd))
-
-    def generate_command(self, update_only=False):
-        cmd = ["ocrmypdf"]
-
-        selected = [self.languages[lang]
-                    for lang, var in self.lang_vars.items() if var.get()]
-        if selected:
-            cmd.extend(["-l", "+".join(selected)])
-        if self.var_rotate.get():
-            cmd.append("-r")
-        if self.var_remove_bg.get():
-            cmd.append("--remove-background")
-        if self.var_deskew.get():
-            cmd.append("-d")
-        if self.var_clean.get():
-            cmd.append("-c")
-        if self.var_clean_final.get():
-            cmd.append("-i")
-        outtype = self.combo_outtype.get().strip()
-        if outtype:
-            cmd.extend(["--output-type", outtype])
-        pdf_opt = self.combo_pdfopt.get().strip()
-        pdf_map = {"不优化": "0", "安全无损优化": "1",
-                   "有损 JPEG 优化": "2", "更激进的有损优化": "3"}
-        if pdf_opt in pdf_map:
-            cmd.extend(["-O", pdf_map[pdf_opt]])
-        if self.var_force_ocr.get():
-            cmd.append("-f")
-        if self.var_skip_text.get():
-            cmd.append("-s")
-        if self.var_redo.get():
-            cmd.append("--redo-ocr")
-        if self.var_sidecar.get():
-            input_path = self.entry_input.get().strip()
-            sidecar = self.entry_sidecar.get().strip()
-            if not sidecar:
-                base, _ = os.path.splitext(input_path)
-                sidecar = os.path.basename(base) + ".txt"
-            else:
-                if not os.path.splitext(sidecar)[1]:
-                    sidecar += ".txt"
-            dir_in = os.path.dirname(
-                input_path) if os.path.dirname(input_path) else "."
-            sidecar_full = os.path.join(dir_in, sidecar).replace("\\", "/")
-            # 为防止 sidecar 路径中出现空格，套上双引号
-            cmd.extend(["--sidecar", f'"{sidecar_full}"'])
-        pages = self.entry_pages.get().strip()
-        if pages:
-            cmd.extend(["--pages", f'"{pages}"'])
-        title = self.entry_title.get().strip() if hasattr(self, "entry_title") else ""
-        if title:
-            cmd.extend(["--title", f'"{title}"'])
-        author = self.entry_author.get().strip() if hasattr(self, "entry_author") else ""
-        if author:
-            cmd.extend(["--author", f'"{author}"'])
-        subject = self.entry_subject.get().strip() if hasattr(self, "entry_subject") else ""
-        if subject:
-            cmd.extend(["--subject", f'"{subject}"'])
-        keywords = self.entry_keywords.get().strip(
-        ) if hasattr(self, "entry_keywords") else ""
-        if keywords:
-            cmd.extend(["--keywords", f'"{keywords}"'])
-        input_file = self.entry_input.get().strip() or "-"
-        output_file = self.entry_output.get().strip() or "-"
-        # 给文件路径也加上双引号
-        cmd.append(f'"{input_file}"')
-        cmd.append(f'"{output_file}"')
-        if not update_only:
-            self._log_message("命令生成成功", "success")
-        return cmd
+        if self._preview_after is not None:
+            self.root.after_cancel(self._preview_after)
+        self._preview_after = self.root.after(COMMAND_PREVIEW_DELAY_MS, self._render_command)
+
+    def _render_command(self):
+        if self._preview_after is not None:
+            self.root.after_cancel(self._preview_after)
+            self._preview_after = None
+        error = self._sync_command_edits()
+        if error:
+            self._log_message(f"无法解析修改后的命令（{error}），已按界面选项重新生成", "warning")
+        text = format_command(self.build_command())
+        if text != self.txt_command.get("1.0", "end-1c"):
+            self.txt_command.delete("1.0", tk.END)
+            self.txt_command.insert(tk.END, text)
+        self._preview_text = text
+
+    # 预览文本被手动修改过时解析回选项模型，并写回各控件与输入输出文件；无法解析时返回错误说明
+    def _sync_command_edits(self):
+        text = self.txt_command.get("1.0", "end-1c").strip()
+        if not text or text == self._preview_text:
+            return None
+        try:
+            argv = split_command(text)
+            options, input_file, output_file = parse_ocr_args(argv, self.options_model)
+        except ValueError as e:
+            return str(e)
+        unknown = [lang for lang in options["languages"] if lang not in self.languages.values()]
+        if unknown:
+            self._log_message(f"界面中没有语言 {'+'.join(unknown)}，已忽略", "warning")
+        self._preview_text = text
+        self.command_program = argv[0]
+        self.apply_options(options)
+        self.var_input.set(input_file)
+        self.var_output.set(output_file)
+        return None
+
+    def build_command(self, options=None, input_file=None, output_file=None):
+        argv = build_ocr_args(self.options_model if options is None else options,
+                              self.var_input.get().strip() if input_file is None else input_file,
+                              self.var_output.get().strip() if output_file is None else output_file)
+        argv[0] = self.command_program
+        return argv
+
+    def _tesseract_timeout(self):
+        try:
+            return max(0, int(self.var_tesseract_timeout.get()))
+        except (tk.TclError, ValueError):
+            return 0
+
+    def _optimize_target(self):
+        try:
+            return max(1, int(self.var_optimize_target.get()))
+        except (tk.TclError, ValueError):
+            return OPTIMIZE_AUTO_TARGET // 1024
+
+    # 当前选项，供命令生成与批量任务共用
+    def collect_options(self):
+        return dict(self.options_model)
 
     def select_input_file(self):
         file_path = filedialog.askopenfilename(
@@ -502,7 +5883,6 @@ class OCRGuiApp:
             base, ext = os.path.splitext(file_path)
             self.entry_output.delete(0, tk.END)
             self.entry_output.insert(0, f"{base}_ocr{ext}")
-            self.update_command()
 
     def select_output_file(self):
         file_path = filedialog.asksaveasfilename(
@@ -510,7 +5890,6 @@ class OCRGuiApp:
         if file_path:
             self.entry_output.delete(0, tk.END)
             self.entry_output.insert(0, file_path)
-            self.update_command()
 
     def drop_input_file(self, event):
         file_path = event.data
@@ -521,7 +5900,6 @@ class OCRGuiApp:
         base, ext = os.path.splitext(file_path)
         self.entry_output.delete(0, tk.END)
         self.entry_output.insert(0, f"{base}_ocr{ext}")
-        self.update_command()
 
     def drop_output_file(self, event):
         file_path = event.data
@@ -529,40 +5907,432 @@ class OCRGuiApp:
             file_path = file_path[1:-1]
         self.entry_output.delete(0, tk.END)
         self.entry_output.insert(0, file_path)
-        self.update_command()
 
-    # 使用 shell=True 并从 txt_command 中读取命令执行，便于用户直接修改
+    # 按预览中的命令执行：手动修改过的命令先解析回选项模型，再以参数列表直接启动进程（不经过 shell）
     def run_command(self):
-        cmd_str = self.txt_command.get("1.0", tk.END).strip()
-        self._log_message("开始执行命令：" + cmd_str, "success")
+        error = self._sync_command_edits()
+        if error:
+            messagebox.showerror("错误", f"无法解析命令：{error}")
+            return
+        self._render_command()
+        options = self.collect_options()
+        input_path = self.var_input.get().strip()
+        output_path = self.var_output.get().strip()
 
         def run_thread():
+            run_options = dict(options)
+            # 自动识别语言、自动优化时先检测，再以检测结果生成命令
+            if options["auto_language"] and len(options["languages"]) > 1 and input_path:
+                try:
+                    result = detect_languages(input_path, options["languages"])
+                    self._log_message(language_report(result, options["languages"]), "info")
+                    run_options["languages"] = result["languages"]
+                except (OSError, subprocess.SubprocessError) as e:
+                    self._log_message(f"自动识别语言失败，使用全部勾选的语言：{e}", "warning")
+            if options["optimize"] == OPTIMIZE_AUTO and input_path:
+                try:
+                    result = choose_optimize_level(input_path, options, options["optimize_target_kb"] * 1024)
+                    self._log_message(optimize_report(result), "info")
+                    run_options["optimize"] = result["level"]
+                except (OSError, subprocess.SubprocessError) as e:
+                    self._log_message(f"自动优化试算失败，使用 -O {OPTIMIZE_AUTO_FALLBACK}：{e}", "warning")
+            argv = self.build_command(run_options, input_path, output_path)
+            self._log_message("开始执行命令：" + format_command(argv), "success")
+            temp_dir = make_job_temp_dir()
             try:
-                proc = subprocess.Popen(cmd_str,
-                                        shell=True,
+                proc = subprocess.Popen(argv,
                                         stdout=subprocess.PIPE,
                                         stderr=subprocess.STDOUT,
                                         bufsize=1,
                                         universal_newlines=True,
                                         encoding='utf-8',
-                                        errors='replace')
-                while True:
-                    line = proc.stdout.readline()
-                    if line == '' and proc.poll() is not None:
-                        break
-                    if line:
+                                        errors='replace',
+                                        env=dict(os.environ, **temp_env(temp_dir)),
+                                        **process_group_kwargs())
+                proc.stopped = False
+                self.command_process = proc
+                for line in proc.stdout:
+                    if line.strip():
                         self._log_message(line.strip(), "success")
-                ret_code = proc.poll()
-                if ret_code == 0:
+                ret_code = proc.wait()
+                if proc.stopped:
+                    self._log_message("命令已停止", "warning")
+                elif ret_code == 0:
                     self._log_message("命令执行完毕", "success")
                 else:
                     self._log_message(f"命令执行失败，返回码：{ret_code}", "error")
             except Exception as e:
                 self._log_message("执行过程中出错：" + str(e), "error")
+            finally:
+                self.command_process = None
+                shutil.rmtree(temp_dir, ignore_errors=True)
         threading.Thread(target=run_thread, daemon=True).start()
 
+    # 结束“运行命令”启动的进程组；退出程序时 wait 为 True，等待进程全部结束
+    def stop_command(self, wait=False):
+        proc = self.command_process
+        if proc is None:
+            return
+        proc.stopped = True
+        self._log_message("正在停止命令及其全部子进程", "warning")
+        if wait:
+            terminate_process_group(proc.pid)
+        else:
+            threading.Thread(target=terminate_process_group, args=(proc.pid,), daemon=True).start()
+
+
+def create_app():
+    _load_gui()
+    root = TkinterDnD.Tk() if TkinterDnD else tk.Tk()
+    ttk.Style(theme='minty')
+    return root, OCRGuiApp(root)
+
+
+# 在新的解释器中测量启动耗时，避免已导入的模块影响结果
+_STARTUP_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {module_dir!r})
+import OcrMyPDF_GUI as m
+t1 = time.perf_counter()
+result = {{"import": t1 - t0,
+          "gui_modules_imported": any(name in sys.modules for name in ("tkinter", "ttkbootstrap"))}}
+if {with_gui!r}:
+    root, app = m.create_app()
+    root.update()
+    result["gui"] = time.perf_counter() - t1
+    root.destroy()
+print(json.dumps(result))
+"""
+
+
+# 启动性能基准：多次测量取中位数，超出预算时返回非零退出码，便于在 CI 中防止退化
+def bench_startup(runs=5, with_gui=True):
+    code = _STARTUP_PROBE.format(module_dir=os.path.dirname(os.path.abspath(__file__)),
+                                 with_gui=with_gui)
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                             text=True, check=True).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+
+    def median(values):
+        values = sorted(values)
+        return values[len(values) // 2]
+
+    report = {"runs": runs,
+              "import_seconds": median(s["import"] for s in samples),
+              "import_budget": STARTUP_IMPORT_BUDGET,
+              "gui_modules_imported": any(s["gui_modules_imported"] for s in samples)}
+    ok = report["import_seconds"] <= STARTUP_IMPORT_BUDGET and not report["gui_modules_imported"]
+    if with_gui:
+        report["gui_seconds"] = median(s["gui"] for s in samples)
+        report["gui_budget"] = STARTUP_GUI_BUDGET
+        ok = ok and report["gui_seconds"] <= STARTUP_GUI_BUDGET
+    report["ok"] = ok
+    print(json.dumps(report, indent=2))
+    return 0 if ok else 1
+
+
+def _bench_text_lines(rng, count):
+    return [" ".join(rng.choice(BENCH_WORDS) for _ in range(rng.randint(8, 12))) for _ in range(count)]
+
+
+# 矢量文字的内容流；angle 不为 0 时绕页面中心旋转（模拟扫描时的倾斜）
+def _bench_text_content(lines, top=790, angle=0.0):
+    width, height = BENCH_PAGE_SIZE
+    ops = []
+    if angle:
+        cos, sin = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+        cx, cy = width / 2, height / 2
+        ops.append(f"q {cos:.5f} {sin:.5f} {-sin:.5f} {cos:.5f} "
+                   f"{cx - cos * cx + sin * cy:.3f} {cy - sin * cx - cos * cy:.3f} cm")
+    ops.append(f"BT /F1 11 Tf 15 TL 56 {top} Td")
+    ops.extend(f"({line}) Tj T*" for line in lines)
+    ops.append("ET")
+    if angle:
+        ops.append("Q")
+    return "\n".join(ops).encode("ascii")
+
+
+def _bench_font():
+    import pikepdf
+    return pikepdf.Dictionary(Type=pikepdf.Name.Font, Subtype=pikepdf.Name.Type1,
+                              BaseFont=pikepdf.Name.Helvetica)
+
+
+# 用 Ghostscript 将一页矢量文字栅格化为灰度图像，返回 (宽, 高, 像素)
+def _bench_rasterize(content, dpi, tmp_dir):
+    import pikepdf
+    source = os.path.join(tmp_dir, "page.pdf")
+    with pikepdf.new() as pdf:
+        page = pdf.add_blank_page(page_size=BENCH_PAGE_SIZE)
+        page.obj.Resources = pikepdf.Dictionary(Font=pikepdf.Dictionary(F1=_bench_font()))
+        page.obj.Contents = pdf.make_stream(content)
+        pdf.save(source, deterministic_id=True)
+    subprocess.run([_ghostscript(), "-q", "-dNOPAUSE", "-dBATCH", "-dSAFER", "-sDEVICE=pgmraw",
+                    f"-r{dpi}", f"-sOutputFile={os.path.join(tmp_dir, 'r%06d.pgm')}", source],
+                   check=True, capture_output=True)
+    names = sorted(name for name in os.listdir(tmp_dir) if name.endswith(".pgm"))
+    result = read_pgm(os.path.join(tmp_dir, names[0]))
+    for name in names:
+        os.remove(os.path.join(tmp_dir, name))
+    return result
+
+
+# 不依赖 Ghostscript 的近似栅格化（桩模式用）：每个字符画成一个深色块，行距与 _bench_text_content 相同；
+# angle 不为 0 时逐行水平错位模拟倾斜。返回 (宽, 高, 像素)
+def _bench_block_raster(lines, dpi, top=790, angle=0.0):
+    scale = dpi / 72
+    width, height = int(BENCH_PAGE_SIZE[0] * scale), int(BENCH_PAGE_SIZE[1] * scale)
+    rows = [b"\xff" * width] * height
+    char_width, glyph_height = max(2, int(6 * scale)), max(1, int(8 * scale))
+    slope = math.tan(math.radians(angle))
+    for index, line in enumerate(lines):
+        row = bytearray(b"\xff" * width)
+        for column, char in enumerate(line):
+            start = int(56 * scale) + column * char_width
+            if char != " " and start < width:
+                end = min(start + char_width - 1, width)
+                row[start:end] = b"\x00" * (end - start)
+        baseline = int((BENCH_PAGE_SIZE[1] - top + 15 * index) * scale)
+        for y in range(max(baseline - glyph_height, 0), min(baseline, height)):
+            shift = int((y - height / 2) * slope) % width
+            rows[y] = bytes(row[-shift:] + row[:-shift]) if shift else bytes(row)
+    return width, height, b"".join(rows)
+
+
+def _bench_add_noise(rng, pixels):
+    pixels = bytearray(pixels)
+    for _ in range(int(len(pixels) * BENCH_NOISE_FRACTION)):
+        pixels[rng.randrange(len(pixels))] = rng.choice((0, 64, 160, 255))
+    return bytes(pixels)
+
+
+# 生成一页合成页面：text 为纯矢量文字；scanned/skewed/noisy 为整页扫描图像（倾斜或带噪点）；
+# mixed 上半页为矢量文字、下半页为扫描图像。plain 为 True 时用 _bench_block_raster 代替 Ghostscript。
+# 返回 (内容流, 图像或 None)，图像为 (宽, 高, 灰度像素)，内容流以 /F1 引用字体、以 /Im0 引用图像
+def _bench_page(kind, dpi, rng, tmp_dir, plain=False):
+    lines = _bench_text_lines(rng, 48)
+    if kind == "text":
+        return _bench_text_content(lines), None
+    if kind == "mixed":
+        raster, top, angle = lines[24:], 420, 0.0
+        content = _bench_text_content(lines[:24])
+    else:
+        raster, top, angle = lines, 790, BENCH_SKEW_DEGREES if kind == "skewed" else 0.0
+        content = b""
+    if plain:
+        width, height, pixels = _bench_block_raster(raster, dpi, top, angle)
+    else:
+        width, height, pixels = _bench_rasterize(_bench_text_content(raster, top, angle), dpi, tmp_dir)
+    if kind == "noisy":
+        pixels = _bench_add_noise(rng, pixels)
+    return b"q %d 0 0 %d 0 0 cm /Im0 Do Q\n" % BENCH_PAGE_SIZE + content, (width, height, pixels)
+
+
+def _bench_write_pikepdf(path, pages):
+    import pikepdf
+    with pikepdf.new() as pdf:
+        for content, image in pages:
+            resources = pikepdf.Dictionary(Font=pikepdf.Dictionary(F1=_bench_font()))
+            if image:
+                width, height, pixels = image
+                resources.XObject = pikepdf.Dictionary(Im0=pikepdf.Stream(
+                    pdf, zlib.compress(pixels), Type=pikepdf.Name.XObject, Subtype=pikepdf.Name.Image,
+                    Width=width, Height=height, ColorSpace=pikepdf.Name.DeviceGray, BitsPerComponent=8,
+                    Filter=pikepdf.Name.FlateDecode))
+            page = pdf.add_blank_page(page_size=BENCH_PAGE_SIZE)
+            page.obj.Resources = resources
+            page.obj.Contents = pdf.make_stream(content)
+        pdf.save(path, deterministic_id=True)
+
+
+# 不依赖 pikepdf 直接写出 PDF（桩模式用），页面结构与 _bench_write_pikepdf 相同
+def _bench_write_plain(path, pages):
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for content, image in pages:
+        resources = b"/Font << /F1 3 0 R >>"
+        if image:
+            width, height, pixels = image
+            data = zlib.compress(pixels)
+            objects.append(b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+                           b"/BitsPerComponent 8 /Filter /FlateDecode /Length %d >>\nstream\n%s\nendstream"
+                           % (width, height, len(data), data))
+            resources += b" /XObject << /Im0 %d 0 R >>" % len(objects)
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << %s >> /Contents %d 0 R >>"
+                       % (*BENCH_PAGE_SIZE, resources, len(objects)))
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids))
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        f.writelines(b"%010d 00000 n \n" % offset for offset in offsets)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+# 生成确定性的合成语料：每种页面类型（扫描类页面再按每种分辨率）一个 PDF，同一种子总是得到相同内容。
+# plain 为 True 时（桩模式）不依赖 pikepdf 与 Ghostscript，扫描页为近似图像。
+# 目录中已有参数相同的语料时直接复用。返回 [{"path", "kind", "dpi", "pages"}]
+def generate_bench_corpus(directory, pages=2, seed=BENCH_SEED, dpis=BENCH_DPIS, plain=False):
+    manifest_path = os.path.join(directory, "corpus.json")
+    params = {"seed": seed, "pages": pages, "dpis": list(dpis), "kinds": list(BENCH_PAGE_KINDS),
+              "skew": BENCH_SKEW_DEGREES, "noise": BENCH_NOISE_FRACTION, "plain": plain}
+    with contextlib.suppress(OSError, ValueError, KeyError):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest["params"] == params and all(os.path.exists(doc["path"]) for doc in manifest["documents"]):
+            return manifest["documents"]
+    os.makedirs(directory, exist_ok=True)
+    write = _bench_write_plain if plain else _bench_write_pikepdf
+    documents = []
+    with tempfile.TemporaryDirectory(prefix="ocrmypdf_bench_") as tmp_dir:
+        for kind in BENCH_PAGE_KINDS:
+            for dpi in ([None] if kind == "text" else dpis):
+                rng = random.Random(f"{seed}-{kind}-{dpi}")
+                path = os.path.join(directory, f"{kind}.pdf" if dpi is None else f"{kind}_{dpi}dpi.pdf")
+                write(path, [_bench_page(kind, dpi, rng, tmp_dir, plain) for _ in range(pages)])
+                documents.append({"path": path, "kind": kind, "dpi": dpi, "pages": pages})
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"params": params, "documents": documents}, f, ensure_ascii=False, indent=2)
+    return documents
+
+
+def _tool_version(command):
+    try:
+        return subprocess.run(command, capture_output=True, text=True, timeout=30).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# 以一组选项处理整个语料（每个文件重复 repeat 次），统计吞吐量、每页 CPU 时间和输出大小比
+def _bench_option_set(name, options, corpus, out_dir, workers, stub, repeat):
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    # 日志按界面中的格式生成并保留最近的若干行，计入开销但不输出
+    log_lines = collections.deque(maxlen=1000)
+    log_count = itertools.count()
+
+    def log(message, level):
+        next(log_count)
+        log_lines.append(f"[{datetime.datetime.now():%H:%M:%S}] {level}: {message}")
+
+    finished = threading.Semaphore(0)
+
+    def on_update(job):
+        if job.status in JOB_FINISHED:
+            finished.release()
+
+    scheduler = JobScheduler(max_workers=workers, on_log=log, metrics_path=None, memory_budget=0,
+                             engine=StubEngine() if stub else None, on_update=on_update)
+    jobs = []
+    started = time.monotonic()
+    for round_index in range(repeat):
+        for doc in corpus:
+            base = os.path.splitext(os.path.basename(doc["path"]))[0]
+            job = OCRJob(doc["path"], os.path.join(out_dir, f"{base}_{round_index}.pdf"), dict(options))
+            job.bench_doc = doc
+            jobs.append(job)
+            scheduler.submit(job)
+    for _ in jobs:
+        finished.acquire()
+    wall = time.monotonic() - started
+    scheduler.shutdown()
+
+    def summarize(selected, seconds):
+        done = [job for job in selected if job.status == JOB_DONE]
+        pages = sum(job.bench_doc["pages"] for job in done)
+        cpu = sum((job.resources or {}).get("cpu_user", 0) + (job.resources or {}).get("cpu_system", 0)
+                  for job in done)
+        input_bytes = sum(os.path.getsize(job.input_path) for job in done)
+        output_bytes = sum(os.path.getsize(job.output_path) for job in done if os.path.exists(job.output_path))
+        return {"jobs": len(selected), "failed": len(selected) - len(done), "pages": pages,
+                "seconds": round(seconds, 3),
+                "pages_per_second": round(pages / seconds, 3) if seconds else None,
+                "cpu_seconds_per_page": round(cpu / pages, 3) if pages else None,
+                "output_size_ratio": round(output_bytes / input_bytes, 3) if input_bytes else None}
+
+    result = dict(summarize(jobs, wall), name=name,
+                  command=format_command(build_ocr_args(options, "input.pdf", "output.pdf")), kinds={})
+    # 各类页面的耗时取各任务耗时之和，并发运行时不能与总耗时直接比较
+    for doc in corpus:
+        selected = [job for job in jobs if job.bench_doc is doc]
+        key = doc["kind"] if doc["dpi"] is None else f"{doc['kind']}_{doc['dpi']}dpi"
+        result["kinds"][key] = summarize(selected, sum(job.elapsed() for job in selected))
+    result["log_lines"] = next(log_count)
+    if stub:
+        result["overhead_ms_per_job"] = round(wall / len(jobs) * 1000, 3)
+    return result
+
+
+# 吞吐量基准：生成（或复用）合成语料，依次以选项矩阵中的每组选项处理，输出 JSON 报告。
+# 桩模式不调用 ocrmypdf，只测量调度、日志和命令生成的开销。有任务失败时返回非零退出码
+def run_benchmark(directory=BENCH_DIR, pages=2, matrix=None, profiles=(), workers=None,
+                  stub=False, repeat=1, report_path=None):
+    try:
+        corpus = generate_bench_corpus(os.path.join(directory, "corpus"), pages, plain=stub)
+    except (ImportError, OSError, subprocess.CalledProcessError) as e:
+        print(f"无法生成基准语料：{e}。需要 pikepdf 与 Ghostscript；只测调度开销时可加 --bench-stub",
+              file=sys.stderr)
+        return 2
+    option_sets = [(name, dict(BENCH_BASE_OPTIONS, **BENCH_MATRIX[name])) for name in matrix or BENCH_MATRIX]
+    option_sets += [(os.path.splitext(os.path.basename(path))[0], load_profile(path)) for path in profiles]
+    started = time.perf_counter()
+    for _ in range(BENCH_COMMAND_BUILDS):
+        build_ocr_args(BENCH_BASE_OPTIONS, "input.pdf", "output.pdf", jobs=1)
+    command_build_us = (time.perf_counter() - started) / BENCH_COMMAND_BUILDS * 1e6
+    report = {
+        "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "seed": BENCH_SEED, "pages_per_document": pages, "repeat": repeat, "stub": stub,
+        "workers": workers, "cpu_count": os.cpu_count(), "platform": sys.platform,
+        "python": sys.version.split()[0],
+        "ocrmypdf": None if stub else _tool_version(["ocrmypdf", "--version"]),
+        "ghostscript": None if stub else _tool_version([_ghostscript(), "--version"]),
+        "command_build_us": round(command_build_us, 2),
+        "corpus": [{key: doc[key] for key in ("kind", "dpi", "pages")} for doc in corpus],
+        "results": [],
+    }
+    for name, options in option_sets:
+        out_dir = os.path.join(directory, "out", name)
+        report["results"].append(_bench_option_set(name, options, corpus, out_dir, workers, stub, repeat))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if report_path:
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(text)
+    return 0 if all(result["failed"] == 0 for result in report["results"]) else 1
+
 
 if __name__ == '__main__':
-    style = ttk.Style(theme='minty')
-    app = OCRGuiApp(root)
+    args = parse_args()
+    if args.worker:
+        run_worker(args)
+        sys.exit(0)
+    if args.headless:
+        run_headless(args)
+        sys.exit(0)
+    if args.bench_startup:
+        sys.exit(bench_startup(with_gui=not args.no_gui))
+    if args.bench:
+        sys.exit(run_benchmark(args.bench_dir, args.bench_pages,
+                               args.bench_matrix.split(",") if args.bench_matrix else None,
+                               args.bench_profile, args.workers, args.bench_stub, args.bench_repeat,
+                               args.bench_report))
+    root, app = create_app()
     root.mainloop()
+    app.stop_command(wait=True)
+    app.scheduler.shutdown()
+    if app.journal:
+        app.journal.close()
+    if app.search_index:
+        app.search_index.close()
+    if app.log_file:
+        app.log_file.close()
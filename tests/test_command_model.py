@@ -0,0 +1,122 @@
+import importlib.util
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import OcrMyPDF_GUI as gui  # noqa: E402
+
+
+# 选项模型与命令行之间的往返：build_ocr_args -> format_command -> split_command -> parse_ocr_args
+class CommandRoundTripTest(unittest.TestCase):
+    def setUp(self):
+        self.options = dict(gui.DEFAULT_OPTIONS,
+                            languages=["chi_sim", "eng"], deskew=True, clean=True, optimize="2",
+                            force_ocr=True, tesseract_timeout=120, sidecar=True, sidecar_name="文字 结果",
+                            pages="1-3,5", title='报告 "终稿"', author="O'Brien", keywords="a b\\c",
+                            extra_args=["--max-image-mpixels", "500", "--unpaper-args", "--layout double"])
+        self.input_file = os.path.join("扫描 文件", "输入 (1).pdf")
+        self.output_file = os.path.join("输出", "结果 $HOME.pdf")
+
+    def round_trip(self, base=None):
+        argv = gui.build_ocr_args(self.options, self.input_file, self.output_file)
+        text = gui.format_command(argv)
+        self.assertEqual(gui.split_command(text), argv)
+        return gui.parse_ocr_args(gui.split_command(text), base or gui.DEFAULT_OPTIONS)
+
+    def test_round_trip_is_lossless(self):
+        options, input_file, output_file = self.round_trip()
+        self.assertEqual(options, self.options)
+        self.assertEqual((input_file, output_file), (self.input_file, self.output_file))
+
+    def test_round_trip_with_windows_quoting(self):
+        with mock.patch.object(gui.os, "name", "nt"):
+            options, input_file, output_file = self.round_trip()
+        self.assertEqual(options, self.options)
+        self.assertEqual((input_file, output_file), (self.input_file, self.output_file))
+
+    def test_auto_optimize_is_kept(self):
+        self.options["optimize"] = gui.OPTIMIZE_AUTO
+        options, _, _ = self.round_trip(base=self.options)
+        self.assertEqual(options["optimize"], gui.OPTIMIZE_AUTO)
+
+    def test_missing_files_are_dashes(self):
+        argv = gui.build_ocr_args(gui.DEFAULT_OPTIONS, "", "")
+        self.assertEqual(argv[-2:], ["-", "-"])
+        _, input_file, output_file = gui.parse_ocr_args(argv)
+        self.assertEqual((input_file, output_file), ("", ""))
+
+
+class ParseArgsTest(unittest.TestCase):
+    def parse(self, *args):
+        return gui.parse_ocr_args(["ocrmypdf", *args, "in.pdf", "out.pdf"])[0]
+
+    def test_bundled_short_options(self):
+        options = self.parse("-dc", "-O2", "-leng+deu", "-rsj4")
+        self.assertTrue(options["deskew"] and options["clean"] and options["rotate"] and options["skip_text"])
+        self.assertEqual(options["optimize"], "2")
+        self.assertEqual(options["languages"], ["eng", "deu"])
+        self.assertEqual(options["extra_args"], [])
+
+    def test_long_options_with_equals(self):
+        options = self.parse("--optimize=3", "--title=a=b", "--tesseract-timeout=30")
+        self.assertEqual((options["optimize"], options["title"], options["tesseract_timeout"]), ("3", "a=b", 30))
+
+    def test_unknown_options_become_extra_args(self):
+        options = self.parse("-dx", "--pdf-renderer", "sandwich")
+        self.assertFalse(options["deskew"])
+        self.assertEqual(options["extra_args"], ["-dx", "--pdf-renderer", "sandwich"])
+
+    def test_invalid_values(self):
+        for args in (["-O9"], ["--tesseract-timeout", "x"], ["-l"]):
+            with self.subTest(args=args), self.assertRaises(ValueError):
+                self.parse(*args)
+
+    def test_extra_args_reach_job_command(self):
+        job = gui.OCRJob("in.pdf", "out.pdf", dict(gui.DEFAULT_OPTIONS, extra_args=["--pdf-renderer", "sandwich"]))
+        job.jobs = 2
+        self.assertEqual(job.build_args()[-6:], ["--jobs", "2", "--pdf-renderer", "sandwich", "in.pdf", "out.pdf"])
+
+
+# 进程内引擎的关键字参数：附加参数必须与命令行得到相同的 ocrmypdf 选项，无法转换时改用子进程引擎
+class OcrKwargsTest(unittest.TestCase):
+    def setUp(self):
+        self.options = dict(gui.DEFAULT_OPTIONS, languages=["eng"], deskew=True,
+                            extra_args=["--pdf-renderer", "sandwich", "--max-image-mpixels", "500",
+                                        "--unpaper-args", "--layout double", "--jbig2-lossy"])
+
+    @unittest.skipUnless(importlib.util.find_spec("ocrmypdf"), "需要 ocrmypdf")
+    def test_extra_args_match_command(self):
+        from ocrmypdf._plugin_manager import get_parser_options_plugins
+        from ocrmypdf.api import create_options
+        argv = gui.build_ocr_args(self.options, "in.pdf", "out.pdf", jobs=2)
+        kwargs = gui.build_ocr_kwargs(self.options, "in.pdf", jobs=2)
+        self.assertEqual(kwargs["pdf_renderer"], "sandwich")
+        parser, from_command, _ = get_parser_options_plugins(argv[1:])
+        from_kwargs = create_options(input_file="in.pdf", output_file="out.pdf", parser=parser, **kwargs)
+        self.assertEqual(vars(from_kwargs), vars(from_command))
+
+    @unittest.skipUnless(importlib.util.find_spec("ocrmypdf"), "需要 ocrmypdf")
+    def test_unsupported_extra_args_are_rejected(self):
+        for extra in (["--bogus"], ["--no-progress-bar"]):
+            with self.subTest(extra=extra), self.assertRaises(ValueError):
+                gui.extra_args_kwargs(extra)
+
+    def test_without_extra_args_ocrmypdf_is_not_needed(self):
+        self.assertEqual(gui.extra_args_kwargs([]), {})
+
+    def test_inprocess_engine_falls_back_to_subprocess(self):
+        engine = object.__new__(gui.InProcessEngine)
+        job = gui.OCRJob("in.pdf", "out.pdf", self.options)
+        logs = []
+        with mock.patch.object(gui, "extra_args_kwargs", side_effect=ValueError("无法转换")), \
+                mock.patch.object(gui.SubprocessEngine, "run", return_value=0) as run:
+            self.assertEqual(engine.run(job, lambda message, level: logs.append((message, level))), 0)
+        run.assert_called_once()
+        self.assertEqual(logs, [("无法转换，该任务改用子进程引擎运行", "warning")])
+
+
+if __name__ == "__main__":
+    unittest.main()
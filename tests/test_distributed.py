@@ -0,0 +1,192 @@
+import contextlib
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import urllib.error
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import OcrMyPDF_GUI as gui  # noqa: E402
+
+# 代替 ocrmypdf 的桩命令：记下进程号，按 STUB_SLEEP 秒等待后原样复制输入
+STUB = """#!{python}
+import os, shutil, sys, time
+with open(os.path.join(os.environ["STUB_DIR"], "pids"), "a") as f:
+    f.write(f"{{os.getpid()}}\\n")
+time.sleep(float(os.environ.get("STUB_SLEEP", "0")))
+shutil.copyfile(sys.argv[-2], sys.argv[-1])
+"""
+TOKEN = "test-token"
+LEASE_SECONDS = 3.0
+
+
+def kill_process_group(pid):
+    with contextlib.suppress(OSError):
+        os.killpg(pid, signal.SIGKILL)
+
+
+# 分布式模式：本机协调节点（RemoteEngine）加上以 --worker 运行的工作节点进程，ocrmypdf 用桩命令代替
+@unittest.skipIf(os.name == "nt", "桩命令依赖 POSIX 的 shebang 与进程信号")
+class DistributedTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="ocrmypdf_gui_test_")
+        bin_dir = os.path.join(self.dir, "bin")
+        os.makedirs(bin_dir)
+        stub = os.path.join(bin_dir, "ocrmypdf")
+        with open(stub, "w", encoding="utf-8") as f:
+            f.write(STUB.format(python=sys.executable))
+        os.chmod(stub, 0o755)
+        self.env = dict(os.environ, PATH=bin_dir + os.pathsep + os.environ.get("PATH", ""),
+                        HOME=self.dir, STUB_DIR=self.dir)
+        self.logs = []
+        self.engine = gui.RemoteEngine(host="127.0.0.1", port=0, token=TOKEN, lease_seconds=LEASE_SECONDS)
+        self.scheduler = gui.JobScheduler(max_workers=4, cpu_count=4, engine=self.engine, metrics_path=None,
+                                          memory_budget=0,
+                                          memory_model=gui.MemoryModel(os.path.join(self.dir, "memory.json")),
+                                          on_log=lambda message, level: self.logs.append(message))
+        self.workers = []
+
+    def tearDown(self):
+        for proc in self.workers:
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+        self.scheduler.shutdown()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def stub_pids(self):
+        try:
+            with open(os.path.join(self.dir, "pids")) as f:
+                return [int(line) for line in f if line.strip()]
+        except OSError:
+            return []
+
+    def start_worker(self, name, sleep):
+        url = f"http://127.0.0.1:{self.engine.address[1]}"
+        proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "OcrMyPDF_GUI.py"), "--worker", url,
+                                 "--token", TOKEN, "--worker-name", name, "--worker-jobs", "1"],
+                                env=dict(self.env, STUB_SLEEP=str(sleep)),
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.workers.append(proc)
+        return proc
+
+    def submit(self, count):
+        jobs = []
+        for index in range(count):
+            input_path = os.path.join(self.dir, f"in{index}.pdf")
+            with open(input_path, "wb") as f:
+                f.write(b"%PDF-1.4\n%" + str(index).encode() + b"\n%%EOF\n")
+            job = gui.OCRJob(input_path, os.path.join(self.dir, f"out{index}.pdf"), dict(gui.DEFAULT_OPTIONS))
+            self.scheduler.submit(job)
+            jobs.append(job)
+        return jobs
+
+    def wait_for(self, condition, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if condition():
+                return True
+            time.sleep(0.1)
+        return False
+
+    def assigned(self, job, worker):
+        return any(f"#{job.id} " in message and f"分配给工作节点 {worker}" in message for message in self.logs)
+
+    def test_jobs_are_shared_between_workers(self):
+        self.start_worker("w1", 1.0)
+        self.start_worker("w2", 1.0)
+        jobs = self.submit(4)
+        self.assertTrue(self.wait_for(lambda: all(job.status in gui.JOB_FINISHED for job in jobs), 60))
+        self.assertEqual([job.status for job in jobs], [gui.JOB_DONE] * 4)
+        for job in jobs:
+            with open(job.input_path, "rb") as src, open(job.output_path, "rb") as dst:
+                self.assertEqual(src.read(), dst.read())
+        for worker in ("w1", "w2"):
+            self.assertTrue(any(self.assigned(job, worker) for job in jobs), f"{worker} 没有领取到任务")
+
+    def test_killed_worker_lease_expires_and_job_is_reassigned(self):
+        stuck = self.start_worker("stuck", 60)
+        job, = self.submit(1)
+        self.assertTrue(self.wait_for(lambda: self.stub_pids(), 30))
+        # 工作节点被杀掉后，它启动的桩进程自成进程组继续运行，测试结束时一并结束
+        self.addCleanup(kill_process_group, self.stub_pids()[0])
+        stuck.send_signal(signal.SIGKILL)
+        stuck.wait()
+        self.start_worker("rescue", 0)
+        self.assertTrue(self.wait_for(lambda: job.status in gui.JOB_FINISHED, LEASE_SECONDS + 30))
+        self.assertEqual(job.status, gui.JOB_DONE)
+        self.assertTrue(self.assigned(job, "stuck"))
+        self.assertTrue(self.assigned(job, "rescue"))
+        self.assertTrue(any("工作节点 stuck 失联，任务重新分配" in message for message in self.logs))
+
+    # 不启动工作节点，直接按工作节点的协议领取任务，控制取消与完成的先后
+    def lease(self):
+        client = gui._CoordinatorClient(f"http://127.0.0.1:{self.engine.address[1]}", TOKEN)
+        task = client.call("POST", "/lease", {"worker": "manual"})
+        result = os.path.join(self.dir, "result.pdf")
+        with open(result, "wb") as f:
+            f.write(b"%PDF-1.4\n% result\n%%EOF\n")
+        return client, f"/tasks/{task['task']}/", f"?lease={task['lease']}", result
+
+    def assert_conflict(self, call, *args):
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            call(*args)
+        self.assertEqual(raised.exception.code, 409)
+
+    def part_files(self):
+        return [name for name in os.listdir(self.dir) if name.endswith(".part")]
+
+    def test_cancel_while_uploading_discards_result(self):
+        job, = self.submit(1)
+        client, prefix, query, result = self.lease()
+        client.upload(prefix + "output" + query, result)
+        self.scheduler.cancel(job)
+        self.assert_conflict(client.upload, prefix + "output" + query, result)
+        self.assert_conflict(client.call, "POST", prefix + "complete" + query, {"return_code": 0})
+        self.assertTrue(self.wait_for(lambda: job.status in gui.JOB_FINISHED, 10))
+        self.assertEqual(job.status, gui.JOB_CANCELED)
+        self.assertFalse(os.path.exists(job.output_path))
+        self.assertEqual(self.part_files(), [])
+
+    def test_cancel_after_completion_keeps_result(self):
+        job, = self.submit(1)
+        client, prefix, query, result = self.lease()
+        client.upload(prefix + "output" + query, result)
+        client.call("POST", prefix + "complete" + query, {"return_code": 0})
+        self.engine.cancel(job)
+        self.assertTrue(self.wait_for(lambda: job.status in gui.JOB_FINISHED, 10))
+        self.assertEqual(job.status, gui.JOB_DONE)
+        with open(result, "rb") as src, open(job.output_path, "rb") as dst:
+            self.assertEqual(src.read(), dst.read())
+        self.assertEqual(self.part_files(), [])
+
+
+    def test_cancel_during_completion_is_ignored(self):
+        job, = self.submit(1)
+        client, prefix, query, result = self.lease()
+        client.upload(prefix + "output" + query, result)
+        replace = os.replace
+
+        # 协调节点正在把上传的输出移到目标位置时收到取消
+        def replace_then_cancel(src, dst):
+            if dst == job.output_path:
+                self.scheduler.cancel(job)
+            replace(src, dst)
+
+        with mock.patch.object(gui.os, "replace", replace_then_cancel):
+            client.call("POST", prefix + "complete" + query, {"return_code": 0})
+        self.assertTrue(self.wait_for(lambda: job.status in gui.JOB_FINISHED, 10))
+        self.assertEqual(job.status, gui.JOB_DONE)
+        self.assertTrue(os.path.exists(job.output_path))
+        self.assertEqual(self.part_files(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import OcrMyPDF_GUI as gui  # noqa: E402
+
+
+class JournalTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="ocrmypdf_gui_test_")
+        self.journal = gui.JobJournal(os.path.join(self.dir, "journal", "journal.sqlite3"))
+        self.input_path = self.write("in.pdf", b"%PDF-1.4 input")
+        self.output_path = os.path.join(self.dir, "out.pdf")
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def write(self, name, data, mtime=None):
+        path = os.path.join(self.dir, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def job(self, options=None):
+        return gui.OCRJob(self.input_path, self.output_path, dict(options or gui.DEFAULT_OPTIONS))
+
+    # 模拟一次完整的任务：提交、开始、写出输出、记录结果
+    def run_job(self, status=gui.JOB_DONE, options=None):
+        job = self.job(options)
+        self.journal.record_submit(job)
+        self.journal.record_start(job)
+        self.write("out.pdf", b"%PDF-1.4 output", mtime=1000)
+        job.status = status
+        job.return_code = 0 if status == gui.JOB_DONE else 1
+        self.journal.record_finish(job)
+        return job
+
+
+class FindValidOutputTest(JournalTestCase):
+    def test_unchanged_files_are_valid(self):
+        job = self.run_job()
+        row = self.journal.find_valid_output(self.job())
+        self.assertIsNotNone(row)
+        self.assertEqual(row["id"], job.journal_id)
+
+    def test_changes_invalidate_output(self):
+        cases = [("输入内容改变", lambda: self.write("in.pdf", b"%PDF-1.4 changed input")),
+                 ("输入修改时间改变", lambda: os.utime(self.input_path, (2000, 2000))),
+                 ("输出被删除", lambda: os.remove(self.output_path)),
+                 ("输出大小改变", lambda: self.write("out.pdf", b"%PDF-1.4 longer output", mtime=1000)),
+                 ("输出内容改变但大小相同", lambda: self.write("out.pdf", b"%PDF-1.4 OUTPUT", mtime=2000))]
+        for name, change in cases:
+            with self.subTest(name):
+                self.run_job()
+                self.assertIsNotNone(self.journal.find_valid_output(self.job()))
+                change()
+                self.assertIsNone(self.journal.find_valid_output(self.job()))
+                self.write("in.pdf", b"%PDF-1.4 input")
+
+    def test_touched_output_with_same_content_is_valid(self):
+        job = self.run_job()
+        os.utime(self.output_path, (3000, 3000))
+        row = self.journal.find_valid_output(self.job())
+        self.assertIsNotNone(row)
+        self.assertEqual(row["id"], job.journal_id)
+        # 哈希比较通过后记录新的修改时间，下次无需再计算哈希
+        self.assertEqual(self.journal._execute("SELECT output_mtime FROM jobs WHERE id=?",
+                                               (job.journal_id,)).fetchone()["output_mtime"], 3000)
+
+    def test_other_options_do_not_match(self):
+        self.run_job()
+        other = dict(gui.DEFAULT_OPTIONS, deskew=not gui.DEFAULT_OPTIONS["deskew"])
+        self.assertIsNone(self.journal.find_valid_output(self.job(other)))
+
+    def test_failed_job_does_not_match(self):
+        self.run_job(status=gui.JOB_FAILED)
+        self.assertIsNone(self.journal.find_valid_output(self.job()))
+
+    def test_newest_successful_record_wins(self):
+        self.run_job()
+        second = self.run_job()
+        self.assertEqual(self.journal.find_valid_output(self.job())["id"], second.journal_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import OcrMyPDF_GUI as gui  # noqa: E402
+
+# 约为 A4 页面以 PAGE_FILTER_DPI 栅格化后的尺寸
+WIDTH, HEIGHT = 298, 421
+
+
+# 白底页面，rects 为 (x, y, 宽, 高) 的黑色矩形（模拟文字）；noise 为每个像素随机变亮/变暗的最大幅度
+def make_page(rects, noise=0, seed=0):
+    pixels = bytearray(b"\xff" * (WIDTH * HEIGHT))
+    for x, y, w, h in rects:
+        for row in range(y, y + h):
+            pixels[row * WIDTH + x:row * WIDTH + x + w] = b"\x00" * w
+    if noise:
+        rng = random.Random(seed)
+        pixels = bytearray(min(255, max(0, value + rng.randint(-noise, noise))) for value in pixels)
+    return WIDTH, HEIGHT, bytes(pixels)
+
+
+# 七段数码管的笔画：(x, y, 宽, 高)，相对于 4×7 像素的字符框
+SEGMENTS = {"a": (0, 0, 4, 1), "b": (3, 0, 1, 4), "c": (3, 3, 1, 4), "d": (0, 6, 4, 1),
+            "e": (0, 3, 1, 4), "f": (0, 0, 1, 4), "g": (0, 3, 4, 1)}
+DIGITS = ["abcdef", "bc", "abdeg", "abcdg", "bcfg", "acdfg", "acdefg", "abc", "abcdefg", "abcdfg"]
+
+
+# 同一模板的表单：相同的标题与正文行，只有编号字段（四个字符宽）不同
+def form_rects(number):
+    rects = [(30, 30, 200, 8)] + [(30, 80 + 14 * line, 230, 5) for line in range(15)]
+    for index, digit in enumerate(str(number).zfill(4)):
+        rects += [(240 + 6 * index + x, 50 + y, w, h) for x, y, w, h in
+                  (SEGMENTS[segment] for segment in DIGITS[int(digit)])]
+    return rects
+
+
+class PageHashTest(unittest.TestCase):
+    def test_blank_page_has_no_active_bits(self):
+        value, mask = gui.page_dhash(*make_page([]))
+        self.assertEqual(mask, 0)
+
+    def test_identical_pages_have_zero_distance(self):
+        page = make_page(form_rects(1))
+        self.assertEqual(gui.dhash_distance(gui.page_dhash(*page), gui.page_dhash(*page)), 0)
+
+    def test_sparse_pages_with_different_lines_are_far_apart(self):
+        first = gui.page_dhash(*make_page([(30, 60, 120, 6)]))
+        second = gui.page_dhash(*make_page([(30, 300, 120, 6)]))
+        self.assertGreater(gui.dhash_distance(first, second), gui.PAGE_FILTER_DUPLICATE_RATIO)
+
+    def test_scanner_noise_does_not_change_hash_much(self):
+        clean = gui.page_dhash(*make_page(form_rects(1)))
+        noisy = gui.page_dhash(*make_page(form_rects(1), noise=20, seed=1))
+        self.assertLessEqual(gui.dhash_distance(clean, noisy), gui.PAGE_FILTER_DUPLICATE_RATIO)
+
+
+# 确认重复页时的严格比较
+def exact_match(first, second):
+    return gui.blocks_match(gui.page_blocks(*first, gui.PAGE_FILTER_EXACT_BLOCK),
+                            gui.page_blocks(*second, gui.PAGE_FILTER_EXACT_BLOCK),
+                            gui.PAGE_FILTER_EXACT_TOLERANCE, 0)
+
+
+class BlocksMatchTest(unittest.TestCase):
+    def test_refeed_with_noise_is_exact_match(self):
+        self.assertTrue(exact_match(make_page(form_rects(1), noise=10, seed=1),
+                                    make_page(form_rects(1), noise=10, seed=2)))
+
+    def test_forms_with_different_numbers_are_not_exact_match(self):
+        for first, second in [(1, 7), (1234, 1239), (80, 88), (7, 70), (5, 6)]:
+            with self.subTest(numbers=(first, second)):
+                self.assertFalse(exact_match(make_page(form_rects(first)), make_page(form_rects(second))))
+
+    def test_forms_with_different_numbers_are_loose_match(self):
+        self.assertTrue(gui.blocks_match(gui.page_blocks(*make_page(form_rects(80))),
+                                         gui.page_blocks(*make_page(form_rects(88)))))
+
+    def test_different_sizes_never_match(self):
+        blocks = gui.page_blocks(*make_page([]))
+        self.assertFalse(gui.blocks_match(blocks, (blocks[0] - 1, blocks[1], blocks[2])))
+
+
+class ClassifyPagesTest(unittest.TestCase):
+    def test_refeed_of_previous_page_is_duplicate(self):
+        pages = [make_page(form_rects(1), noise=10, seed=1), make_page(form_rects(1), noise=10, seed=2)]
+        result = gui.classify_pages(pages)
+        self.assertEqual(result["duplicate"], [(2, 1)])
+
+    def test_forms_from_same_template_are_only_reported(self):
+        pages = [make_page(form_rects(number)) for number in (1, 7, 80, 88, 5, 6)]
+        result = gui.classify_pages(pages)
+        self.assertEqual(result["duplicate"], [])
+        self.assertEqual(result["pages"], 6)
+
+    def test_identical_page_that_is_not_adjacent_is_only_reported(self):
+        pages = [make_page(form_rects(1)), make_page([(30, 30, 230, 300)]), make_page(form_rects(1))]
+        result = gui.classify_pages(pages)
+        self.assertEqual(result["duplicate"], [])
+        self.assertEqual(result["similar"], [(3, 1)])
+
+    def test_blank_pages(self):
+        pages = [make_page([]), make_page(form_rects(1)), make_page([], noise=5)]
+        result = gui.classify_pages(iter(pages))
+        self.assertEqual((result["pages"], result["blank"], result["duplicate"]), (3, [1, 3], []))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import OcrMyPDF_GUI as gui  # noqa: E402
+
+
+class FormatPageRangesTest(unittest.TestCase):
+    def test_format(self):
+        cases = [([], ""),
+                 ([3], "3"),
+                 ([1, 2, 3, 5], "1-3,5"),
+                 ([5, 1, 3, 2, 2], "1-3,5"),
+                 ([1, 3, 5], "1,3,5"),
+                 (range(1, 11), "1-10")]
+        for pages, expected in cases:
+            with self.subTest(pages=list(pages)):
+                self.assertEqual(gui.format_page_ranges(pages), expected)
+
+
+class ParsePageRangesTest(unittest.TestCase):
+    def test_parse(self):
+        cases = [("", []),
+                 ("   ", []),
+                 ("1", [1]),
+                 ("1-3,5", [1, 2, 3, 5]),
+                 (" 2 - 4 , 1 ", [1, 2, 3, 4]),
+                 ("3,1-3", [1, 2, 3]),
+                 ("10-10", [10])]
+        for text, expected in cases:
+            with self.subTest(text=text):
+                self.assertEqual(gui.parse_page_ranges(text, 10), expected)
+
+    def test_invalid(self):
+        for text in ("0", "1-0", "5-3", "11", "9-11", "a", "1,,2", "1-", "-3", "1-2-3", "1.5"):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                gui.parse_page_ranges(text, 10)
+
+    def test_round_trip(self):
+        for pages in ([1], [1, 2, 3, 5], [2, 4, 6, 7, 8, 10]):
+            with self.subTest(pages=pages):
+                self.assertEqual(gui.parse_page_ranges(gui.format_page_ranges(pages), 10), pages)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import OcrMyPDF_GUI as gui  # noqa: E402
+
+
+class CacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="ocrmypdf_gui_test_")
+        self.cache = gui.ResultCache(os.path.join(self.dir, "cache"), max_bytes=10000)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def write(self, name, data):
+        path = os.path.join(self.dir, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+
+class CacheKeyTest(CacheTestCase):
+    def test_option_normalization(self):
+        base = dict(gui.DEFAULT_OPTIONS)
+        same = [dict(base, sidecar_name="其他名称.txt"),
+                dict(base, title=""),
+                dict(base, extra_args=[]),
+                dict(base, optimize_target_kb=base["optimize_target_kb"] + 100)]
+        different = [dict(base, deskew=not base["deskew"]),
+                     dict(base, languages=["deu"]),
+                     dict(base, title="标题"),
+                     dict(base, extra_args=["--pdf-renderer", "sandwich"]),
+                     dict(base, optimize=gui.OPTIMIZE_AUTO)]
+        input_path = self.write("in.pdf", b"%PDF-1.4 input")
+        key = self.cache.key(input_path, base)
+        for options in same:
+            with self.subTest(options=options):
+                self.assertEqual(self.cache.key(input_path, options), key)
+        for options in different:
+            with self.subTest(options=options):
+                self.assertNotEqual(self.cache.key(input_path, options), key)
+
+    def test_target_size_matters_only_for_auto_optimize(self):
+        input_path = self.write("in.pdf", b"%PDF-1.4 input")
+        auto = dict(gui.DEFAULT_OPTIONS, optimize=gui.OPTIMIZE_AUTO, optimize_target_kb=100)
+        self.assertNotEqual(self.cache.key(input_path, auto),
+                            self.cache.key(input_path, dict(auto, optimize_target_kb=200)))
+
+    def test_key_follows_content_not_path(self):
+        first = self.write("a.pdf", b"%PDF-1.4 same")
+        second = self.write("b.pdf", b"%PDF-1.4 same")
+        third = self.write("c.pdf", b"%PDF-1.4 other")
+        options = dict(gui.DEFAULT_OPTIONS)
+        self.assertEqual(self.cache.key(first, options), self.cache.key(second, options))
+        self.assertNotEqual(self.cache.key(first, options), self.cache.key(third, options))
+
+
+class CacheStoreTest(CacheTestCase):
+    def test_store_and_restore(self):
+        output = self.write("out.pdf", b"output")
+        sidecar = self.write("out.txt", b"text")
+        self.assertFalse(self.cache.restore("ab" * 32, os.path.join(self.dir, "restored.pdf")))
+        self.cache.store("ab" * 32, output, sidecar)
+        restored, restored_sidecar = os.path.join(self.dir, "restored.pdf"), os.path.join(self.dir, "restored.txt")
+        self.assertTrue(self.cache.restore("ab" * 32, restored, restored_sidecar))
+        with open(restored, "rb") as f, open(restored_sidecar, "rb") as g:
+            self.assertEqual((f.read(), g.read()), (b"output", b"text"))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_entry_without_sidecar_misses_when_sidecar_wanted(self):
+        self.cache.store("cd" * 32, self.write("out.pdf", b"output"))
+        self.assertFalse(self.cache.restore("cd" * 32, os.path.join(self.dir, "r.pdf"),
+                                            os.path.join(self.dir, "r.txt")))
+
+    def test_second_store_of_same_key_is_ignored(self):
+        self.cache.store("ef" * 32, self.write("out.pdf", b"first"))
+        self.cache.store("ef" * 32, self.write("out2.pdf", b"second"))
+        restored = os.path.join(self.dir, "r.pdf")
+        self.assertTrue(self.cache.restore("ef" * 32, restored))
+        with open(restored, "rb") as f:
+            self.assertEqual(f.read(), b"first")
+
+
+class CacheEvictionTest(CacheTestCase):
+    def entry_exists(self, key):
+        return os.path.isdir(self.cache._entry_dir(key))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        keys = [f"{index:02d}" * 32 for index in range(4)]
+        # 每个条目约 3000 字节（输出 + meta.json），上限 10000 字节
+        for index, key in enumerate(keys[:3]):
+            self.cache.store(key, self.write(f"out{index}.pdf", b"x" * 3000))
+            os.utime(self.cache._entry_dir(key), (1000 + index, 1000 + index))
+        # 最早写入的条目刚被使用过，淘汰时应保留
+        os.utime(self.cache._entry_dir(keys[0]), (2000, 2000))
+        self.cache.store(keys[3], self.write("out3.pdf", b"x" * 3000))
+        self.assertEqual([self.entry_exists(key) for key in keys], [True, False, False, True])
+        self.assertLessEqual(self.cache._used, self.cache.max_bytes * 0.8)
+        self.assertEqual(self.cache._used, sum(size for _, size, _ in self.cache._entries()))
+
+    def test_clear_resets_usage(self):
+        self.cache.store("aa" * 32, self.write("out.pdf", b"x" * 100))
+        self.cache.clear()
+        self.assertEqual(self.cache._used, 0)
+        self.assertEqual(self.cache._entries(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import OcrMyPDF_GUI as gui  # noqa: E402
+
+
+class QueryBuilderTest(unittest.TestCase):
+    def test_spaced(self):
+        cases = [("abc def", "abc def"),
+                 ("中文", " 中  文 "),
+                 ("OCR识别", "OCR 识  别 "),
+                 ("カナ", " カ  ナ ")]
+        for text, expected in cases:
+            with self.subTest(text=text):
+                self.assertEqual(gui.SearchIndex._spaced(text), expected)
+
+    def test_unspaced_restores_cjk(self):
+        for text in ("中文", "识别结果", "abc def"):
+            with self.subTest(text=text):
+                self.assertEqual(" ".join(gui.SearchIndex._unspaced(gui.SearchIndex._spaced(text)).split()),
+                                 " ".join(text.split()))
+
+    def test_match_query(self):
+        cases = [("", ""),
+                 ("   ", ""),
+                 ("invoice", '"invoice"'),
+                 ("invoice 2024", '"invoice" AND "2024"'),
+                 ("发票", '"发 票"'),
+                 ('say "hi"', '"say" AND """hi"""'),
+                 ("OR NOT", '"OR" AND "NOT"')]
+        for query, expected in cases:
+            with self.subTest(query=query):
+                self.assertEqual(gui.SearchIndex._match_query(query), expected)
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="ocrmypdf_gui_test_")
+        self.index = gui.SearchIndex(os.path.join(self.dir, "index", "search.sqlite3"))
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def add(self, name, text):
+        pdf_path = os.path.join(self.dir, name + ".pdf")
+        sidecar = os.path.join(self.dir, name + ".txt")
+        with open(pdf_path, "wb") as f:
+            f.write(b"%PDF-1.4\n%%EOF\n")
+        with open(sidecar, "w", encoding="utf-8") as f:
+            f.write(text)
+        self.index.index_document(pdf_path, sidecar)
+        return pdf_path
+
+    def test_page_count_ignores_trailing_form_feed(self):
+        cases = [("第一页\f第二页\f", 2), ("第一页\f第二页", 2), ("只有一页\f", 1), ("\f\f有字的第三页\f", 3)]
+        for index, (text, pages) in enumerate(cases):
+            with self.subTest(text=text):
+                self.add(f"doc{index}", text)
+                self.assertEqual(self.index.stats(), (index + 1, sum(count for _, count in cases[:index + 1])))
+
+    def test_search_returns_page_and_offset(self):
+        pdf_path = self.add("report", "first page\fsecond page 发票号码\f")
+        self.assertEqual([(path, page, offset) for path, page, offset, _ in self.index.search("发票")],
+                         [(pdf_path, 2, len("first page") + 1)])
+        self.assertEqual(self.index.search("page missing"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()